@@ -1,14 +1,29 @@
 import streamlit as st
 import os
 import sys
-import tempfile
+import hashlib
 import json
+import time
 import streamlit.components.v1 as components
-from src.parser.python_parser import PythonCodeParser
+from src.parser.python_parser import EXTRACTION_PROFILES, PythonCodeParser
+from src.parser.records import NodeRecord, NodeType
+from src.parser.archive_parser import IGNORED_SUFFIXES, iter_zip_members
+from src.parser.source_accessor import SourceAccessor, line_start_offsets, node_offsets
 from src.graph.graph_builder import GraphBuilder
+from src.graph.symbol_linker import SymbolLinker
 from src.query_engine.query_engine import QueryEngine
 from src.graph.dot_generator import DotGenerator
+from src.graph.markmap_builder import MarkmapBuilder
+from src.graph.layout import LayeredLayout
+from src.graph.interactive_html import InteractiveHtmlExporter, generate_interactive_html
 from src.diff_viewer.diff_viewer import CodeDiffViewer
+from src.diff_viewer.graph_diff import GraphDiff
+from src.log_analyzer.log_analyzer import LogAnalyzer, SourceFileIndex
+from src.instrumentation.profiler import PipelineProfiler
+from src.llm.dispatcher import LLMDispatcher
+from src.llm.prompts import BATCH_COMMENT_PROMPT_VERSION, COMMENT_PROMPT_VERSION, OPTIMIZATION_PROMPT_VERSION, build_comment_prompt, build_optimization_prompt
+from src.llm.prompt_packer import PromptPacker, run_packed_comments
+from src.llm.response_cache import LLMResponseCache, client_model_name
 from horizon import HorizonLLMClient
 import ast
 import zipfile
@@ -19,154 +34,177 @@ import networkx as nx
 # Add the project root to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-@st.cache_data
-def load_graph_data(uploaded_files):
+def iter_uploaded_sources(uploaded_files):
+    # Zip uploads are expanded member by member, nothing is written to disk
+    for uploaded_file in uploaded_files:
+        if uploaded_file.name.endswith(IGNORED_SUFFIXES):
+            continue
+        if uploaded_file.name.endswith(".zip"):
+            uploaded_file.seek(0)
+            yield from iter_zip_members(uploaded_file)
+        else:
+            yield uploaded_file.name, uploaded_file.getvalue()
+
+def upload_key(uploaded_file):
+    # file_id changes with every new upload, so it stands in for a content hash without reading the file
+    file_id = getattr(uploaded_file, "file_id", None)
+    if file_id is None:
+        file_id = hashlib.blake2b(uploaded_file.getbuffer(), digest_size=16).hexdigest()
+    return uploaded_file.name, file_id
+
+@st.cache_data(show_spinner=False, max_entries=10000)
+def parse_source(name, content_hash, profile, _data):
+    # Keyed by name, content hash and profile only, _data is excluded from Streamlit's hashing
+    if name.endswith(".py"):
+        try:
+            # Docstrings stay in the upload, the nodes only keep their offsets
+            return PythonCodeParser(name, source=_data, profile=profile, inline_docstrings=False).parse()
+        except (SyntaxError, ValueError):
+            pass
+    return {"nodes": [NodeRecord(id=name, type=NodeType.FILE, name=name)], "edges": []}
+
+@st.cache_resource(show_spinner="Building code graph...", max_entries=4)
+def load_code_graph(upload_keys, profile, _uploaded_files, _profiler):
     all_parsed_data = {"nodes": [], "edges": []}
-    ignored_extensions = [".ckpt", ".ipynb_checkpoints", "-checkpoint.py"]
-    with tempfile.TemporaryDirectory() as tmpdir:
-        for uploaded_file in uploaded_files:
-            if any(uploaded_file.name.endswith(ext) for ext in ignored_extensions):
-                continue
-
-            file_path = os.path.join(tmpdir, uploaded_file.name)
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                if file_path.endswith(".py"):
-                    parser = PythonCodeParser(file_path)
-                    parsed_data = parser.parse()
-                    all_parsed_data["nodes"].extend(parsed_data["nodes"])
-                    all_parsed_data["edges"].extend(parsed_data["edges"])
-                else:
-                    all_parsed_data["nodes"].append({"id": uploaded_file.name, "type": "file", "name": uploaded_file.name})
-            except UnicodeDecodeError:
-                all_parsed_data["nodes"].append({"id": uploaded_file.name, "type": "file", "name": uploaded_file.name})
-    
-    graph_builder = GraphBuilder()
-    code_graph = graph_builder.build_graph(all_parsed_data)
-    return code_graph
-
-def generate_interactive_html(dot_string, node_types, edge_types):
-    # Properly escape the dot string for JavaScript
-    js_dot_string = json.dumps(dot_string)
-
-    node_filters_html = ''.join(f'<label><input type="checkbox" class="node-filter" value="{nt}" checked> {nt}</label>' for nt in node_types)
-    edge_filters_html = ''.join(f'<label><input type="checkbox" class="edge-filter" value="{et}" checked> {et}</label>' for et in edge_types)
-
-    return f'''
-    <!DOCTYPE html>
-    <html>
-    <head>
-      <title>Interactive Code Graph</title>
-      <script src="https://d3js.org/d3.v5.min.js"></script>
-      <script src="https://unpkg.com/@hpcc-js/wasm@0.3.11/dist/index.min.js"></script>
-      <script src="https://unpkg.com/d3-graphviz@3.0.5/build/d3-graphviz.js"></script>
-      <style>
-        #graph-container {{
-          border: 1px solid black;
-          width: 100%;
-          height: 80vh;
-        }}
-        .filters {{
-          margin-bottom: 10px;
-        }}
-      </style>
-    </head>
-    <body>
-      <div class="filters">
-        <strong>Node Types:</strong>
-        {node_filters_html}
-        <br>
-        <strong>Edge Types:</strong>
-        {edge_filters_html}
-      </div>
-      <div id="graph-container"></div>
-
-      <script>
-        const dotString = {js_dot_string};
-        const graphviz = d3.select("#graph-container").graphviz();
-
-        function renderGraph() {{
-          const nodeFilters = Array.from(document.querySelectorAll('.node-filter:checked')).map(el => el.value);
-          const edgeFilters = Array.from(document.querySelectorAll('.edge-filter:checked')).map(el => el.value);
-
-          const filteredDot = dotString.split('\n').filter(line => {{
-            if (line.includes('->')) {{
-              const match = line.match(/type="(.*?)"/);
-              if (match) {{
-                return edgeFilters.includes(match[1]);
-              }}
-              return true;
-            }} else if (line.includes('shape')) {{
-                const match = line.match(/type="(.*?)"/);
-                if(match){{
-                    return nodeFilters.includes(match[1]);
-                }}
-                return true;
-            }}
-            return true;
-          }}).join('\n');
-
-          graphviz.renderDot(filteredDot);
-        }}
-
-        d3.selectAll('.node-filter, .edge-filter').on('change', renderGraph);
-
-        renderGraph();
-      </script>
-    </body>
-    </html>
-    '''
-
-def convert_dot_to_markmap_json(dot_string):
-    nodes = {}
-    edges = []
-
-    for line in dot_string.strip().split('\n'):
-        if '->' in line:
-            source, target_part = line.split('->')
-            source = source.strip().replace('"', '')
-            target, attrs = target_part.split('[')
-            target = target.strip().replace('"', '')
-            attrs = attrs.strip()[:-1]
-            label = ''
-            if 'label=' in attrs:
-                label = attrs.split('label=')[-1].split(',')[0].replace('"', '')
-            edges.append({"source": source, "target": target, "label": label})
-        elif 'label=' in line:
-            node_id, attrs = line.split('[')
-            node_id = node_id.strip().replace('"', '')
-            label = ''
-            if 'label=' in attrs:
-                label = attrs.split('label=')[-1].split(',')[0].replace('"', '')
-            nodes[node_id] = {"id": node_id, "label": label, "children": []}
-
-    for edge in edges:
-        source_node = nodes.get(edge["source"])
-        target_node = nodes.get(edge["target"])
-        if source_node and target_node:
-            source_node["children"].append(target_node)
-
-    root_nodes = [node for node in nodes.values() if not any(edge["target"] == node["id"] for edge in edges)]
-    
-    if not root_nodes and nodes:
-        root_nodes = [next(iter(nodes.values()))]
-
-    def build_markmap_tree(node, visited):
-        if node['id'] in visited:
-            return None
-        visited.add(node['id'])
-        children = [build_markmap_tree(child, visited.copy()) for child in node["children"]]
-        return {
-            "content": node["label"],
-            "children": [child for child in children if child is not None]
-        }
-
-    markmap_children = [build_markmap_tree(root, set()) for root in root_nodes]
-    return json.dumps({"content": "Code Graph", "children": markmap_children})
+    source_accessor = SourceAccessor()
+    with _profiler.stage("scan"):
+        sources = list(iter_uploaded_sources(_uploaded_files))
+    for name, data in sources:
+        source_accessor.add_source(name, data)
+        start = time.perf_counter()
+        with _profiler.stage("parse"):
+            parsed_data = parse_source(name, hashlib.blake2b(data, digest_size=16).hexdigest(), profile, data)
+        _profiler.record_file(name, time.perf_counter() - start)
+        all_parsed_data["nodes"].extend(parsed_data["nodes"])
+        all_parsed_data["edges"].extend(parsed_data["edges"])
+
+    with _profiler.stage("link"):
+        all_parsed_data = SymbolLinker().link(all_parsed_data)
+    with _profiler.stage("build"):
+        graph_builder = GraphBuilder()
+        code_graph = graph_builder.build_graph(all_parsed_data)
+    with _profiler.stage("index"):
+        query_engine = QueryEngine(code_graph, source_accessor)
+        query_engine.build_indexes()
+    return code_graph, query_engine
+
+@st.cache_data(show_spinner="Computing layout...", max_entries=8)
+def compute_layout_cached(graph_key, _code_graph, _profiler):
+    # Computed once per graph, every filter combination reuses the coordinates
+    with _profiler.stage("layout"):
+        return LayeredLayout().compute(_code_graph)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def generate_dot_cached(graph_key, node_filter, edge_filter, cluster_modules, precomputed_layout, _code_graph, _source_accessor, _positions, _profiler):
+    with _profiler.stage("dot"):
+        return DotGenerator(_source_accessor, _positions).generate_dot(_code_graph, node_filter=list(node_filter), edge_filter=list(edge_filter), cluster_modules=cluster_modules)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def generate_markmap_cached(graph_key, node_filter, _code_graph, _profiler):
+    with _profiler.stage("markmap"):
+        return MarkmapBuilder().to_json(_code_graph, node_filter=list(node_filter))
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def export_interactive_html_cached(graph_key, node_filter, edge_filter, cluster_modules, inline_assets, precomputed_layout, _code_graph, _source_accessor, _positions, _profiler):
+    with _profiler.stage("html_export"):
+        exporter = InteractiveHtmlExporter(inline_assets=inline_assets, source_accessor=_source_accessor, positions=_positions)
+        return exporter.export(_code_graph, list(node_filter), list(edge_filter), cluster_modules=cluster_modules)
+
+class FunctionCollector(ast.NodeVisitor):
+    # Mirrors DocstringAdder: functions nested in other functions are not visited
+    def __init__(self):
+        self.functions = []
+
+    def visit_FunctionDef(self, node):
+        self.functions.append(node)
+
+def collect_commentable_functions(tree):
+    collector = FunctionCollector()
+    collector.visit(tree)
+    return collector.functions
+
+class DocstringAdder(ast.NodeTransformer):
+    def __init__(self, comments):
+        self.comments = comments
+
+    def visit_FunctionDef(self, node):
+        comment = self.comments.get(id(node))
+        if comment is None:
+            return node
+
+        docstring = ast.Expr(value=ast.Constant(value=comment))
+
+        if (
+            node.body
+            and isinstance(node.body[0], ast.Expr)
+            and isinstance(node.body[0].value, ast.Constant)
+        ):
+            node.body[0] = docstring
+        else:
+            node.body.insert(0, docstring)
+
+        return node
+
+@st.cache_resource
+def get_llm_response_cache():
+    return LLMResponseCache()
+
+def get_profiler():
+    if "profiler" not in st.session_state:
+        st.session_state.profiler = PipelineProfiler(trace_memory=False)
+    # The profiler lives across reruns, and each rerun runs on a new thread
+    st.session_state.profiler.claim_thread()
+    return st.session_state.profiler
+
+def show_stats_panel(profiler):
+    with st.sidebar.expander("Pipeline Stats"):
+        stats = profiler.to_dict()
+        if stats["stages"]:
+            st.table([{"stage": name, **stage} for name, stage in stats["stages"].items()])
+        else:
+            st.write("Nothing measured yet. Cached steps are not re-measured.")
+        if stats["counters"]:
+            st.json(stats["counters"])
+        if stats["slowest_files"]:
+            st.write("Slowest files to parse:")
+            st.table(stats["slowest_files"])
+        st.download_button("Download stats as JSON", profiler.to_json(), file_name="pipeline_stats.json", mime="application/json")
+        if st.button("Reset stats"):
+            del st.session_state.profiler
+            st.rerun()
+
+def make_llm_dispatcher(llm_options, progress):
+    return LLMDispatcher(
+        HorizonLLMClient(),
+        max_concurrency=llm_options["max_concurrency"],
+        requests_per_second=llm_options["requests_per_second"] or None,
+        max_retries=llm_options["max_retries"],
+        progress_callback=lambda done, total: progress.progress(done / total, text=f"{done}/{total} LLM requests done"),
+        cache=get_llm_response_cache() if llm_options["use_cache"] else None,
+        profiler=get_profiler(),
+    )
+
+def current_code(file_name, source_accessor):
+    # Applied optimizations and comments are kept in code_contents, the uploads are decoded on demand
+    code = st.session_state.code_contents.get(file_name)
+    if code is None:
+        try:
+            code = source_accessor.text(file_name)
+        except UnicodeDecodeError:
+            code = "This file is not a UTF-8 encoded text file."
+    return code
+
+def build_graph_from_code(file_name, code):
+    parsed_data = SymbolLinker().link(PythonCodeParser(file_name, source=code).parse())
+    return GraphBuilder().build_graph(parsed_data)
+
+def show_structural_diff(file_name, old_code, new_code):
+    try:
+        graph_diff = GraphDiff(build_graph_from_code(file_name, old_code), build_graph_from_code(file_name, new_code))
+    except SyntaxError as e:
+        st.warning(f"Could not parse {file_name} for a structural diff: {e}")
+        return
+    st.markdown(graph_diff.to_markdown())
 
 def main():
     st.title("Code Visualizer and Query Engine")
@@ -178,16 +216,11 @@ def main():
 
     if uploaded_log_file and uploaded_files_log:
         if st.button("Analyze Log File"):
-            log_contents = uploaded_log_file.getvalue().decode("utf-8")
-            
-            with tempfile.TemporaryDirectory() as tmpdir:
-                for uploaded_file in uploaded_files_log:
-                    file_path = os.path.join(tmpdir, uploaded_file.name)
-                    with open(file_path, "wb") as f:
-                        f.write(uploaded_file.getbuffer())
-
-                problem, solution = analyze_log_file(log_contents, tmpdir)
-                st.header("Log Analysis Results")
+            codebase_files = dict(iter_uploaded_sources(uploaded_files_log))
+            uploaded_log_file.seek(0)
+            results = analyze_log_file(uploaded_log_file, codebase_files)
+            st.header("Log Analysis Results")
+            for problem, solution in results:
                 st.error(f"Problem: {problem}")
                 st.success(f"Solution: {solution}")
 
@@ -207,19 +240,17 @@ def main():
             st.session_state.show_diff_opt = {}
         if "show_diff_comment" not in st.session_state:
             st.session_state.show_diff_comment = {}
+        if "show_graph_diff" not in st.session_state:
+            st.session_state.show_graph_diff = {}
         if "generated_comments" not in st.session_state:
             st.session_state.generated_comments = []
 
-        if not st.session_state.code_contents:
-            for uploaded_file in uploaded_files_main:
-                try:
-                    content = uploaded_file.getvalue().decode("utf-8")
-                    st.session_state.code_contents[uploaded_file.name] = content
-                except UnicodeDecodeError:
-                    st.session_state.code_contents[uploaded_file.name] = "This file is not a UTF-8 encoded text file."
-
         st.sidebar.header("Graph Options")
-        
+        extraction_profile = st.sidebar.selectbox(
+            "Extraction profile", list(EXTRACTION_PROFILES), index=0,
+            help="calls-only and structure skip the variable, return and exception edges while parsing, which keeps large graphs small.",
+        )
+
         # Node filter options
         st.sidebar.subheader("Filter Nodes")
         node_types = ["module", "class", "function", "method", "variable"]
@@ -233,17 +264,53 @@ def main():
         # Clustering option
         st.sidebar.subheader("Layout Options")
         cluster_modules = st.sidebar.checkbox("Cluster Modules", False)
+        precomputed_layout = st.sidebar.checkbox(
+            "Precomputed layout", False,
+            help="Lay the graph out once in Python and pin the nodes, so Graphviz only draws it. Much faster on large graphs, filters no longer move the nodes.",
+        )
+
+        # HTML export options
+        st.sidebar.subheader("Export Options")
+        precomputed_export = st.sidebar.checkbox("Precompute filter payload in HTML export", True)
+        inline_assets = st.sidebar.checkbox("Inline JS assets (works offline)", False, disabled=not precomputed_export)
+
+        # Diff options
+        st.sidebar.subheader("Diff Options")
+        full_file_diffs = st.sidebar.checkbox("Show full-file diffs", False)
+        diff_context = st.sidebar.number_input("Context lines around changes", min_value=0, max_value=50, value=3)
+
+        # LLM request options
+        st.sidebar.subheader("LLM Options")
+        llm_options = {
+            "max_concurrency": st.sidebar.number_input("Concurrent LLM requests", min_value=1, max_value=32, value=4),
+            "requests_per_second": st.sidebar.number_input("Max LLM requests per second (0 = unlimited)", min_value=0.0, value=0.0),
+            "max_retries": st.sidebar.number_input("Retries per LLM request", min_value=0, max_value=10, value=3),
+            "use_cache": st.sidebar.checkbox("Reuse cached LLM responses for unchanged code", True),
+            "pack_prompts": st.sidebar.checkbox("Pack several functions into one comment request", True),
+            "pack_token_budget": st.sidebar.number_input("Token budget per packed request", min_value=500, max_value=100000, value=6000, step=500),
+        }
 
-        code_graph = load_graph_data(uploaded_files_main)
+        # Instrumentation options
+        st.sidebar.subheader("Instrumentation")
+        track_memory = st.sidebar.checkbox("Track peak memory per stage (slower)", False)
 
-        query_engine = QueryEngine(code_graph)
-        dot_generator = DotGenerator()
+        upload_keys = tuple(upload_key(uploaded_file) for uploaded_file in uploaded_files_main)
+        profiler = get_profiler()
+        profiler.trace_memory = track_memory
+        code_graph, query_engine = load_code_graph(upload_keys, extraction_profile, uploaded_files_main, profiler)
+        source_accessor = query_engine.source_accessor
+        graph_key = (upload_keys, extraction_profile)
+        graph_filters = (tuple(selected_node_types), tuple(selected_edge_types))
 
         st.header("Code Graph Visualization")
-        dot_string = dot_generator.generate_dot(code_graph, node_filter=selected_node_types, edge_filter=selected_edge_types, cluster_modules=cluster_modules)
+        positions = compute_layout_cached(graph_key, code_graph, profiler) if precomputed_layout else None
+        dot_string = generate_dot_cached(graph_key, *graph_filters, cluster_modules, precomputed_layout, code_graph, source_accessor, positions, profiler)
         st.graphviz_chart(dot_string)
         
-        interactive_html = generate_interactive_html(dot_string, selected_node_types, selected_edge_types)
+        if precomputed_export:
+            interactive_html = export_interactive_html_cached(graph_key, *graph_filters, cluster_modules, inline_assets, precomputed_layout, code_graph, source_accessor, positions, profiler)
+        else:
+            interactive_html = generate_interactive_html(dot_string, selected_node_types, selected_edge_types)
         st.download_button(
             label="Download Graph as Interactive HTML",
             data=interactive_html,
@@ -252,7 +319,7 @@ def main():
         )
 
         st.header("Mark Map Visualization")
-        markmap_json = convert_dot_to_markmap_json(dot_string)
+        markmap_json = generate_markmap_cached(graph_key, graph_filters[0], code_graph, profiler)
         markmap_html = f'''
         <!DOCTYPE html>
         <html>
@@ -289,12 +356,24 @@ def main():
         st.header("Look for Optimizing Opportunities")
         if st.button("Click to Analyze the Code"):
             with st.spinner("Analyzing code for optimizations..."):
-                client = HorizonLLMClient()
+                progress = st.progress(0.0)
+                dispatcher = make_llm_dispatcher(llm_options, progress)
+                model = client_model_name(dispatcher.client)
+                prompts = {}
+                cache_keys = {}
+                for file_name in source_accessor.files():
+                    original_code = current_code(file_name, source_accessor)
+                    prompts[file_name] = build_optimization_prompt(original_code)
+                    cache_keys[file_name] = LLMResponseCache.make_key(model, "optimization", OPTIMIZATION_PROMPT_VERSION, original_code)
+                responses, errors = dispatcher.run(prompts, cache_keys)
+                st.info(f"Analyzed {dispatcher.dispatched} of {len(prompts)} files, the rest were reused from the response cache.")
+                for file_name, error in errors.items():
+                    st.warning(f"Could not analyze {file_name}: {error}")
+
                 st.session_state.optimized_code = {}
-                for file_name, original_code in st.session_state.code_contents.items():
-                    response = client.get_chat_response(
-                        user_msg=f"Please analyze the following Python code and suggest optimizations such as parallel computing, reducing time or space complexity:\n\n```python\n{original_code}\n```")
+                for file_name, response in responses.items():
                     full_text = response["model_answer"]
+                    original_code = current_code(file_name, source_accessor)
 
                     match = re.search(r"```python\n(.*?)\n```", full_text, re.DOTALL)
                     optimized_code = match.group(1).strip() if match else original_code
@@ -303,15 +382,21 @@ def main():
         if st.session_state.optimized_code:
             for file_name, optimized_code in st.session_state.optimized_code.items():
                 st.subheader(f"Optimized Code for {file_name}:")
-                st.text_area("Original Code", st.session_state.code_contents[file_name], height=300, key=f"original_opt_{file_name}")
+                st.text_area("Original Code", current_code(file_name, source_accessor), height=300, key=f"original_opt_{file_name}")
                 st.text_area("Optimized Code", optimized_code, height=300, key=f"optimized_{file_name}")
                 if st.button(f"Show Diff for {file_name}", key=f"opt_{file_name}"):
                     st.session_state.show_diff_opt[file_name] = not st.session_state.show_diff_opt.get(file_name, False)
                 
                 if st.session_state.show_diff_opt.get(file_name, False):
-                    original_code = st.session_state.code_contents[file_name]
+                    original_code = current_code(file_name, source_accessor)
                     diff_viewer = CodeDiffViewer(original_code, optimized_code)
-                    diff_viewer.show_diff()
+                    diff_viewer.show_diff(hunks_only=not full_file_diffs, context=diff_context)
+
+                if file_name.endswith(".py") and st.button(f"Show Structural Diff for {file_name}", key=f"graph_opt_{file_name}"):
+                    st.session_state.show_graph_diff[("opt", file_name)] = not st.session_state.show_graph_diff.get(("opt", file_name), False)
+
+                if st.session_state.show_graph_diff.get(("opt", file_name), False):
+                    show_structural_diff(file_name, current_code(file_name, source_accessor), optimized_code)
 
             if st.button("Apply Optimizations"):
                 st.session_state.code_contents.update(st.session_state.optimized_code)
@@ -322,88 +407,73 @@ def main():
         st.header("Generate Function Comments")
         if st.button("Generate Comments"):
             with st.spinner("Generating comments..."):
-                client = HorizonLLMClient()
                 st.session_state.commented_code = {}
-                for file_name, original_code in st.session_state.code_contents.items():
+                progress = st.progress(0.0)
+                dispatcher = make_llm_dispatcher(llm_options, progress)
+                model = client_model_name(dispatcher.client)
+                trees = {}
+                prompts = {}
+                functions = {}
+                cache_keys = {}
+                batch_cache_keys = {}
+                for file_name in source_accessor.files():
                     if not file_name.endswith(".py"):
                         continue
+                    original_code = current_code(file_name, source_accessor)
                     try:
                         tree = ast.parse(original_code)
                     except SyntaxError:
                         st.warning(f"Could not parse {file_name}. Skipping.")
                         continue
-
-                    
-                    
-                    class DocstringAdder(ast.NodeTransformer):
-                        def visit_FunctionDef(self, node):
-                            function_code = ast.get_source_segment(original_code, node)
-                            print(file_name)
-                            
-                            response = client.get_chat_response(
-                                # user_msg=f"Explain what the following Python function does and your explanation should be in markdown format. add sections :\n\n```python\n{function_code}\n```")
-                                user_msg = (
-                                    f"You are a technical documentation assistant. Please analyze the following Python function and generate a comprehensive explanation in **Markdown format**. "
-                                    "ensure that every new line you have generated must and should be a markdown line"
-                                    f"This is the Python code:\n\n```python\n{function_code}\n```\n\n"
-                                    f"that function code is from the {file_name} file"
-                                    "The explanation should be structured into the following sections for clarity and ease of documentation:\n\n"
-                                    "## write function name here\n\n"
-                                    "### Function Code\n"
-                                    f"```python\n{function_code}\n```\n\n"
-                                    "### Purpose\n"
-                                    "- Describe what the function is intended to do.\n\n"
-                                    "### Parameters\n"
-                                    "- List and explain each parameter, including type and role.\n\n"
-                                    "### Return Value\n"
-                                    "- Describe the return value, including type and meaning.\n\n"
-                                    "### Internal Logic\n"
-                                    "- Provide a step-by-step breakdown of how the function works.\n\n"
-                                    "### Edge Cases & Assumptions\n"
-                                    "- Mention any assumptions made and edge cases handled or not handled.\n\n"
-                                    "### Usage Example\n"
-                                    "- Include a sample usage of the function.\n\n"
-                                    "### Additional Notes\n"
-                                    "- Add any relevant insights, performance considerations, or limitations.\n\n"
-                                    "Ensure the entire response is in Markdown format and suitable for inclusion in technical documentation, but do **not** wrap the entire response in a Markdown code block."
-                                    "ensure that you write the name of the function before writing purpose of the function"
-                                ))
-
-
-                            comment = response["model_answer"]
-                            st.session_state.generated_comments.append({"file_name": file_name, "comment": comment})
-
-                            
-                            docstring = ast.Expr(value=ast.Constant(value=comment))
-
-                            
-                            if (
-                                node.body
-                                and isinstance(node.body[0], ast.Expr)
-                                and isinstance(node.body[0].value, ast.Constant)
-                            ):
-                                node.body[0] = docstring
-                            else:
-                                node.body.insert(0, docstring)
-                            
-                            return node
-
-                    new_tree = DocstringAdder().visit(tree)
+                    trees[file_name] = tree
+                    # Byte offsets slice each function out directly, instead of re-splitting the file per function
+                    code_bytes = original_code.encode("utf-8")
+                    line_starts = line_start_offsets(code_bytes)
+                    for node in collect_commentable_functions(tree):
+                        start_offset, end_offset = node_offsets(line_starts, node)
+                        function_code = code_bytes[start_offset:end_offset].decode("utf-8")
+                        prompts[(file_name, id(node))] = build_comment_prompt(function_code, file_name)
+                        functions[(file_name, id(node))] = (file_name, function_code)
+                        cache_keys[(file_name, id(node))] = LLMResponseCache.make_key(model, "comment", COMMENT_PROMPT_VERSION, file_name, function_code)
+                        batch_cache_keys[(file_name, id(node))] = LLMResponseCache.make_key(model, "comment_batch", BATCH_COMMENT_PROMPT_VERSION, file_name, function_code)
+
+                if llm_options["pack_prompts"]:
+                    packer = PromptPacker(token_budget=llm_options["pack_token_budget"])
+                    responses, errors = run_packed_comments(dispatcher, functions, cache_keys, packer, batch_cache_keys)
+                else:
+                    responses, errors = dispatcher.run(prompts, cache_keys)
+                st.info(f"Sent {dispatcher.dispatched} LLM requests for {len(prompts)} functions, the rest were reused from the response cache.")
+                if errors:
+                    st.warning(f"{len(errors)} functions could not be commented and were left unchanged.")
+
+                for file_name, tree in trees.items():
+                    comments = {}
+                    for (response_file, node_key), response in responses.items():
+                        if response_file == file_name:
+                            comments[node_key] = response["model_answer"]
+                            st.session_state.generated_comments.append({"file_name": file_name, "comment": response["model_answer"]})
+                    new_tree = DocstringAdder(comments).visit(tree)
                     modified_code = ast.unparse(new_tree)
                     st.session_state.commented_code[file_name] = modified_code
 
         if st.session_state.commented_code:
             for file_name, commented_code in st.session_state.commented_code.items():
                 st.subheader(f"Proposed changes for {file_name}:")
-                st.text_area("Original Code", st.session_state.code_contents[file_name], height=300, key=f"original_comment_{file_name}")
+                st.text_area("Original Code", current_code(file_name, source_accessor), height=300, key=f"original_comment_{file_name}")
                 st.text_area("Code with Comments", commented_code, height=300, key=f"commented_{file_name}")
                 if st.button(f"Show Diff for {file_name}", key=f"comment_{file_name}"):
                     st.session_state.show_diff_comment[file_name] = not st.session_state.show_diff_comment.get(file_name, False)
 
                 if st.session_state.show_diff_comment.get(file_name, False):
-                    original_code = st.session_state.code_contents[file_name]
+                    original_code = current_code(file_name, source_accessor)
                     diff_viewer = CodeDiffViewer(original_code, commented_code)
-                    diff_viewer.show_diff()
+                    diff_viewer.show_diff(hunks_only=not full_file_diffs, context=diff_context)
+
+                if st.button(f"Show Structural Diff for {file_name}", key=f"graph_comment_{file_name}"):
+                    st.session_state.show_graph_diff[("comment", file_name)] = not st.session_state.show_graph_diff.get(("comment", file_name), False)
+
+                if st.session_state.show_graph_diff.get(("comment", file_name), False):
+                    show_structural_diff(file_name, current_code(file_name, source_accessor), commented_code)
 
             if st.button("Apply Comments"):
                 st.session_state.code_contents.update(st.session_state.commented_code)
@@ -459,74 +529,59 @@ def main():
                 mime="application/zip",
             )
 
-def analyze_log_file(log_contents, codebase_path):
-    if "traceback" in log_contents.lower():
-        traceback_lines = []
-        in_traceback = False
-        for line in log_contents.splitlines():
-            if "traceback (most recent call last)" in line.lower():
-                traceback_lines = [line]
-                in_traceback = True
-            elif in_traceback:
-                traceback_lines.append(line)
-
-        problem = "\n".join(traceback_lines)
-
-        # Extract file and line number from traceback
-        file_path_match = re.search(r'file \"(.*?)\", line', problem, re.IGNORECASE)
-        line_number_match = re.search(r'line (\d+)', problem, re.IGNORECASE)
-
-        if file_path_match and line_number_match:
-            file_path_from_traceback = file_path_match.group(1)
-            line_number = int(line_number_match.group(1))
-            
-            # Find the file in the uploaded codebase
-            found_file_path = None
-            for root, dirs, files in os.walk(codebase_path):
-                if os.path.basename(file_path_from_traceback) in files:
-                    # A simple heuristic: if the end of the path matches, it's likely the correct file
-                    if root.endswith(os.path.dirname(file_path_from_traceback)):
-                        found_file_path = os.path.join(root, os.path.basename(file_path_from_traceback))
-                        break
-            
-            # If not found with the heuristic, just take the first match
-            if not found_file_path:
-                for root, dirs, files in os.walk(codebase_path):
-                    if os.path.basename(file_path_from_traceback) in files:
-                        found_file_path = os.path.join(root, os.path.basename(file_path_from_traceback))
-                        break
-
-            if found_file_path and os.path.exists(found_file_path):
-                with open(found_file_path, 'r') as f:
-                    code_lines = f.readlines()
-                
-                # Extract the relevant code snippet
-                start = max(0, line_number - 5)
-                end = min(len(code_lines), line_number + 5)
-                code_snippet = "".join(code_lines[start:end])
-
-                # Use HorizonLLMClient for analysis
-                client = HorizonLLMClient()
-                response = client.get_chat_response(
-                    user_msg=f"The following traceback was found in a log file:\n\n```\n{problem}\n```\n\nThe error occurred in the following code snippet\n\n```python\n{code_snippet}\n```\n\nPlease explain the error and suggest a solution."
-                )
-                solution = response["model_answer"]
-            else:
-                solution = "The file mentioned in the traceback was not found in the uploaded codebase."
-        else:
-            solution = "A traceback was found, but the file path and line number could not be extracted. A manual review is required."
-    else:
-        if "error" in log_contents.lower():
+        # Rendered last so it includes the stages measured during this run
+        show_stats_panel(profiler)
+
+def analyze_log_file(log_source, codebase_files, max_tracebacks=5):
+    file_index = SourceFileIndex(codebase_files)
+    report = LogAnalyzer(file_index).analyze(log_source)
+    tracebacks = report["tracebacks"]
+
+    if not tracebacks:
+        if report["error_lines"]:
             problem = "The log file contains the word 'error', but no traceback was found. Look for lines containing 'error' to identify the problem."
             solution = "Review the lines containing the word 'error' to understand the context of the problem."
-        elif "warning" in log_contents.lower():
+        elif report["warning_lines"]:
             problem = "The log file contains warnings. While not always critical, they might indicate potential issues."
             solution = "Review the warnings in the log file to see if they are relevant to the problem you are facing."
         else:
             problem = "No traceback or error keywords found in the log file."
             solution = "The log file does not seem to contain any obvious errors. The problem might be more subtle. A manual review of the log file is recommended."
-            
-    return problem, solution
+        return [(problem, solution)]
+
+    client = None
+    results = []
+    for group in tracebacks[:max_tracebacks]:
+        problem = LogAnalyzer.format_traceback(group)
+        if group["count"] > 1:
+            problem = f"(seen {group['count']} times)\n{problem}"
+
+        # The innermost frame that belongs to the uploaded codebase is the most relevant one
+        frame = next((f for f in reversed(group["frames"]) if f.get("resolved_path")), None)
+        if frame is None:
+            if group["frames"]:
+                solution = "The file mentioned in the traceback was not found in the uploaded codebase."
+            else:
+                solution = "A traceback was found, but the file path and line number could not be extracted. A manual review is required."
+            results.append((problem, solution))
+            continue
+
+        code_lines = codebase_files[frame["resolved_path"]].decode("utf-8", errors="replace").splitlines(keepends=True)
+        start = max(0, frame["line"] - 5)
+        end = min(len(code_lines), frame["line"] + 5)
+        code_snippet = "".join(code_lines[start:end])
+
+        # Use HorizonLLMClient for analysis
+        if client is None:
+            client = HorizonLLMClient()
+        response = client.get_chat_response(
+            user_msg=f"The following traceback was found in a log file:\n\n```\n{problem}\n```\n\nThe error occurred in the following code snippet\n\n```python\n{code_snippet}\n```\n\nPlease explain the error and suggest a solution."
+        )
+        results.append((problem, response["model_answer"]))
+
+    if len(tracebacks) > max_tracebacks:
+        results.append((f"{len(tracebacks) - max_tracebacks} more distinct tracebacks were found.", "Fix the most frequent tracebacks above first, then re-run the analysis."))
+    return results
 
 if __name__ == "__main__":
     main()
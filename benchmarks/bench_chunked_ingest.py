@@ -0,0 +1,57 @@
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synthetic_codebase import generate_codebase
+from src.cli.main import build_code_graph
+
+
+def traced_peak(build):
+    # (result, peak traced bytes during build, bytes still held afterwards)
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show that chunked ingestion keeps the memory above the finished graph flat as the codebase grows.")
+    parser.add_argument("--files", type=int, nargs="+", default=[100, 200, 400])
+    parser.add_argument("--functions-per-file", type=int, default=25)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--no-link", action="store_true",
+                        help="Skip linking, whose symbol table grows with the number of definitions, to see the batching alone.")
+    parser.add_argument("--check", type=float, metavar="RATIO",
+                        help="Fail unless the chunked overhead of the largest codebase is at most RATIO times that of the smallest.")
+    args = parser.parse_args()
+    overheads = {}
+
+    print(f"{'files':>6} {'mode':<10} {'graph MiB':>10} {'peak MiB':>9} {'overhead MiB':>13}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for files in args.files:
+            code_dir = os.path.join(work_dir, str(files))
+            generate_codebase(code_dir, files=files, functions_per_file=args.functions_per_file)
+            for mode, options in (("all", {}), ("chunked", {"batch_size": args.batch_size})):
+                graph, peak, size = traced_peak(lambda: build_code_graph(code_dir, link=not args.no_link, **options))
+                # The overhead is what the pipeline holds on top of the graph it returns
+                print(f"{files:>6} {mode:<10} {size / 2 ** 20:>10.2f} {peak / 2 ** 20:>9.2f} {(peak - size) / 2 ** 20:>13.2f}")
+                overheads[(files, mode)] = peak - size
+                del graph
+
+    if args.check is not None:
+        smallest, largest = min(args.files), max(args.files)
+        first, last = overheads[(smallest, "chunked")], overheads[(largest, "chunked")]
+        if last > args.check * first:
+            sys.exit(f"Chunked overhead grew from {first / 2 ** 20:.2f} MiB at {smallest} files to "
+                     f"{last / 2 ** 20:.2f} MiB at {largest} files, more than {args.check}x")
+        print(f"Chunked overhead stayed within {args.check}x from {smallest} to {largest} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import networkx as nx
+from synthetic_codebase import generate_codebase
+from src.parser.python_parser import PythonCodeParser
+from src.graph.graph_builder import GraphBuilder
+
+
+def traced_size(build):
+    tracemalloc.start()
+    graph = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return graph, size
+
+
+def build_multigraph(parsed):
+    # One edge per occurrence, which is what a MultiDiGraph needs to keep every line
+    graph = nx.MultiDiGraph()
+    for node_data in parsed["nodes"]:
+        graph.add_node(node_data["id"], **{key: value for key, value in node_data.items() if key != "id"})
+    for edge_data in parsed["edges"]:
+        for line in edge_data["lines"] or [edge_data["line_number"]]:
+            graph.add_edge(edge_data["source"], edge_data["target"], type=edge_data["type"], line_number=line)
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the memory of aggregated edges with a MultiDiGraph holding every occurrence.")
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--functions-per-file", type=int, default=20)
+    parser.add_argument("--call-density", type=int, default=6)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = generate_codebase(work_dir, files=args.files, functions_per_file=args.functions_per_file,
+                                  call_density=args.call_density)
+        parsed = {"nodes": [], "edges": []}
+        for path in paths:
+            data = PythonCodeParser(path).parse()
+            parsed["nodes"].extend(data["nodes"])
+            parsed["edges"].extend(data["edges"])
+
+    occurrences = sum(edge["count"] for edge in parsed["edges"])
+    aggregated, aggregated_size = traced_size(lambda: GraphBuilder().build_graph(parsed))
+    multi, multi_size = traced_size(lambda: build_multigraph(parsed))
+    print(f"{len(parsed['edges'])} distinct edges for {occurrences} occurrences")
+    print(f"{'graph':<12} {'edges':>8} {'MiB':>8}")
+    print(f"{'aggregated':<12} {aggregated.number_of_edges():>8} {aggregated_size / 2 ** 20:>8.2f}")
+    print(f"{'multigraph':<12} {multi.number_of_edges():>8} {multi_size / 2 ** 20:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synthetic_codebase import generate_codebase
+from src.parser.python_parser import EXTRACTION_PROFILES, PythonCodeParser
+from src.graph.graph_builder import GraphBuilder
+
+
+def parse_with_profile(paths, profile):
+    parsed = {"nodes": [], "edges": []}
+    start = time.perf_counter()
+    for path in paths:
+        data = PythonCodeParser(path, profile=profile).parse()
+        parsed["nodes"].extend(data["nodes"])
+        parsed["edges"].extend(data["edges"])
+    parse_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    graph = GraphBuilder().build_graph(parsed)
+    return graph, parse_seconds, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report graph size and parse time saved by each extraction profile.")
+    parser.add_argument("--codebase", help="Directory of Python files, defaults to a generated synthetic codebase.")
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--functions-per-file", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        if args.codebase:
+            paths = [os.path.join(root, file) for root, _, files in os.walk(args.codebase) for file in files if file.endswith(".py")]
+        else:
+            paths = generate_codebase(work_dir, files=args.files, functions_per_file=args.functions_per_file)
+
+        results = {profile: parse_with_profile(paths, profile) for profile in EXTRACTION_PROFILES}
+
+    full_graph, full_parse, full_build = results["full"]
+    print(f"{'profile':<11} {'nodes':>8} {'edges':>8} {'parse s':>9} {'build s':>9} {'nodes saved':>12} {'edges saved':>12} {'time saved':>11}")
+    for profile, (graph, parse_seconds, build_seconds) in results.items():
+        nodes, edges = graph.number_of_nodes(), graph.number_of_edges()
+        saved_time = 1 - (parse_seconds + build_seconds) / (full_parse + full_build)
+        print(f"{profile:<11} {nodes:>8} {edges:>8} {parse_seconds:>9.3f} {build_seconds:>9.3f} "
+              f"{1 - nodes / full_graph.number_of_nodes():>12.0%} {1 - edges / full_graph.number_of_edges():>12.0%} {saved_time:>11.0%}")
+
+
+if __name__ == "__main__":
+    main()
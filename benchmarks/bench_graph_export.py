@@ -0,0 +1,59 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import networkx as nx
+from synthetic_codebase import generate_codebase
+from src.cli.main import build_code_graph
+from src.graph.graph_export import GraphExporter
+
+
+def peak_of(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def networkx_json(graph, path):
+    data = nx.node_link_data(graph, edges="edges")
+    data["nodes"] = [{key: (value.tolist() if hasattr(value, "tolist") else value) for key, value in node.items()} for node in data["nodes"]]
+    data["edges"] = [{key: (value.tolist() if hasattr(value, "tolist") else value) for key, value in edge.items()} for edge in data["edges"]]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(data))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of the streaming graph exporters against building the output in memory.")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--functions-per-file", type=int, default=25)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        generate_codebase(work_dir, files=args.files, functions_per_file=args.functions_per_file)
+        graph = build_code_graph(work_dir)
+        exporter = GraphExporter(chunk_size=args.chunk_size)
+        out = os.path.join(work_dir, "out")
+        rows = [
+            ("json, in memory", lambda: networkx_json(graph, out)),
+            ("json, streamed", lambda: exporter.write_json(graph, out)),
+            ("graphml, streamed", lambda: exporter.write_graphml(graph, out)),
+        ]
+        print(f"{graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+        print(f"{'':<20} {'seconds':>8} {'peak MiB':>9}")
+        for name, func in rows:
+            seconds, peak = peak_of(func)
+            print(f"{name:<20} {seconds:>8.3f} {peak / 2 ** 20:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import ast
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synthetic_codebase import generate_codebase
+from bench_record_memory import traced_size
+from src.parser.python_parser import PythonCodeParser
+from src.parser.source_accessor import SourceAccessor, line_start_offsets, node_offsets
+from src.graph.graph_builder import GraphBuilder
+
+
+def build(paths, inline_docstrings):
+    parsed = {"nodes": [], "edges": []}
+    for path in paths:
+        data = PythonCodeParser(path, inline_docstrings=inline_docstrings).parse()
+        parsed["nodes"].extend(data["nodes"])
+        parsed["edges"].extend(data["edges"])
+    return GraphBuilder().build_graph(parsed)
+
+
+def segments_by_get_source_segment(sources):
+    for source, tree in sources:
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef):
+                ast.get_source_segment(source, node)
+
+
+def segments_by_offsets(sources):
+    for source, tree in sources:
+        data = source.encode("utf-8")
+        line_starts = line_start_offsets(data)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef):
+                start, end = node_offsets(line_starts, node)
+                data[start:end].decode("utf-8")
+
+
+def best_of(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inline docstrings with offset-based lazy source loading.")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--functions-per-file", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = generate_codebase(work_dir, files=args.files, functions_per_file=args.functions_per_file)
+
+        inline_graph, inline_size = traced_size(lambda: build(paths, True))
+        lazy_graph, lazy_size = traced_size(lambda: build(paths, False))
+        print(f"{args.files} files, {inline_graph.number_of_nodes()} nodes")
+        print(f"graph with inline docstrings  {inline_size / 2 ** 20:8.2f} MiB")
+        print(f"graph with docstring offsets  {lazy_size / 2 ** 20:8.2f} MiB")
+
+        sources = []
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                source = f.read()
+            sources.append((source, ast.parse(source)))
+        print(f"function segments, ast.get_source_segment  {best_of(lambda: segments_by_get_source_segment(sources), args.repeat) * 1000:8.1f} ms")
+        print(f"function segments, byte offsets            {best_of(lambda: segments_by_offsets(sources), args.repeat) * 1000:8.1f} ms")
+
+        functions = [data for _, data in lazy_graph.nodes(data=True) if data.get("type") == "function"]
+        accessor = SourceAccessor()
+        cold = best_of(lambda: [accessor.node_source(node) for node in functions], 1)
+        warm = best_of(lambda: [accessor.node_source(node) for node in functions[-accessor.cache_size:]], args.repeat)
+        print(f"SourceAccessor, {len(functions)} function sources (cold)  {cold * 1000:8.1f} ms")
+        print(f"SourceAccessor, {accessor.cache_size} cached sources (warm)   {warm * 1000:8.1f} ms")
+        accessor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.llm.dispatcher import LLMDispatcher
+from src.llm.fake_client import FakeLLMClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure LLM dispatcher throughput against the offline fake client.")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per fake LLM call.")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--requests-per-second", type=float, default=None)
+    args = parser.parse_args()
+
+    prompts = {i: f"prompt {i}" for i in range(args.requests)}
+    print(f"{'workers':>8} {'seconds':>9} {'req/s':>8} {'ok':>5} {'failed':>7} {'calls':>6}")
+    for workers in args.concurrency:
+        client = FakeLLMClient(args.latency, args.jitter, args.failure_rate, seed=0)
+        dispatcher = LLMDispatcher(client, max_concurrency=workers, requests_per_second=args.requests_per_second,
+                                   max_retries=3, backoff=0.05)
+        start = time.perf_counter()
+        responses, errors = dispatcher.run(prompts)
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>8} {elapsed:>9.2f} {args.requests / elapsed:>8.1f} {len(responses):>5} {len(errors):>7} {client.calls:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import networkx as nx
+from src.graph.dot_generator import DotGenerator
+from src.graph.markmap_builder import MarkmapBuilder, convert_dot_to_markmap_json
+
+
+def build_dense_graph(num_modules, functions_per_module, calls_per_function, seed=0):
+    rng = random.Random(seed)
+    graph = nx.DiGraph()
+    function_ids = []
+    for m in range(num_modules):
+        module_id = f"mod_{m}.py"
+        graph.add_node(module_id, type="module", name=f"mod_{m}")
+        for f in range(functions_per_module):
+            function_id = f"{module_id}:func_{f}"
+            graph.add_node(function_id, type="function", name=f"func_{f}", docstring=None)
+            graph.add_edge(module_id, function_id, type="CONTAINS")
+            function_ids.append(function_id)
+    for function_id in function_ids:
+        for target in rng.sample(function_ids, min(calls_per_function, len(function_ids))):
+            if target != function_id:
+                graph.add_edge(function_id, target, type="CALLS")
+    return graph
+
+
+def time_call(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the DOT-based and graph-based Markmap builders.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--functions-per-module", type=int, default=20)
+    parser.add_argument("--calls-per-function", type=int, default=3)
+    parser.add_argument("--legacy-max-nodes", type=int, default=1500,
+                        help="Skip the legacy builder above this many nodes, it is exponential on dense graphs.")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    dot_generator = DotGenerator()
+    builder = MarkmapBuilder()
+    print(f"{'modules':>8} {'nodes':>8} {'edges':>8} {'legacy (s)':>12} {'direct (s)':>12}")
+    for size in args.sizes:
+        graph = build_dense_graph(size, args.functions_per_module, args.calls_per_function)
+        # The legacy path only gets the CONTAINS edges, with CALLS edges included it does not finish
+        legacy_edges = ["CONTAINS"]
+
+        def legacy():
+            convert_dot_to_markmap_json(dot_generator.generate_dot(graph, edge_filter=legacy_edges))
+
+        def direct():
+            builder.to_json(graph)
+
+        legacy_time = "skipped"
+        if graph.number_of_nodes() <= args.legacy_max_nodes:
+            legacy_time = f"{time_call(legacy, args.repeat):.4f}"
+        direct_time = f"{time_call(direct, args.repeat):.4f}"
+        print(f"{size:>8} {graph.number_of_nodes():>8} {graph.number_of_edges():>8} {legacy_time:>12} {direct_time:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import networkx as nx
+from synthetic_codebase import generate_codebase
+from src.parser.python_parser import PythonCodeParser
+from src.graph.graph_builder import GraphBuilder
+
+
+def traced_size(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def parse_all(paths):
+    parsed = {"nodes": [], "edges": []}
+    for path in paths:
+        data = PythonCodeParser(path).parse()
+        parsed["nodes"].extend(data["nodes"])
+        parsed["edges"].extend(data["edges"])
+    return parsed
+
+
+
+
+def build_dict_graph(parsed):
+    graph = nx.DiGraph()
+    for node_data in parsed["nodes"]:
+        graph.add_node(node_data["id"], **{key: value for key, value in node_data.items() if key != "id"})
+    for edge_data in parsed["edges"]:
+        graph.add_edge(edge_data["source"], edge_data["target"],
+                       **{key: value for key, value in edge_data.items() if key != "source" and key != "target"})
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the memory of slotted node/edge records with plain dicts.")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--functions-per-file", type=int, default=25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = generate_codebase(work_dir, files=args.files, functions_per_file=args.functions_per_file)
+        parsed = parse_all(paths)
+
+    # The copies share the strings and line arrays of the parse, so only the containers are measured
+    dicts = {"nodes": [dict(node) for node in parsed["nodes"]], "edges": [dict(edge) for edge in parsed["edges"]]}
+    rows = []
+    for kind in ("nodes", "edges"):
+        _, record_size = traced_size(lambda: [item.copy() for item in parsed[kind]])
+        _, dict_size = traced_size(lambda: [dict(item) for item in parsed[kind]])
+        rows.append((f"parsed {kind}", len(parsed[kind]), record_size, dict_size))
+    record_graph, record_graph_size = traced_size(lambda: GraphBuilder().build_graph(parsed))
+    _, dict_graph_size = traced_size(lambda: build_dict_graph(dicts))
+    rows.append(("graph", record_graph.number_of_nodes() + record_graph.number_of_edges(), record_graph_size, dict_graph_size))
+
+    print(f"{args.files} files")
+    print(f"{'':<14} {'items':>8} {'records MiB':>12} {'dicts MiB':>10} {'saved per item':>15}")
+    for name, items, record_size, dict_size in rows:
+        print(f"{name:<14} {items:>8} {record_size / 2 ** 20:>12.2f} {dict_size / 2 ** 20:>10.2f} "
+              f"{(dict_size - record_size) / items:>13.0f} B")
+
+
+if __name__ == "__main__":
+    main()
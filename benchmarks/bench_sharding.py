@@ -0,0 +1,65 @@
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synthetic_codebase import generate_codebase
+from bench_record_memory import traced_size
+from src.cli.main import build_code_graph
+from src.graph.sharding import ShardedGraph
+from src.query_engine.query_engine import QueryEngine, ShardedQueryEngine
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a single pickled graph with a package-sharded graph for one-package queries.")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--packages", type=int, default=10)
+    parser.add_argument("--functions-per-file", type=int, default=25)
+    parser.add_argument("--memory-cap", type=float, default=None, metavar="MB")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        code_dir = os.path.join(work_dir, "code")
+        generate_codebase(code_dir, files=args.files, functions_per_file=args.functions_per_file, packages=args.packages)
+        graph = build_code_graph(code_dir)
+        whole_path = os.path.join(work_dir, "graph.pickle")
+        with open(whole_path, "wb") as f:
+            pickle.dump(graph, f, protocol=pickle.HIGHEST_PROTOCOL)
+        shard_dir = os.path.join(work_dir, "shards")
+        ShardedGraph.write(graph, shard_dir, root=code_dir)
+        del graph
+        # A function of the first package, every query below stays inside it
+        name = "func_0_0"
+
+        def query_whole():
+            with open(whole_path, "rb") as f:
+                engine = QueryEngine(pickle.load(f))
+            return engine, engine.find_callers_with_frequency(name), engine.get_node_details(name)
+
+        def query_sharded():
+            memory_cap = int(args.memory_cap * 2 ** 20) if args.memory_cap else None
+            engine = ShardedQueryEngine(ShardedGraph(shard_dir, memory_cap))
+            return engine, engine.find_callers_with_frequency(name), engine.get_node_details(name)
+
+        (_, whole_seconds), whole_size = traced_size(lambda: timed(query_whole))
+        (sharded, sharded_seconds), sharded_size = traced_size(lambda: timed(query_sharded))
+        engine = sharded[0]
+
+        print(f"{args.files} files in {args.packages} packages")
+        print(f"{'':<14} {'seconds':>8} {'MiB held':>9}")
+        print(f"{'whole graph':<14} {whole_seconds:>8.3f} {whole_size / 2 ** 20:>9.2f}")
+        print(f"{'sharded':<14} {sharded_seconds:>8.3f} {sharded_size / 2 ** 20:>9.2f}")
+        print(f"shards loaded: {engine.sharded_graph.loads} of {len(engine.sharded_graph.shards)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synthetic_codebase import generate_codebase
+from src.parser.python_parser import PythonCodeParser
+from src.graph.graph_builder import GraphBuilder
+from src.graph.symbol_linker import SymbolLinker
+from src.graph.dot_generator import DotGenerator
+from src.graph.layout import LayeredLayout
+from src.graph.markmap_builder import MarkmapBuilder, convert_dot_to_markmap_json
+from src.query_engine.query_engine import QueryEngine
+
+# Codebase generator arguments per scale
+SCALES = {
+    "small": {"files": 10, "functions_per_file": 10, "call_density": 3, "class_depth": 2, "imports_per_file": 2},
+    "medium": {"files": 50, "functions_per_file": 20, "call_density": 4, "class_depth": 3, "imports_per_file": 4},
+    "large": {"files": 200, "functions_per_file": 25, "call_density": 5, "class_depth": 4, "imports_per_file": 6},
+}
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def parse_files(paths):
+    parsed = {"nodes": [], "edges": []}
+    for path in paths:
+        data = PythonCodeParser(path).parse()
+        parsed["nodes"].extend(data["nodes"])
+        parsed["edges"].extend(data["edges"])
+    return parsed
+
+
+def query_benchmarks(query_engine, graph):
+    functions = [data for _, data in graph.nodes(data=True) if data.get("type") == "function"]
+    sample = functions[len(functions) // 2]
+    file_name = os.path.basename(sample["file_path"])
+    return {
+        "query.find_functions_in_file": lambda: query_engine.find_functions_in_file(file_name),
+        "query.find_callers_of_function": lambda: query_engine.find_callers_of_function(sample["name"]),
+        "query.find_functions_called_by": lambda: query_engine.find_functions_called_by(sample["name"]),
+        "query.get_node_details": lambda: query_engine.get_node_details(sample["name"]),
+        "query.find_nodes_reading_var": lambda: query_engine.find_nodes_reading_var("total"),
+        "query.find_nodes_writing_var": lambda: query_engine.find_nodes_writing_var("total"),
+        "query.find_nodes_throwing_exception": query_engine.find_nodes_throwing_exception,
+        "query.find_nodes_handling_exception": query_engine.find_nodes_handling_exception,
+        "query.find_nodes_with_decorator": lambda: query_engine.find_nodes_with_decorator("cached"),
+        "query.find_nodes_returning_value": query_engine.find_nodes_returning_value,
+        "query.find_nodes_using_service": lambda: query_engine.find_nodes_using_service("snowflake_connection"),
+        "query.find_enclosing_node": lambda: query_engine.find_enclosing_node(sample["file_path"], sample["line_number"] + 1),
+        "query.query_page.returners": lambda: query_engine.query_page("returners", limit=20),
+        "query.count_query.returners": lambda: query_engine.count_query("returners"),
+        "query.count_query.readers": lambda: query_engine.count_query("readers", "total"),
+    }
+
+
+def measure(func, repeat):
+    # Fast calls are looped until a run takes ~0.2s, so microsecond queries are not just timer noise
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    times = [elapsed / number for elapsed in timer.repeat(number=number, repeat=repeat)]
+    return {"min": min(times), "median": statistics.median(times), "number": number, "repeat": repeat}
+
+
+def run_scale(scale, params, repeat, work_dir):
+    paths = generate_codebase(os.path.join(work_dir, scale), seed=0, **params)
+    parsed = SymbolLinker().link(parse_files(paths))
+    graph = GraphBuilder().build_graph(parsed)
+    query_engine = QueryEngine(graph)
+    query_engine.build_indexes()
+    dot_generator = DotGenerator()
+    # The legacy Markmap conversion only gets the CONTAINS hierarchy, with call edges it does not finish
+    contains_dot = dot_generator.generate_dot(graph, edge_filter=["CONTAINS"])
+
+    benchmarks = {
+        "parse": lambda: parse_files(paths),
+        "link_symbols": lambda: SymbolLinker().link(parsed),
+        "build_graph": lambda: GraphBuilder().build_graph(parsed),
+        **query_benchmarks(query_engine, graph),
+        "generate_dot": lambda: dot_generator.generate_dot(graph),
+        "layered_layout": lambda: LayeredLayout().compute(graph),
+        "convert_dot_to_markmap_json": lambda: convert_dot_to_markmap_json(contains_dot),
+        "markmap_builder": lambda: MarkmapBuilder().to_json(graph),
+    }
+    results = {}
+    for name, func in benchmarks.items():
+        results[name] = measure(func, repeat)
+        print(f"{scale:<8} {name:<38} {results[name]['min']:>10.5f} {results[name]['median']:>10.5f}")
+    return {
+        "params": params,
+        "files": len(paths),
+        "nodes": graph.number_of_nodes(),
+        "edges": graph.number_of_edges(),
+        "benchmarks": results,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (revision {baseline.get('revision')}), ratio of min times:")
+    for scale, scale_result in current["scales"].items():
+        old_scale = baseline["scales"].get(scale)
+        if not old_scale:
+            continue
+        for name, result in scale_result["benchmarks"].items():
+            old = old_scale["benchmarks"].get(name)
+            if not old or not old["min"]:
+                continue
+            ratio = result["min"] / old["min"]
+            marker = "slower" if ratio > 1.1 else "faster" if ratio < 0.9 else ""
+            print(f"{scale:<8} {name:<38} {ratio:>7.2f}x {marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parsing, graph building, queries and exports on synthetic codebases.")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--results-dir", default=DEFAULT_RESULTS_DIR)
+    parser.add_argument("--name", help="File name of the result, defaults to the git revision and a timestamp.")
+    parser.add_argument("--compare", help="Earlier result JSON to compare against.")
+    args = parser.parse_args()
+
+    result = {
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scales": {},
+    }
+    print(f"{'scale':<8} {'benchmark':<38} {'min (s)':>10} {'median (s)':>10}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for scale in args.scales:
+            result["scales"][scale] = run_scale(scale, SCALES[scale], args.repeat, work_dir)
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    name = args.name or f"{result['revision'] or 'unknown'}-{time.strftime('%Y%m%d-%H%M%S')}"
+    result_path = os.path.join(args.results_dir, f"{name}.json")
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {result_path}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
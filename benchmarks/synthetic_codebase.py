@@ -0,0 +1,102 @@
+import argparse
+import os
+import random
+
+
+def _function_source(rng, name, callees, indent, decorated):
+    pad = " " * indent
+    lines = []
+    if decorated:
+        lines.append(f"{pad}@staticmethod" if indent else f"{pad}@cached")
+    lines.append(f"{pad}def {name}(value, items=None):")
+    lines.append(f'{pad}    """Synthetic function {name}."""')
+    lines.append(f"{pad}    total = value")
+    for callee in callees:
+        lines.append(f"{pad}    total = total + {callee}(total)")
+    if rng.random() < 0.3:
+        lines.append(f"{pad}    try:")
+        lines.append(f"{pad}        total = int(total)")
+        lines.append(f"{pad}    except ValueError:")
+        lines.append(f"{pad}        raise RuntimeError(\"bad value\")")
+    lines.append(f"{pad}    for item in items or []:")
+    lines.append(f"{pad}        total += item")
+    lines.append(f"{pad}    return total")
+    return lines
+
+
+def package_name(module_index, packages=1):
+    # Modules are dealt round-robin over the top-level packages, a single package is just "pkg"
+    return "pkg" if packages == 1 else f"pkg_{module_index % packages}"
+
+
+def generate_module(rng, module_index, files, functions_per_file, call_density, class_depth, imports_per_file, packages=1):
+    """Return the source of one synthetic module as a string."""
+    lines = [f'"""Synthetic module mod_{module_index}."""', "import os", "import json"]
+    others = [i for i in range(files) if i != module_index]
+    imported_names = []
+    for other in rng.sample(others, min(imports_per_file, len(others))):
+        lines.append(f"from {package_name(other, packages)}.mod_{other} import func_{other}_0")
+        imported_names.append(f"func_{other}_0")
+    lines += ["", "", "def cached(func):", "    return func", ""]
+
+    function_names = [f"func_{module_index}_{i}" for i in range(functions_per_file)]
+    # Imported functions are called like local ones, so the graph gets cross-module CALLS edges
+    callee_pool = function_names + imported_names
+    for i, name in enumerate(function_names):
+        callees = rng.sample(callee_pool, min(call_density, len(callee_pool)))
+        lines += _function_source(rng, name, callees, 0, decorated=i % 5 == 0)
+        lines.append("")
+
+    # A chain of classes, each inheriting from the previous one
+    for depth in range(class_depth):
+        base = f"(Base_{module_index}_{depth - 1})" if depth else ""
+        lines.append(f"class Base_{module_index}_{depth}{base}:")
+        lines.append(f'    """Synthetic class at depth {depth}."""')
+        lines.append(f"    level = {depth}")
+        lines.append("")
+        callees = rng.sample(callee_pool, min(call_density, len(callee_pool)))
+        lines += _function_source(rng, f"method_{depth}", callees, 4, decorated=depth % 2 == 1)
+        lines.append("")
+
+    lines += ["", 'if __name__ == "__main__":', f"    print({function_names[0]}(1))" if function_names else "    pass", ""]
+    return "\n".join(lines)
+
+
+def generate_codebase(out_dir, files=20, functions_per_file=10, call_density=3, class_depth=2, imports_per_file=3, seed=0,
+                      packages=1):
+    """Write a deterministic synthetic codebase into out_dir and return the file paths.
+
+    The same arguments and seed always produce byte-identical files, so
+    benchmark results from different runs are comparable.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for module_index in range(files):
+        package_dir = os.path.join(out_dir, package_name(module_index, packages))
+        os.makedirs(package_dir, exist_ok=True)
+        path = os.path.join(package_dir, f"mod_{module_index}.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(generate_module(rng, module_index, files, functions_per_file, call_density, class_depth, imports_per_file, packages))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic Python codebase for benchmarking.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--functions-per-file", type=int, default=10)
+    parser.add_argument("--call-density", type=int, default=3, help="Calls made by every function.")
+    parser.add_argument("--class-depth", type=int, default=2, help="Length of the inheritance chain per module.")
+    parser.add_argument("--imports-per-file", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--packages", type=int, default=1, help="Top-level packages the modules are spread over, for monorepo-like layouts.")
+    args = parser.parse_args()
+
+    paths = generate_codebase(args.out_dir, args.files, args.functions_per_file, args.call_density,
+                              args.class_depth, args.imports_per_file, args.seed, args.packages)
+    print(f"Wrote {len(paths)} files to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,358 @@
+import argparse
 import os
 import sys
+import time
+import zipfile
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from src.parser.python_parser import PythonCodeParser
-from src.graph.graph_builder import GraphBuilder
-from src.query_engine.query_engine import QueryEngine
+from src.parser.python_parser import EDGE_TYPES, EXTRACTION_PROFILES, PythonCodeParser
+from src.parser.service_detectors import ServiceRegistry
+from src.parser.archive_parser import iter_zip_members
+from src.parser.source_accessor import SourceAccessor
+from src.graph.graph_builder import ChunkedGraphBuilder, GraphBuilder
+from src.graph.symbol_linker import SymbolLinker
+from src.graph.sharding import ShardedGraph
+from src.graph.graph_export import EXPORT_FORMATS, GraphExporter
+from src.graph.layout import LayoutCache
+from src.indexing.git_index import GitError, GitIncrementalIndexer, IndexSnapshot
+from src.query_engine.query_engine import QueryEngine, ShardedQueryEngine
 from src.graph.dot_generator import DotGenerator
+from src.diff_viewer.graph_diff import GraphDiff
+from src.instrumentation.profiler import PipelineProfiler
 
 CODEBASE_PATH = "/data/data/com.termux/files/home/graph_rag_code_understanding/codebase_example"
 
 # Placeholder for Groq API Key - Replace with your actual key
 GROQ_API_KEY = "YOUR_GROQ_API_KEY_HERE"
 
-def main():
-    print("Building code graph...")
-    all_parsed_data = {"nodes": [], "edges": []}
-    
-    for root, _, files in os.walk(CODEBASE_PATH):
-        for file in files:
-            if file.endswith(".py"):
-                file_path = os.path.join(root, file)
-                parser = PythonCodeParser(file_path)
+# Results shown per answer of a paged query, 'more' shows the next ones
+PAGE_SIZE = 20
+
+def iter_parsed_files(codebase_path, profiler, profile="full", enable=(), disable=(), source_accessor=None, services=None):
+    # Yields the parsed records of one file at a time, the file's AST is gone by the time they are yielded
+    with profiler.stage("scan"):
+        if zipfile.is_zipfile(codebase_path):
+            # Members are read lazily while parsing
+            sources = iter_zip_members(codebase_path, suffixes=(".py",))
+        else:
+            sources = []
+            for root, _, files in os.walk(codebase_path):
+                for file in files:
+                    if file.endswith(".py"):
+                        sources.append((os.path.join(root, file), None))
+
+    for file_path, source in sources:
+        start = time.perf_counter()
+        with profiler.stage("parse"):
+            try:
+                parser = PythonCodeParser(file_path, source=source, profile=profile, enable=enable, disable=disable,
+                                          inline_docstrings=source_accessor is None, services=services)
                 parsed_data = parser.parse()
-                all_parsed_data["nodes"].extend(parsed_data["nodes"])
-                all_parsed_data["edges"].extend(parsed_data["edges"])
-
-    graph_builder = GraphBuilder()
-    code_graph = graph_builder.build_graph(all_parsed_data)
-    query_engine = QueryEngine(code_graph)
-    dot_generator = DotGenerator()
-    print(f"Graph built with {len(code_graph.nodes)} nodes and {len(code_graph.edges)} edges.")
-
-    print("\nAsk questions about the codebase (e.g., 'functions in example_module.py', 'callers of main', 'details of greet'):")
-    print("New queries: 'readers of <var_name>', 'writers of <var_name>', 'throwers', 'handlers', 'decorated by <decorator_name>', 'returners', 'uses <service_name>'.")
-    print("Type 'generate dot' to create a DOT file for visualization.")
+            except (SyntaxError, ValueError) as e:
+                print(f"Skipped {file_path}: {e}")
+                continue
+        if source_accessor is not None and source is not None:
+            # Zip members have no file to map, their bytes are kept instead
+            source_accessor.add_source(file_path, source)
+        profiler.record_file(file_path, time.perf_counter() - start)
+        yield parsed_data
+
+def build_code_graph(codebase_path, profiler=None, profile="full", enable=(), disable=(), link=True, source_accessor=None, services=None,
+                     batch_size=None, memory_ceiling=None):
+    # With a source accessor, nodes keep docstring offsets only and the text is read from the files when needed.
+    # With a batch size or memory ceiling (bytes), files go into the graph a batch at a time, see ChunkedGraphBuilder.
+    profiler = profiler or PipelineProfiler(trace_memory=False)
+    parsed_files = iter_parsed_files(codebase_path, profiler, profile, enable, disable, source_accessor, services)
+
+    if batch_size or memory_ceiling:
+        builder = ChunkedGraphBuilder(batch_size or 100, memory_ceiling, profiler)
+        for parsed_data in parsed_files:
+            builder.add(parsed_data)
+        code_graph = builder.finish(link)
+        profiler.count("batches", builder.stats["batches"])
+        profiler.count("ceiling_flushes", builder.stats["ceiling_flushes"])
+    else:
+        all_parsed_data = {"nodes": [], "edges": []}
+        for parsed_data in parsed_files:
+            all_parsed_data["nodes"].extend(parsed_data["nodes"])
+            all_parsed_data["edges"].extend(parsed_data["edges"])
+
+        if link:
+            with profiler.stage("link"):
+                linker = SymbolLinker()
+                all_parsed_data = linker.link(all_parsed_data)
+            for outcome, count in linker.stats.items():
+                profiler.count(f"link_{outcome}", count)
+
+        with profiler.stage("build"):
+            graph_builder = GraphBuilder()
+            code_graph = graph_builder.build_graph(all_parsed_data)
+    profiler.count("nodes", code_graph.number_of_nodes())
+    profiler.count("edges", code_graph.number_of_edges())
+    return code_graph
+
+def run_stats(codebase_path, json_path=None, profile_dir=None, extraction=None):
+    profiler = PipelineProfiler(trace_memory=True, profile_dir=profile_dir)
+    source_accessor = SourceAccessor()
+    code_graph = build_code_graph(codebase_path, profiler, source_accessor=source_accessor, **(extraction or {}))
+
+    query_engine = QueryEngine(code_graph, source_accessor)
+    with profiler.stage("index"):
+        query_engine.build_indexes()
+
+    # Run every query once against a real function so the timings are representative
+    sample = next((data for data in (code_graph.nodes[n] for n in code_graph.nodes) if data.get("type") == "function"), {})
+    sample_name = sample.get("name", "main")
+    sample_file = os.path.basename(sample.get("file_path") or "")
+    queries = [
+        lambda: query_engine.find_functions_in_file(sample_file),
+        lambda: query_engine.find_callers_of_function(sample_name),
+        lambda: query_engine.find_functions_called_by(sample_name),
+        lambda: query_engine.get_node_details(sample_name),
+        lambda: query_engine.get_node_source(sample_name),
+        lambda: query_engine.find_nodes_reading_var(sample_name),
+        lambda: query_engine.find_nodes_writing_var(sample_name),
+        lambda: query_engine.find_nodes_throwing_exception(),
+        lambda: query_engine.find_nodes_handling_exception(),
+        lambda: query_engine.find_nodes_with_decorator(sample_name),
+        lambda: query_engine.find_nodes_returning_value(),
+        lambda: query_engine.find_nodes_using_service("snowflake_connection"),
+        lambda: query_engine.find_enclosing_node(sample.get("file_path") or "", sample.get("line_number") or 1),
+    ]
+    for query in queries:
+        with profiler.stage("query"):
+            query()
+
+    with profiler.stage("dot"):
+        DotGenerator(source_accessor).generate_dot(code_graph)
+
+    print("\n".join(profiler.summary_lines()))
+    if json_path:
+        profiler.to_json(json_path)
+        print(f"Stats written to {json_path}")
+    if profile_dir:
+        profiler.dump_profiles()
+        print(f"cProfile dumps written to {profile_dir} (inspect with: python -m pstats <file>)")
+
+def run_diff(old_path, new_path, extraction=None):
+    print(f"Building code graphs for {old_path} and {new_path}...")
+    extraction = extraction or {}
+    graph_diff = GraphDiff(build_code_graph(old_path, **extraction), build_code_graph(new_path, **extraction))
+    print(graph_diff.to_text())
+
+def run_shard(codebase_path, shard_dir, extraction=None):
+    print(f"Building code graph for {codebase_path}...")
+    # Docstrings of files on disk are read from the files when needed, zip members have no file to read from later
+    source_accessor = None if zipfile.is_zipfile(codebase_path) else SourceAccessor()
+    code_graph = build_code_graph(codebase_path, source_accessor=source_accessor, **(extraction or {}))
+    sharded_graph = ShardedGraph.write(code_graph, shard_dir, root=codebase_path)
+    for shard_name, info in sorted(sharded_graph.shards.items()):
+        print(f"  {shard_name}: {info['nodes']} nodes, {info['edges']} edges, {info['bytes'] / 2 ** 20:.2f} MiB")
+    print(f"Wrote {len(sharded_graph.shards)} shards and {len(sharded_graph.cross_edges)} cross-shard edges to {shard_dir}")
+
+def run_export(codebase_path, export_format, out_path, chunk_size=1000, extraction=None, verify=False):
+    print(f"Building code graph for {codebase_path}...")
+    code_graph = build_code_graph(codebase_path, **(extraction or {}))
+    start = time.perf_counter()
+    exporter = GraphExporter(chunk_size=chunk_size)
+    try:
+        exporter.export(code_graph, export_format, out_path)
+    except ImportError as e:
+        print(e)
+        return
+    print(f"Wrote {code_graph.number_of_nodes()} nodes and {code_graph.number_of_edges()} edges as {export_format} "
+          f"to {out_path} in {time.perf_counter() - start:.2f}s")
+    if verify:
+        try:
+            exporter.verify_round_trip(code_graph, export_format, out_path)
+        except ValueError as e:
+            sys.exit(str(e))
+        print(f"{out_path} reads back with networkx with every node and edge type")
+
+def run_index(repo_path, snapshot_path, revision="HEAD", extraction=None):
+    extraction = dict(extraction or {})
+    # The indexer keeps per-file records in the snapshot, linking and batching happen when a graph is built from it
+    for key in ("link", "batch_size", "memory_ceiling"):
+        extraction.pop(key, None)
+    profiler = PipelineProfiler(trace_memory=False)
+    indexer = GitIncrementalIndexer(repo_path, profiler=profiler, **extraction)
+    try:
+        snapshot = indexer.index(snapshot_path, revision)
+    except GitError as e:
+        print(e)
+        return
+    stats = indexer.stats
+    if stats["mode"] == "incremental":
+        print(f"Updated {snapshot_path} from {stats['base_commit'][:12]} to {stats['commit'][:12]}: "
+              f"{stats['added']} added, {stats['modified']} modified, {stats['renamed']} renamed, {stats['deleted']} deleted")
+    else:
+        print(f"Indexed {repo_path} at {stats['commit'][:12]} into {snapshot_path}")
+    print(f"Parsed {stats['parsed']} files, reused {stats['reused']}, {len(snapshot.files)} files in the snapshot")
+    for path, error in sorted(snapshot.errors.items()):
+        print(f"Skipped {path}: {error}")
+    print("\n".join(profiler.summary_lines()))
+
+def format_calls(result):
+    times = "once" if result["count"] == 1 else f"{result['count']} times"
+    return f"called {times} at line{'s' if len(result['lines']) > 1 else ''} {', '.join(map(str, result['lines']))}"
+
+def format_node(node):
+    return f"- {node['name']} (type: {node['type']})"
+
+def paged_response(query_engine, query, argument, title, empty, describe=format_node, cursor=None, total=None, shown=0):
+    """Return (response, LLM context, state for 'more') for one page of a paged query.
+
+    Only the page is materialized. The total comes from QueryEngine.count_query
+    on the first page and is carried along with the cursor for the next ones.
+    """
+    page = query_engine.query_page(query, argument, limit=PAGE_SIZE, cursor=cursor, with_total=cursor is None)
+    total = page.total if cursor is None else total
+    if not page.items:
+        return (empty if cursor is None else "No more results."), "", None
+    response = (title if cursor is None else f"{title} (continued)") + "\n"
+    response += "".join(describe(node) + "\n" for node in page)
+    shown += len(page)
+    next_page = None
+    if page.next_cursor is not None:
+        response += f"... {total - shown} more of {total}, type 'more' for the next {PAGE_SIZE}.\n"
+        next_page = (query, argument, title, empty, describe, page.next_cursor, total, shown)
+    return response, str(page.items), next_page
+
+def edge_type_list(value):
+    edge_types = [edge_type.strip().upper() for edge_type in value.split(",") if edge_type.strip()]
+    unknown = [edge_type for edge_type in edge_types if edge_type not in EDGE_TYPES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown edge types {', '.join(unknown)} (choose from {', '.join(EDGE_TYPES)})")
+    return edge_types
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Query a code graph, or compare the graphs of two code versions.")
+    arg_parser.add_argument("--codebase", default=CODEBASE_PATH, help="Directory or zip archive of Python files to index for interactive queries.")
+    arg_parser.add_argument("--profile", choices=list(EXTRACTION_PROFILES), default="full",
+                            help="Which edges the parser extracts: calls-only, structure (no variable, return or exception edges) or full.")
+    arg_parser.add_argument("--enable-edges", type=edge_type_list, default=[], metavar="TYPE[,TYPE...]",
+                            help="Comma separated edge types to extract on top of the profile.")
+    arg_parser.add_argument("--disable-edges", type=edge_type_list, default=[], metavar="TYPE[,TYPE...]",
+                            help="Comma separated edge types of the profile to skip.")
+    arg_parser.add_argument("--services", metavar="CONFIG",
+                            help="YAML file of extra external service detectors (import and call patterns), added to the built-in ones.")
+    arg_parser.add_argument("--no-link", action="store_true",
+                            help="Keep call and base class targets as parsed instead of resolving them across modules.")
+    arg_parser.add_argument("--batch-size", type=int, metavar="FILES",
+                            help="Build the graph this many parsed files at a time instead of holding every file's records until the end.")
+    arg_parser.add_argument("--memory-ceiling", type=float, metavar="MB",
+                            help="Also flush the current batch into the graph whenever resident memory passes this many MB.")
+    arg_parser.add_argument("--precomputed-layout", action="store_true",
+                            help="Lay the graph out in Python for 'generate dot' and pin the nodes, so Graphviz only draws it.")
+    arg_parser.add_argument("--layout-cache-dir", help="Keep precomputed layouts here, keyed by graph, for later runs.")
+    arg_parser.add_argument("--snapshot", metavar="SNAPSHOT",
+                            help="Answer queries from a snapshot written by the index command instead of parsing --codebase.")
+    arg_parser.add_argument("--shards", metavar="SHARD_DIR",
+                            help="Answer queries from a graph written by the shard command, loading packages on demand.")
+    arg_parser.add_argument("--memory-cap", type=float, metavar="MB",
+                            help="With --shards, drop the least recently used shards once the loaded ones exceed this size.")
+    subparsers = arg_parser.add_subparsers(dest="command")
+    diff_parser = subparsers.add_parser("diff", help="Show added, removed and modified nodes and edges between two codebase versions (directories or zip archives).")
+    diff_parser.add_argument("old_path")
+    diff_parser.add_argument("new_path")
+    stats_parser = subparsers.add_parser("stats", help="Time every pipeline stage (scan, parse, build, index, query, dot) with peak memory.")
+    stats_parser.add_argument("--json", dest="json_path", help="Also write the stats to this JSON file.")
+    stats_parser.add_argument("--cprofile-dir", help="Dump a cProfile file per stage into this directory.")
+    shard_parser = subparsers.add_parser("shard", help="Split the graph of --codebase into one shard per top-level package, for --shards.")
+    shard_parser.add_argument("shard_dir")
+    index_parser = subparsers.add_parser("index", help="Index the git repository at --codebase into a snapshot, re-parsing only the files changed since the snapshot's commit.")
+    index_parser.add_argument("snapshot_path")
+    index_parser.add_argument("--commit", default="HEAD", help="Commit to index (default: HEAD).")
+    export_parser = subparsers.add_parser("export", help="Write the graph of --codebase as GraphML, node-link JSON, or Parquet/Arrow tables (needs pyarrow).")
+    export_parser.add_argument("format", choices=EXPORT_FORMATS)
+    export_parser.add_argument("out_path", help="Output file for graphml and json, output directory (nodes and edges tables) for parquet and arrow.")
+    export_parser.add_argument("--chunk-size", type=int, default=1000, help="Nodes or edges serialized per write.")
+    export_parser.add_argument("--verify", action="store_true", help="Read a graphml or json export back with networkx and check it round-trips.")
+    args = arg_parser.parse_args()
+    extraction = {"profile": args.profile, "enable": args.enable_edges, "disable": args.disable_edges, "link": not args.no_link}
+    if args.batch_size or args.memory_ceiling:
+        extraction["batch_size"] = args.batch_size
+        extraction["memory_ceiling"] = int(args.memory_ceiling * 2 ** 20) if args.memory_ceiling else None
+    if args.services:
+        try:
+            extraction["services"] = ServiceRegistry.from_config(args.services)
+        except (OSError, ValueError) as e:
+            arg_parser.error(f"cannot load --services: {e}")
+
+    if args.command == "diff":
+        run_diff(args.old_path, args.new_path, extraction)
+        return
+    if args.command == "stats":
+        run_stats(args.codebase, args.json_path, args.cprofile_dir, extraction)
+        return
+    if args.command == "shard":
+        run_shard(args.codebase, args.shard_dir, extraction)
+        return
+    if args.command == "index":
+        run_index(args.codebase, args.snapshot_path, args.commit, extraction)
+        return
+    if args.command == "export":
+        run_export(args.codebase, args.format, args.out_path, args.chunk_size, extraction, args.verify)
+        return
+
+    profiler = PipelineProfiler(trace_memory=False)
+    source_accessor = SourceAccessor()
+    dot_generator = DotGenerator(source_accessor)
+    layout_cache = LayoutCache(cache_dir=args.layout_cache_dir)
+    if args.shards:
+        memory_cap = int(args.memory_cap * 2 ** 20) if args.memory_cap else None
+        with profiler.stage("load_index"):
+            sharded_graph = ShardedGraph(args.shards, memory_cap)
+        code_graph = None
+        query_engine = ShardedQueryEngine(sharded_graph, source_accessor)
+        print(f"Loaded the index of {len(sharded_graph.shards)} shards, packages are loaded as queries need them.")
+    elif args.snapshot:
+        with profiler.stage("load_snapshot"):
+            snapshot = IndexSnapshot.load(args.snapshot)
+        with profiler.stage("build"):
+            code_graph = snapshot.build_graph(link=extraction["link"])
+        try:
+            with profiler.stage("read_sources"):
+                snapshot.add_sources(source_accessor)
+        except (GitError, OSError) as e:
+            # Without the blobs the working tree would be read at offsets of another commit
+            print(f"Could not read the sources of {snapshot.commit[:12]} from {snapshot.repo_path} ({e}), source queries are disabled.")
+            source_accessor = dot_generator.source_accessor = None
+        query_engine = QueryEngine(code_graph, source_accessor)
+        print(f"Graph of {snapshot.commit[:12]} loaded with {len(code_graph.nodes)} nodes and {len(code_graph.edges)} edges.")
+    else:
+        print("Building code graph...")
+        code_graph = build_code_graph(args.codebase, profiler, source_accessor=source_accessor, **extraction)
+        query_engine = QueryEngine(code_graph, source_accessor)
+        print(f"Graph built with {len(code_graph.nodes)} nodes and {len(code_graph.edges)} edges.")
+
+    print("\nAsk questions about the codebase (e.g., 'functions in example_module.py', 'callers of main', 'details of greet', 'source of greet'):")
+    print("New queries: 'readers of <var_name>', 'writers of <var_name>', 'throwers', 'handlers', 'decorated by <decorator_name>', 'returners', 'services', 'uses <service_name>', 'enclosing <file_name>:<line>'.")
+    print(f"Long lists show {PAGE_SIZE} results at a time, type 'more' for the next ones.")
+    print("Type 'generate dot' to create a DOT file for visualization, or 'stats' to see where time went.")
     print("Type 'exit' to quit.")
 
+    # Query and cursor of the last paged answer that has more results
+    pending_page = None
     while True:
-        query = input("> ").strip().lower()
+        raw_query = input("> ").strip()
+        query = raw_query.lower()
         if query == "exit":
             break
+        elif query == "stats":
+            print("\n".join(profiler.summary_lines()))
+            if code_graph is None:
+                print(f"Shards loaded: {', '.join(sharded_graph.loaded_shards()) or 'none'} "
+                      f"({sharded_graph.loaded_bytes / 2 ** 20:.2f} MiB, {sharded_graph.loads} loads, {sharded_graph.evictions} evictions)")
+            continue
+        elif query == "generate dot" and code_graph is None:
+            print("DOT generation needs the whole graph, run without --shards.")
+            continue
         elif query == "generate dot":
-            dot_string = dot_generator.generate_dot(code_graph)
+            if args.precomputed_layout:
+                with profiler.stage("layout"):
+                    dot_generator.positions = layout_cache.positions(code_graph)
+            with profiler.stage("dot"):
+                dot_string = dot_generator.generate_dot(code_graph)
             dot_file_path = os.path.join(os.getcwd(), "code_flow.dot")
             with open(dot_file_path, "w") as f:
                 f.write(dot_string)
@@ -49,28 +361,45 @@ def main():
             print(f"  dot -Tpng {dot_file_path} -o code_flow.png")
             continue
 
+        query_start = time.perf_counter()
         response = "I couldn't understand your query. Try something like: 'functions in <file_name>', 'callers of <function_name>', 'details of <node_name>'."
         retrieved_context = ""
+        next_page = None
 
-        if "functions in" in query:
-            file_name = query.split("functions in")[-1].strip().replace(".py", "") + ".py"
-            functions = query_engine.find_functions_in_file(file_name)
-            if functions:
-                response = f"Functions in {file_name}:\n"
-                for func in functions:
-                    response += f"- {func['name']} (line {func['line_number']})\n"
-                    if func['docstring']:
-                        response += f"  Docstring: {func['docstring']}\n"
-                retrieved_context = str(functions)
+        if query == "more":
+            if pending_page is None:
+                response = "Nothing more to show, 'more' continues the last list of results."
+            else:
+                *page_query, cursor, total, shown = pending_page
+                response, retrieved_context, next_page = paged_response(query_engine, *page_query, cursor=cursor, total=total, shown=shown)
+        elif query.startswith("enclosing"):
+            # Checked before the substring queries, a path like handlers.py would match them, and taken
+            # from the raw input, paths are case sensitive
+            location = raw_query[len("enclosing"):].strip()
+            file_name, _, line_number = location.rpartition(":")
+            node = query_engine.find_enclosing_node(file_name, int(line_number)) if line_number.isdigit() else None
+            if node:
+                response = f"{location} is inside {node['name']} (type: {node['type']}, lines {node['line_number']}-{node['end_line_number']})"
+                retrieved_context = str(node)
             else:
-                response = f"No functions found in {file_name} or file not parsed."
+                response = f"No function, class or module found enclosing '{location}'."
+        elif "functions in" in query:
+            file_name = query.split("functions in")[-1].strip().replace(".py", "") + ".py"
+
+            def describe_function(func):
+                docstring = query_engine.get_docstring(func)
+                return f"- {func['name']} (line {func['line_number']})" + (f"\n  Docstring: {docstring}" if docstring else "")
+
+            response, retrieved_context, next_page = paged_response(
+                query_engine, "functions_in", file_name, f"Functions in {file_name}:",
+                f"No functions found in {file_name} or file not parsed.", describe_function)
         elif "callers of" in query:
             function_name = query.split("callers of")[-1].strip()
-            callers = query_engine.find_callers_of_function(function_name)
+            callers = query_engine.find_callers_with_frequency(function_name)
             if callers:
                 response = f"Callers of {function_name}:\n"
                 for caller in callers:
-                    response += f"- {caller['name']} (type: {caller['type']})\n"
+                    response += f"- {caller['node'].get('name', caller['id'])} (type: {caller['node'].get('type')}, {format_calls(caller)})\n"
                 retrieved_context = str(callers)
             else:
                 response = f"No callers found for {function_name}."
@@ -84,84 +413,61 @@ def main():
                 retrieved_context = str(details)
             else:
                 response = f"Node '{node_name}' not found."
+        elif "source of" in query:
+            node_name = query.split("source of")[-1].strip()
+            details, source = query_engine.get_node_source(node_name)
+            if source is not None:
+                response = f"Source of {details.get('name', node_name)} ({details.get('file_path')}, line {details.get('line_number')}):\n{source}"
+                retrieved_context = source
+            else:
+                response = f"No source found for '{node_name}'."
         elif "called by" in query:
             function_name = query.split("called by")[-1].strip()
-            called_functions = query_engine.find_functions_called_by(function_name)
+            called_functions = query_engine.find_functions_called_by_with_frequency(function_name)
             if called_functions:
                 response = f"Functions called by {function_name}:\n"
                 for func in called_functions:
-                    response += f"- {func['name']} (type: {func['type']})\n"
+                    response += f"- {func['node'].get('name', func['id'])} (type: {func['node'].get('type', 'unknown')}, {format_calls(func)})\n"
                 retrieved_context = str(called_functions)
             else:
                 response = f"No functions called by {function_name}."
         elif "readers of" in query:
             var_name = query.split("readers of")[-1].strip()
-            readers = query_engine.find_nodes_reading_var(var_name)
-            if readers:
-                response = f"Nodes reading variable '{var_name}':\n"
-                for reader in readers:
-                    response += f"- {reader['name']} (type: {reader['type']})\n"
-                retrieved_context = str(readers)
-            else:
-                response = f"No nodes found reading variable '{var_name}'."
+            response, retrieved_context, next_page = paged_response(query_engine, "readers", var_name, f"Nodes reading variable '{var_name}':",
+                                                                    f"No nodes found reading variable '{var_name}'.")
         elif "writers of" in query:
             var_name = query.split("writers of")[-1].strip()
-            writers = query_engine.find_nodes_writing_var(var_name)
-            if writers:
-                response = f"Nodes writing to variable '{var_name}':\n"
-                for writer in writers:
-                    response += f"- {writer['name']} (type: {writer['type']})\n"
-                retrieved_context = str(writers)
-            else:
-                response = f"No nodes found writing to variable '{var_name}'."
+            response, retrieved_context, next_page = paged_response(query_engine, "writers", var_name, f"Nodes writing to variable '{var_name}':",
+                                                                    f"No nodes found writing to variable '{var_name}'.")
         elif "throwers" in query:
-            throwers = query_engine.find_nodes_throwing_exception()
-            if throwers:
-                response = f"Nodes throwing exceptions:\n"
-                for thrower in throwers:
-                    response += f"- {thrower['name']} (type: {thrower['type']})\n"
-                retrieved_context = str(throwers)
-            else:
-                response = f"No nodes found throwing exceptions."
+            response, retrieved_context, next_page = paged_response(query_engine, "throwers", None, "Nodes throwing exceptions:",
+                                                                    "No nodes found throwing exceptions.")
         elif "handlers" in query:
-            handlers = query_engine.find_nodes_handling_exception()
-            if handlers:
-                response = f"Nodes handling exceptions:\n"
-                for handler in handlers:
-                    response += f"- {handler['name']} (type: {handler['type']})\n"
-                retrieved_context = str(handlers)
-            else:
-                response = f"No nodes found handling exceptions."
+            response, retrieved_context, next_page = paged_response(query_engine, "handlers", None, "Nodes handling exceptions:",
+                                                                    "No nodes found handling exceptions.")
         elif "decorated by" in query:
             decorator_name = query.split("decorated by")[-1].strip()
-            decorated_nodes = query_engine.find_nodes_with_decorator(decorator_name)
-            if decorated_nodes:
-                response = f"Nodes decorated by '{decorator_name}':\n"
-                for node in decorated_nodes:
-                    response += f"- {node['name']} (type: {node['type']})\n"
-                retrieved_context = str(decorated_nodes)
-            else:
-                response = f"No nodes found decorated by '{decorator_name}'."
+            response, retrieved_context, next_page = paged_response(query_engine, "decorated", decorator_name, f"Nodes decorated by '{decorator_name}':",
+                                                                    f"No nodes found decorated by '{decorator_name}'.")
         elif "returners" in query:
-            returners = query_engine.find_nodes_returning_value()
-            if returners:
-                response = f"Nodes returning values:\n"
-                for returner in returners:
-                    response += f"- {returner['name']} (type: {returner['type']})\n"
-                retrieved_context = str(returners)
+            response, retrieved_context, next_page = paged_response(query_engine, "returners", None, "Nodes returning values:",
+                                                                    "No nodes found returning values.")
+        elif query == "services":
+            services = query_engine.find_services()
+            if services:
+                response = "External services:\n"
+                for service in services:
+                    response += f"- {service['name']} ({service['node'].get('name')}, used by {service['users']} node{'s' if service['users'] != 1 else ''})\n"
+                retrieved_context = str(services)
             else:
-                response = f"No nodes found returning values."
+                response = "No external services detected."
         elif "uses" in query:
             service_name = query.split("uses")[-1].strip()
-            users = query_engine.find_nodes_using_service(service_name)
-            if users:
-                response = f"Nodes using service '{service_name}':\n"
-                for user in users:
-                    response += f"- {user['name']} (type: {user['type']})\n"
-                retrieved_context = str(users)
-            else:
-                response = f"No nodes found using service '{service_name}'." # Corrected the trailing quote here
+            response, retrieved_context, next_page = paged_response(query_engine, "users", service_name, f"Nodes using service '{service_name}':",
+                                                                    f"No nodes found using service '{service_name}'.")
 
+        pending_page = next_page
+        profiler.add_time("query", time.perf_counter() - query_start)
         print(response)
         if retrieved_context:
             print(f"\n--- Context for LLM (would be sent to Groq) ---\n{retrieved_context}\n--------------------------------------------------")
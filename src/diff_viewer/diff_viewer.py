@@ -1,7 +1,103 @@
-
 import difflib
+import html
+import json
 import streamlit.components.v1 as components
 
+
+def _line_ids(old_lines, new_lines):
+    # Intern every distinct line as a small int so the matcher compares ints, not strings
+    ids = {}
+    old_ids = [ids.setdefault(line, len(ids)) for line in old_lines]
+    new_ids = [ids.setdefault(line, len(ids)) for line in new_lines]
+    return old_ids, new_ids
+
+
+def compute_hunks(old_lines, new_lines, context=3):
+    """Return the changed hunks as lists of difflib-style opcodes.
+
+    The common prefix and suffix are cut off before matching, so the matcher
+    only ever sees the region that actually changed.
+    """
+    old_ids, new_ids = _line_ids(old_lines, new_lines)
+
+    prefix = 0
+    limit = min(len(old_ids), len(new_ids))
+    while prefix < limit and old_ids[prefix] == new_ids[prefix]:
+        prefix += 1
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and old_ids[-1 - suffix] == new_ids[-1 - suffix]:
+        suffix += 1
+
+    old_middle = old_ids[prefix:len(old_ids) - suffix]
+    new_middle = new_ids[prefix:len(new_ids) - suffix]
+    if not old_middle and not new_middle:
+        return []
+
+    opcodes = [("equal", 0, prefix, 0, prefix)] if prefix else []
+    matcher = difflib.SequenceMatcher(None, old_middle, new_middle, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        opcodes.append((tag, i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix))
+    if suffix:
+        opcodes.append(("equal", len(old_ids) - suffix, len(old_ids), len(new_ids) - suffix, len(new_ids)))
+
+    return list(_group_opcodes(opcodes, context))
+
+
+def _group_opcodes(codes, n):
+    # Same grouping as difflib.SequenceMatcher.get_grouped_opcodes, on the offset opcodes
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > n + n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+HUNK_DIFF_STYLE = """
+<style>
+  table.hunk-diff { border-collapse: collapse; font-family: monospace; font-size: 12px; width: 100%; }
+  table.hunk-diff td { padding: 0 6px; white-space: pre-wrap; vertical-align: top; }
+  table.hunk-diff td.num { color: #888; text-align: right; width: 1%; user-select: none; }
+  tr.del td.code { background: #ffecec; }
+  tr.add td.code { background: #eaffea; }
+  tr.gap td { background: #f0f4ff; color: #555; cursor: pointer; text-align: center; }
+</style>
+"""
+
+HUNK_DIFF_SCRIPT = """
+<script>
+  const gapLines = %s;
+  function escapeHtml(text) {
+    return text.replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;");
+  }
+  document.querySelectorAll("tr.gap").forEach(row => {
+    row.addEventListener("click", () => {
+      const oldStart = Number(row.dataset.oldStart), newStart = Number(row.dataset.newStart);
+      const lines = gapLines[Number(row.dataset.gap)];
+      let rows = "";
+      for (let k = 0; k < lines.length; k++) {
+        rows += `<tr><td class="num">${oldStart + k + 1}</td><td class="num">${newStart + k + 1}</td>`
+              + `<td class="code">  ${escapeHtml(lines[k])}</td></tr>`;
+      }
+      row.outerHTML = rows;
+    });
+  });
+</script>
+"""
+
+
 class CodeDiffViewer:
     def __init__(self, old_code, new_code):
         self.old_code = old_code
@@ -16,6 +112,48 @@ class CodeDiffViewer:
         )
         return diff
 
-    def show_diff(self):
-        diff_html = self.generate_diff_html()
+    def _gap_row(self, gap, old_start, new_start, count):
+        return (f'<tr class="gap" data-gap="{gap}" data-old-start="{old_start}" data-new-start="{new_start}">'
+                f'<td colspan="3">&#8597; Show {count} unchanged lines</td></tr>')
+
+    def generate_hunk_diff_html(self, context=3):
+        old_lines = self.old_code.splitlines()
+        new_lines = self.new_code.splitlines()
+        hunks = compute_hunks(old_lines, new_lines, context)
+        if not hunks:
+            return "<p>No changes.</p>"
+
+        rows = []
+        # Only the unchanged lines between hunks are embedded, the hunks are already rows
+        gaps = []
+        old_pos = new_pos = 0
+        for hunk in hunks:
+            _, i1, _, j1, _ = hunk[0]
+            if i1 > old_pos:
+                rows.append(self._gap_row(len(gaps), old_pos, new_pos, i1 - old_pos))
+                gaps.append(old_lines[old_pos:i1])
+            for tag, i1, i2, j1, j2 in hunk:
+                if tag == "equal":
+                    for k in range(i2 - i1):
+                        rows.append(f'<tr><td class="num">{i1 + k + 1}</td><td class="num">{j1 + k + 1}</td>'
+                                    f'<td class="code">  {html.escape(old_lines[i1 + k])}</td></tr>')
+                    continue
+                for k in range(i1, i2):
+                    rows.append(f'<tr class="del"><td class="num">{k + 1}</td><td class="num"></td>'
+                                f'<td class="code">- {html.escape(old_lines[k])}</td></tr>')
+                for k in range(j1, j2):
+                    rows.append(f'<tr class="add"><td class="num"></td><td class="num">{k + 1}</td>'
+                                f'<td class="code">+ {html.escape(new_lines[k])}</td></tr>')
+            _, _, old_pos, _, new_pos = hunk[-1]
+        if old_pos < len(old_lines):
+            rows.append(self._gap_row(len(gaps), old_pos, new_pos, len(old_lines) - old_pos))
+            gaps.append(old_lines[old_pos:])
+
+        # Unchanged lines are only turned into rows when a gap is clicked
+        gap_lines_json = json.dumps(gaps).replace("</", "<\\/")
+        return (HUNK_DIFF_STYLE + '<table class="hunk-diff">' + "".join(rows) + "</table>"
+                + HUNK_DIFF_SCRIPT % gap_lines_json)
+
+    def show_diff(self, hunks_only=True, context=3):
+        diff_html = self.generate_hunk_diff_html(context) if hunks_only else self.generate_diff_html()
         components.html(diff_html, height=600, scrolling=True)
@@ -0,0 +1,157 @@
+from collections import defaultdict
+
+import networkx as nx
+
+from src.graph.symbol_linker import LINKED_EDGE_TYPES
+from src.parser.records import edge_entries, edge_of_type
+
+
+class GraphDiff:
+    """Structural diff between the code graphs of two versions of a codebase.
+
+    Modules, classes and functions carry a content hash from the parser. When a
+    module hash matches, everything the module contains is skipped; when a class
+    or function hash matches, its outgoing edges are skipped. Linked CALLS and
+    INHERITS targets also depend on the imports, so they are still compared
+    for unchanged definitions in a module that changed or imports one that did.
+    """
+
+    def __init__(self, old_graph: nx.DiGraph, new_graph: nx.DiGraph):
+        self.old_graph = old_graph
+        self.new_graph = new_graph
+        self.result = None
+
+    def _unchanged_nodes(self):
+        unchanged = set()
+        for node_id, new_data in self.new_graph.nodes(data=True):
+            new_hash = new_data.get("content_hash")
+            if new_hash is None or node_id not in self.old_graph:
+                continue
+            if self.old_graph.nodes[node_id].get("content_hash") != new_hash:
+                continue
+            unchanged.add(node_id)
+            if new_data.get("type") == "module":
+                # Everything defined in an unchanged module is unchanged too
+                for _, child_id, edge_data in self.new_graph.out_edges(node_id, data=True):
+                    if edge_of_type(edge_data, "CONTAINS") is not None:
+                        unchanged.add(child_id)
+        return unchanged
+
+    def _relinked_modules(self):
+        # Modules whose linked edges may point elsewhere: changed ones, and the ones importing a changed one
+        changed = {
+            node_id for node_id, data in self.new_graph.nodes(data=True)
+            if data.get("type") == "module"
+            and (node_id not in self.old_graph or self.old_graph.nodes[node_id].get("content_hash") != data.get("content_hash"))
+        }
+        changed.update(node_id for node_id, data in self.old_graph.nodes(data=True)
+                       if data.get("type") == "module" and node_id not in self.new_graph)
+        # Imports name modules by dotted path, matched by stem like the symbol linker does
+        changed_stems = {module_id.rsplit(".py", 1)[0] for module_id in changed}
+        relinked = set(changed)
+        for module_id, data in self.new_graph.nodes(data=True):
+            if data.get("type") != "module" or module_id in relinked:
+                continue
+            for _, target, edge_data in self.new_graph.out_edges(module_id, data=True):
+                if edge_of_type(edge_data, "IMPORTS") is not None and changed_stems.intersection(target.split(".")):
+                    relinked.add(module_id)
+                    break
+        return relinked
+
+    @staticmethod
+    def _out_edges(graph, source, edge_types=None):
+        if source not in graph:
+            return set()
+        return {
+            (target, entry.get("type")) for _, target, data in graph.out_edges(source, data=True)
+            for entry in edge_entries(data) if edge_types is None or entry.get("type") in edge_types
+        }
+
+    def compute(self):
+        old_nodes = set(self.old_graph.nodes)
+        new_nodes = set(self.new_graph.nodes)
+        unchanged = self._unchanged_nodes()
+        relinked = self._relinked_modules()
+
+        modified = []
+        for node_id in new_nodes & old_nodes:
+            if node_id in unchanged:
+                continue
+            old_hash = self.old_graph.nodes[node_id].get("content_hash")
+            new_hash = self.new_graph.nodes[node_id].get("content_hash")
+            if old_hash != new_hash:
+                modified.append(node_id)
+
+        added_edges = defaultdict(list)
+        removed_edges = defaultdict(list)
+        skipped_edges = 0
+        for source in old_nodes | new_nodes:
+            edge_types = None
+            if source in unchanged:
+                # Node ids are "<module id>:<name>", a module's own id has no colon
+                if source.partition(":")[0] not in relinked:
+                    if source in self.new_graph:
+                        skipped_edges += self.new_graph.out_degree(source)
+                    continue
+                edge_types = LINKED_EDGE_TYPES
+                skipped_edges += sum(1 for _, edge_type in self._out_edges(self.new_graph, source)
+                                     if edge_type not in LINKED_EDGE_TYPES)
+            old_out = self._out_edges(self.old_graph, source, edge_types)
+            new_out = self._out_edges(self.new_graph, source, edge_types)
+            for target, edge_type in new_out - old_out:
+                added_edges[edge_type].append((source, target))
+            for target, edge_type in old_out - new_out:
+                removed_edges[edge_type].append((source, target))
+
+        # Implicit targets such as return_value_at_line:N only matter through their edges
+        self.result = {
+            "added_nodes": sorted(n for n in new_nodes - old_nodes if self.new_graph.nodes[n].get("type")),
+            "removed_nodes": sorted(n for n in old_nodes - new_nodes if self.old_graph.nodes[n].get("type")),
+            "modified_nodes": sorted(modified),
+            "added_edges": {edge_type: sorted(edges) for edge_type, edges in added_edges.items()},
+            "removed_edges": {edge_type: sorted(edges) for edge_type, edges in removed_edges.items()},
+            "unchanged_nodes": len(unchanged),
+            "skipped_edges": skipped_edges,
+        }
+        return self.result
+
+    def is_empty(self):
+        result = self.result or self.compute()
+        return not (result["added_nodes"] or result["removed_nodes"] or result["modified_nodes"]
+                    or result["added_edges"] or result["removed_edges"])
+
+    def sections(self):
+        result = self.result or self.compute()
+        for title, key, marker in (("Added nodes", "added_nodes", "+"),
+                                   ("Removed nodes", "removed_nodes", "-"),
+                                   ("Modified nodes", "modified_nodes", "~")):
+            if result[key]:
+                yield title, [f"{marker} {node_id}" for node_id in result[key]]
+        for title, key, marker in (("Added edges", "added_edges", "+"), ("Removed edges", "removed_edges", "-")):
+            for edge_type in sorted(result[key]):
+                yield f"{title} ({edge_type})", [f"{marker} {source} -> {target}" for source, target in result[key][edge_type]]
+
+    def skipped_summary(self):
+        result = self.result or self.compute()
+        return f"{result['unchanged_nodes']} unchanged nodes and {result['skipped_edges']} of their edges were skipped."
+
+    def to_text(self):
+        if self.is_empty():
+            return "No structural changes."
+        lines = []
+        for title, items in self.sections():
+            lines.append(f"{title}:")
+            lines.extend(f"  {item}" for item in items)
+        lines.append(self.skipped_summary())
+        return "\n".join(lines)
+
+    def to_markdown(self):
+        if self.is_empty():
+            return "No structural changes."
+        lines = []
+        for title, items in self.sections():
+            lines.append(f"**{title}**")
+            lines.extend(f"- `{item}`" for item in items)
+            lines.append("")
+        lines.append(f"_{self.skipped_summary()}_")
+        return "\n".join(lines)
@@ -1,8 +1,15 @@
+import math
 import networkx as nx
 from collections import defaultdict
 
+from src.parser.records import edge_entries
+
 class DotGenerator:
-    def __init__(self):
+    def __init__(self, source_accessor=None, positions=None):
+        # Docstrings that were not kept on the nodes are read through the accessor
+        self.source_accessor = source_accessor
+        # Precomputed node coordinates (see LayeredLayout), pinned so Graphviz does not lay the graph out again
+        self.positions = positions
         self.dot_string = ""
         self.node_filter = None
         self.edge_filter = None
@@ -11,7 +18,11 @@ class DotGenerator:
         node_type = node_data.get("type", "unknown")
         if self.node_filter and node_type not in self.node_filter:
             return
+        self.dot_string += self.node_statement(node_id, node_data)
 
+    def node_statement(self, node_id, node_data):
+        # The DOT statement of one node, without the filters applied
+        node_type = node_data.get("type", "unknown")
         name = node_data.get("name", node_id)
         label = f"{name}"
         shape = "box"
@@ -30,16 +41,28 @@ class DotGenerator:
             fillcolor = "#FFD700"  # Gold
 
         docstring = node_data.get("docstring")
+        if docstring is None and self.source_accessor is not None:
+            docstring = self.source_accessor.node_docstring(node_data)
         if docstring and docstring.strip():
             label += f"\n({docstring.strip().splitlines()[0]})"
 
-        self.dot_string += f'  "{node_id}" [label="{label}", shape={shape}, style={style}, fillcolor="{fillcolor}", type="{node_type}"];\n'
+        pos = ""
+        if self.positions is not None and node_id in self.positions:
+            x, y = self.positions[node_id]
+            pos = f', pos="{x:.0f},{y:.0f}!"'
+
+        return f'  "{node_id}" [label="{label}", shape={shape}, style={style}, fillcolor="{fillcolor}", type="{node_type}"{pos}];\n'
 
     def _add_edge_to_dot(self, source_id, target_id, edge_data):
-        edge_type = edge_data.get("type", "unknown")
-        if self.edge_filter and edge_type not in self.edge_filter:
-            return
+        # One statement per edge type between the two nodes
+        for entry in edge_entries(edge_data):
+            if self.edge_filter and entry.get("type", "unknown") not in self.edge_filter:
+                continue
+            self.dot_string += self.edge_statement(source_id, target_id, entry)
 
+    def edge_statement(self, source_id, target_id, edge_data):
+        # The DOT statement of one typed edge entry, without the filters applied
+        edge_type = edge_data.get("type", "unknown")
         label = edge_type
         color = "black"
         style = "solid"
@@ -58,9 +81,19 @@ class DotGenerator:
             color = "purple"
             style = "solid"
 
-        self.dot_string += f'  "{source_id}" -> "{target_id}" [label="{label}", color="{color}", style={style}, type="{edge_type}"];\n'
+        # Edges that occur several times are labelled with their count and drawn heavier
+        count = edge_data.get("count", 1)
+        weight = ""
+        if count > 1:
+            if label:
+                label += f" x{count}"
+            weight = f", weight={count}, penwidth={1 + math.log2(count):.2f}"
 
-    def _add_clustered_nodes_to_dot(self, graph: nx.DiGraph):
+        return f'  "{source_id}" -> "{target_id}" [label="{label}", color="{color}", style={style}, type="{edge_type}"{weight}];\n'
+
+    @staticmethod
+    def module_clusters(graph: nx.DiGraph):
+        # Module name -> its (node id, data) pairs, module nodes themselves are not clustered
         modules = defaultdict(list)
         for node_id, node_data in graph.nodes(data=True):
             if node_data.get("type") == "module":
@@ -68,20 +101,30 @@ class DotGenerator:
             
             module_name = node_id.split(".")[0]
             modules[module_name].append((node_id, node_data))
+        return modules
 
-        for module_name, nodes in modules.items():
-            self.dot_string += f'  subgraph "cluster_{module_name}" {{\n'
-            self.dot_string += f'    label = "{module_name}";\n'
-            self.dot_string += '    style = "filled";\n'
-            self.dot_string += '    color = "lightgrey";\n\n'
+    @staticmethod
+    def cluster_header(module_name):
+        return (f'  subgraph "cluster_{module_name}" {{\n'
+                f'    label = "{module_name}";\n'
+                '    style = "filled";\n'
+                '    color = "lightgrey";\n\n')
+
+    def _add_clustered_nodes_to_dot(self, graph: nx.DiGraph):
+        for module_name, nodes in self.module_clusters(graph).items():
+            self.dot_string += self.cluster_header(module_name)
             for node_id, node_data in nodes:
                 self._add_node_to_dot(node_id, node_data)
             self.dot_string += '  }\n'
 
+    def dot_header(self) -> str:
+        if self.positions is not None:
+            # neato keeps pinned nodes where they are and only routes the edges, inputscale=72 reads pos in points
+            return "digraph CodeFlow {\n  rankdir=LR;\n  layout=neato;\n  inputscale=72;\n  splines=false;\n  overlap=true;\n  node [shape=box];\n"
+        return "digraph CodeFlow {\n  rankdir=LR;\n  node [shape=box];\n"
+
     def generate_dot(self, graph: nx.DiGraph, node_filter: list = None, edge_filter: list = None, cluster_modules: bool = False) -> str:
-        self.dot_string = "digraph CodeFlow {\n"
-        self.dot_string += "  rankdir=LR;\n"
-        self.dot_string += "  node [shape=box];\n"
+        self.dot_string = self.dot_header()
         
         self.node_filter = node_filter
         self.edge_filter = edge_filter
@@ -1,19 +1,140 @@
+import gc
+import os
+
 import networkx as nx
 
+from src.parser.records import EdgeRecord, NodeRecord
+from src.graph.symbol_linker import SymbolLinker
+from src.instrumentation.profiler import PipelineProfiler
+
+# Least growth allowed between two ceiling flushes, so a graph that alone passes the ceiling does not flush every file
+MIN_CEILING_HEADROOM = 32 * 2 ** 20
+
+
+class CodeGraph(nx.DiGraph):
+    # Node and edge attributes live in slotted records instead of one dict each
+    node_attr_dict_factory = NodeRecord
+    edge_attr_dict_factory = EdgeRecord
+
+
 class GraphBuilder:
     def __init__(self):
-        self.graph = nx.DiGraph()
+        self.graph = CodeGraph()
 
     def build_graph(self, parsed_data):
+        # The parsed records are copied field by field, so cached parse results can be reused
         # Add nodes
         for node_data in parsed_data["nodes"]:
-            node_id = node_data.pop("id")
-            self.graph.add_node(node_id, **node_data)
+            node_id = node_data["id"]
+            self.graph.add_node(node_id)
+            self.graph.nodes[node_id].assign(node_data, skip=("id",))
 
         # Add edges
         for edge_data in parsed_data["edges"]:
-            source = edge_data.pop("source")
-            target = edge_data.pop("target")
-            self.graph.add_edge(source, target, **edge_data)
-        
+            source, target = edge_data["source"], edge_data["target"]
+            existing = self.graph.get_edge_data(source, target)
+            if existing is not None:
+                # Another edge type between the same ends, or the same edge from another file with the
+                # same module name: the occurrences go to the entry of their type, see EdgeRecord.other_types
+                existing.add_occurrences(edge_data)
+                continue
+            self.graph.add_edge(source, target)
+            self.graph[source][target].assign(edge_data, skip=("source", "target"))
+
+        return self.graph
+
+
+def current_rss():
+    # Resident memory of this process in bytes, None where /proc is not available
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ChunkedGraphBuilder:
+    """Builds one graph from parsed files a batch at a time.
+
+    Parsed records are buffered for at most `batch_size` files and then
+    copied into the graph and dropped, so only one batch of records is alive
+    next to the graph instead of the records of every file. With
+    `memory_ceiling` (bytes of resident memory) a batch is also flushed as
+    soon as the process grows past the ceiling, before the next file is
+    parsed. The graph itself only grows, so once it passes the ceiling the
+    next flush waits until the process has grown by a headroom (a tenth of
+    the ceiling, at least MIN_CEILING_HEADROOM) over what was left after the
+    last one: the ceiling then bounds the buffered records, not the graph.
+    The garbage collector runs after a ceiling flush for as long as it frees
+    memory. Linking runs on the finished graph, see SymbolLinker.link_graph.
+    """
+
+    def __init__(self, batch_size=100, memory_ceiling=None, profiler=None):
+        self.batch_size = batch_size
+        self.memory_ceiling = memory_ceiling
+        self.profiler = profiler or PipelineProfiler(trace_memory=False)
+        self.graph_builder = GraphBuilder()
+        self._nodes = []
+        self._edges = []
+        self._files = 0
+        self._threshold = memory_ceiling
+        self._collect = True
+        self.stats = {"files": 0, "batches": 0, "ceiling_flushes": 0, "peak_rss_bytes": 0}
+
+    @property
+    def graph(self):
+        return self.graph_builder.graph
+
+    def over_ceiling(self):
+        if self.memory_ceiling is None:
+            return False
+        rss = current_rss()
+        if rss is None:
+            return False
+        self.stats["peak_rss_bytes"] = max(self.stats["peak_rss_bytes"], rss)
+        return rss > self._threshold
+
+    def _ceiling_flush(self):
+        self.stats["ceiling_flushes"] += 1
+        self.flush()
+        rss = current_rss()
+        if self._collect and rss is not None:
+            gc.collect()
+            collected_rss = current_rss()
+            # A collect that frees nothing would only cost time on every later flush
+            self._collect = collected_rss < rss
+            rss = collected_rss
+        if rss is not None:
+            headroom = max(self.memory_ceiling // 10, MIN_CEILING_HEADROOM)
+            self._threshold = max(self.memory_ceiling, rss + headroom)
+
+    def add(self, parsed_data):
+        """Buffer the records of one parsed file, flushing the batch when it is full or memory is over the ceiling."""
+        self._nodes.extend(parsed_data["nodes"])
+        self._edges.extend(parsed_data["edges"])
+        self._files += 1
+        self.stats["files"] += 1
+        if self._files >= self.batch_size:
+            self.flush()
+        elif self.over_ceiling():
+            self._ceiling_flush()
+
+    def flush(self):
+        if not self._files:
+            return
+        batch = {"nodes": self._nodes, "edges": self._edges}
+        # The records are dropped as soon as the graph holds its copies of them
+        self._nodes, self._edges, self._files = [], [], 0
+        with self.profiler.stage("build"):
+            self.graph_builder.build_graph(batch)
+        self.stats["batches"] += 1
+
+    def finish(self, link=True):
+        self.flush()
+        if link:
+            linker = SymbolLinker()
+            with self.profiler.stage("link"):
+                linker.link_graph(self.graph)
+            for outcome, count in linker.stats.items():
+                self.profiler.count(f"link_{outcome}", count)
         return self.graph
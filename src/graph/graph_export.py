@@ -0,0 +1,305 @@
+import json
+import os
+import re
+from array import array
+from contextlib import contextmanager
+from enum import Enum
+from xml.sax.saxutils import escape, quoteattr
+
+import networkx as nx
+
+from src.parser.records import edge_entries
+
+EXPORT_FORMATS = ("graphml", "json", "parquet", "arrow")
+
+# Characters that XML 1.0 does not allow, docstrings occasionally contain them
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+
+_GRAPHML_HEADER = (
+    "<?xml version='1.0' encoding='utf-8'?>\n"
+    '<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
+    'http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">\n'
+)
+
+# Columns of the Parquet/Arrow tables, one per record field
+NODE_COLUMNS = (
+    ("id", "string"), ("type", "string"), ("name", "string"), ("file_path", "string"),
+    ("line_number", "int64"), ("end_line_number", "int64"), ("docstring", "string"), ("content_hash", "string"),
+    ("start_offset", "int64"), ("end_offset", "int64"), ("docstring_start", "int64"), ("docstring_end", "int64"),
+)
+EDGE_COLUMNS = (
+    ("source", "string"), ("target", "string"), ("type", "string"),
+    ("line_number", "int64"), ("count", "int64"), ("lines", "list<int64>"),
+)
+
+
+def _plain(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, array):
+        return value.tolist()
+    return value
+
+
+@contextmanager
+def _open_text(path_or_file):
+    # A path is opened (and closed) here, an open text file is written to as it is
+    if isinstance(path_or_file, (str, os.PathLike)):
+        with open(path_or_file, "w", encoding="utf-8", newline="\n") as f:
+            yield f
+    else:
+        yield path_or_file
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Parquet and Arrow export need pyarrow, install it with `pip install pyarrow`.") from e
+    return pyarrow
+
+
+class GraphExporter:
+    """Writes a code graph as GraphML, node-link JSON, Parquet or Arrow without building the whole output in memory.
+
+    Nodes and edges are serialized one by one and written `chunk_size` at a
+    time, so memory stays flat however large the graph is. Node and edge type
+    filters work as in DotGenerator. GraphML and JSON keep one edge per node
+    pair like the graph, with the further edge types of the pair nested in
+    `other_types`, while the Parquet/Arrow tables have one row per edge type.
+    """
+
+    def __init__(self, chunk_size=1000, node_types=None, edge_types=None):
+        self.chunk_size = chunk_size
+        self.node_types = set(node_types) if node_types else None
+        self.edge_types = set(edge_types) if edge_types else None
+
+    def iter_nodes(self, graph: nx.DiGraph):
+        for node_id, data in graph.nodes(data=True):
+            if self.node_types is None or data.get("type") in self.node_types:
+                yield node_id, data
+
+    def iter_edges(self, graph: nx.DiGraph):
+        # An edge is kept when its type passes and both ends are exported, one row per edge type
+        node_types = self.node_types
+        for source, target, data in graph.edges(data=True):
+            if node_types is not None and (graph.nodes[source].get("type") not in node_types
+                                           or graph.nodes[target].get("type") not in node_types):
+                continue
+            for entry in edge_entries(data):
+                if self.edge_types is not None and entry.get("type") not in self.edge_types:
+                    continue
+                if entry is data and "other_types" in data:
+                    entry = {key: value for key, value in data.items() if key != "other_types"}
+                yield source, target, entry
+
+    def iter_edge_pairs(self, graph: nx.DiGraph):
+        # One plain row per node pair: the first exported type's fields, further exported types nested in other_types
+        entries = []
+        last_pair = None
+        for source, target, entry in self.iter_edges(graph):
+            if (source, target) != last_pair and entries:
+                yield (*last_pair, self._pair_row(entries))
+                entries = []
+            last_pair = (source, target)
+            entries.append(entry)
+        if entries:
+            yield (*last_pair, self._pair_row(entries))
+
+    @staticmethod
+    def _pair_row(entries):
+        row = {key: _plain(value) for key, value in entries[0].items()}
+        if len(entries) > 1:
+            row["other_types"] = [{key: _plain(value) for key, value in entry.items()} for entry in entries[1:]]
+        return row
+
+    def verify_round_trip(self, graph: nx.DiGraph, export_format, path):
+        """Read a GraphML or JSON export back with networkx and check it has the exported nodes and typed edges."""
+        if export_format == "graphml":
+            read = nx.read_graphml(path)
+        elif export_format == "json":
+            with open(path, "r", encoding="utf-8") as f:
+                read = nx.node_link_graph(json.load(f), edges="edges")
+        else:
+            raise ValueError(f"Round-trip checks are only available for graphml and json, not '{export_format}'")
+        if read.is_multigraph():
+            raise ValueError(f"{path} reads back as a multigraph, node pairs are written more than once")
+
+        read_edges = set()
+        for source, target, data in read.edges(data=True):
+            other_types = data.get("other_types") or []
+            if isinstance(other_types, str):
+                # GraphML has no nested values, the further types are a JSON string there
+                other_types = json.loads(other_types)
+            read_edges.update((source, target, entry["type"]) for entry in [data, *other_types])
+        expected_edges = {(source, target, _plain(entry.get("type"))) for source, target, entry in self.iter_edges(graph)}
+        expected_nodes = {node_id for node_id, _ in self.iter_nodes(graph)}
+        if set(read.nodes) != expected_nodes or read_edges != expected_edges:
+            raise ValueError(f"{path} does not round-trip: {len(set(read.nodes) ^ expected_nodes)} nodes and "
+                             f"{len(read_edges ^ expected_edges)} typed edges differ")
+
+    def _write_chunked(self, f, fragments):
+        chunk = []
+        for fragment in fragments:
+            chunk.append(fragment)
+            if len(chunk) >= self.chunk_size:
+                f.write("".join(chunk))
+                chunk.clear()
+        if chunk:
+            f.write("".join(chunk))
+
+    def export(self, graph: nx.DiGraph, export_format, path):
+        if export_format == "graphml":
+            self.write_graphml(graph, path)
+        elif export_format == "json":
+            self.write_json(graph, path)
+        elif export_format == "parquet":
+            self.write_parquet(graph, path)
+        elif export_format == "arrow":
+            self.write_arrow(graph, path)
+        else:
+            raise ValueError(f"Unknown export format '{export_format}', expected one of {', '.join(EXPORT_FORMATS)}")
+
+    # --- GraphML ---
+
+    @staticmethod
+    def _graphml_type(types):
+        if types <= {bool}:
+            return "boolean"
+        if types <= {int}:
+            return "long"
+        if types <= {int, float}:
+            return "double"
+        return "string"
+
+    def _graphml_keys(self, items, domain, prefix):
+        # GraphML declares every attribute before the graph, so one pass collects names and value types
+        types = {}
+        for data in items:
+            for key, value in data.items():
+                if value is None:
+                    continue
+                value = _plain(value)
+                types.setdefault(key, set()).add(type(value) if isinstance(value, (bool, int, float)) else str)
+        return {key: (f"{prefix}{i}", domain, self._graphml_type(value_types)) for i, (key, value_types) in enumerate(types.items())}
+
+    @staticmethod
+    def _graphml_value(value):
+        value = _plain(value)
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, list):
+            if value and isinstance(value[0], dict):
+                # The further edge types of a node pair, GraphML has no nested values either
+                return escape(json.dumps(value))
+            # GraphML has no list type, line numbers are written comma separated
+            return ",".join(str(item) for item in value)
+        return escape(_INVALID_XML_CHARS.sub("", str(value)))
+
+    def _graphml_data(self, data, keys):
+        return "".join(
+            f'<data key="{keys[key][0]}">{self._graphml_value(value)}</data>'
+            for key, value in data.items() if value is not None
+        )
+
+    def write_graphml(self, graph: nx.DiGraph, path_or_file):
+        node_keys = self._graphml_keys((data for _, data in self.iter_nodes(graph)), "node", "n")
+        edge_keys = self._graphml_keys((data for _, _, data in self.iter_edge_pairs(graph)), "edge", "e")
+        with _open_text(path_or_file) as f:
+            f.write(_GRAPHML_HEADER)
+            for name, (key_id, domain, value_type) in list(node_keys.items()) + list(edge_keys.items()):
+                f.write(f'  <key id="{key_id}" for="{domain}" attr.name={quoteattr(name)} attr.type="{value_type}" />\n')
+            f.write('  <graph edgedefault="directed">\n')
+            self._write_chunked(f, (
+                f"    <node id={quoteattr(str(node_id))}>{self._graphml_data(data, node_keys)}</node>\n"
+                for node_id, data in self.iter_nodes(graph)
+            ))
+            self._write_chunked(f, (
+                f"    <edge source={quoteattr(str(source))} target={quoteattr(str(target))}>{self._graphml_data(data, edge_keys)}</edge>\n"
+                for source, target, data in self.iter_edge_pairs(graph)
+            ))
+            f.write("  </graph>\n</graphml>\n")
+
+    # --- node-link JSON ---
+
+    def write_json(self, graph: nx.DiGraph, path_or_file):
+        # The layout of nx.node_link_data, so nx.node_link_graph(json.load(f), edges="edges") reads it back
+        def node_rows():
+            for i, (node_id, data) in enumerate(self.iter_nodes(graph)):
+                row = {"id": node_id}
+                row.update((key, _plain(value)) for key, value in data.items())
+                yield ("," if i else "") + "\n    " + json.dumps(row)
+
+        def edge_rows():
+            for i, (source, target, data) in enumerate(self.iter_edge_pairs(graph)):
+                row = {"source": source, "target": target}
+                row.update(data)
+                yield ("," if i else "") + "\n    " + json.dumps(row)
+
+        with _open_text(path_or_file) as f:
+            f.write('{"directed": true, "multigraph": false, "graph": {},\n  "nodes": [')
+            self._write_chunked(f, node_rows())
+            f.write('\n  ],\n  "edges": [')
+            self._write_chunked(f, edge_rows())
+            f.write("\n  ]\n}\n")
+
+    # --- Parquet / Arrow (optional pyarrow) ---
+
+    @staticmethod
+    def _arrow_schema(pyarrow, columns):
+        types = {"string": pyarrow.string(), "int64": pyarrow.int64(), "list<int64>": pyarrow.list_(pyarrow.int64())}
+        return pyarrow.schema([(name, types[column_type]) for name, column_type in columns])
+
+    def _record_batches(self, pyarrow, schema, rows):
+        # Column lists are filled row by row and turned into one record batch per chunk
+        names = schema.names
+        columns = {name: [] for name in names}
+        for row in rows:
+            for name in names:
+                columns[name].append(_plain(row.get(name)))
+            if len(columns[names[0]]) >= self.chunk_size:
+                yield pyarrow.record_batch([columns[name] for name in names], schema=schema)
+                columns = {name: [] for name in names}
+        if columns[names[0]]:
+            yield pyarrow.record_batch([columns[name] for name in names], schema=schema)
+
+    def _node_rows(self, graph):
+        for node_id, data in self.iter_nodes(graph):
+            row = dict(data)
+            row["id"] = node_id
+            yield row
+
+    def _edge_rows(self, graph):
+        for source, target, data in self.iter_edges(graph):
+            row = dict(data)
+            row["source"] = source
+            row["target"] = target
+            yield row
+
+    def _write_tables(self, graph, out_dir, extension, open_writer):
+        # Attributes outside the record fields are not written, the tables keep a fixed schema
+        pyarrow = _import_pyarrow()
+        os.makedirs(out_dir, exist_ok=True)
+        paths = []
+        for table, columns, rows in (("nodes", NODE_COLUMNS, self._node_rows(graph)), ("edges", EDGE_COLUMNS, self._edge_rows(graph))):
+            schema = self._arrow_schema(pyarrow, columns)
+            path = os.path.join(out_dir, f"{table}.{extension}")
+            with open_writer(pyarrow, path, schema) as writer:
+                for batch in self._record_batches(pyarrow, schema, rows):
+                    writer.write_batch(batch)
+            paths.append(path)
+        return paths
+
+    def write_parquet(self, graph: nx.DiGraph, out_dir):
+        """Write nodes.parquet and edges.parquet into out_dir, one row group per chunk."""
+        return self._write_tables(graph, out_dir, "parquet",
+                                  lambda pyarrow, path, schema: pyarrow.parquet.ParquetWriter(path, schema))
+
+    def write_arrow(self, graph: nx.DiGraph, out_dir):
+        """Write nodes.arrow and edges.arrow (Arrow IPC files) into out_dir."""
+        return self._write_tables(graph, out_dir, "arrow",
+                                  lambda pyarrow, path, schema: pyarrow.ipc.new_file(path, schema))
@@ -0,0 +1,283 @@
+import base64
+import json
+import os
+import urllib.request
+from collections import defaultdict
+
+import networkx as nx
+
+from src.graph.dot_generator import DotGenerator
+from src.parser.records import edge_entries
+
+D3_URL = "https://d3js.org/d3.v5.min.js"
+HPCC_WASM_URL = "https://unpkg.com/@hpcc-js/wasm@0.3.11/dist/index.min.js"
+GRAPHVIZ_WASM_URL = "https://unpkg.com/@hpcc-js/wasm@0.3.11/dist/graphvizlib.wasm"
+D3_GRAPHVIZ_URL = "https://unpkg.com/d3-graphviz@3.0.5/build/d3-graphviz.js"
+
+# Local file name -> CDN URL, in load order
+JS_ASSETS = {
+    "d3.v5.min.js": D3_URL,
+    "hpcc-wasm.min.js": HPCC_WASM_URL,
+    "d3-graphviz.js": D3_GRAPHVIZ_URL,
+}
+WASM_ASSET = ("graphvizlib.wasm", GRAPHVIZ_WASM_URL)
+
+DEFAULT_ASSET_DIR = os.path.join(os.path.expanduser("~"), ".cache", "graphrag", "html_assets")
+
+
+def generate_interactive_html(dot_string, node_types, edge_types):
+    # Properly escape the dot string for JavaScript
+    js_dot_string = json.dumps(dot_string)
+
+    node_filters_html = ''.join(f'<label><input type="checkbox" class="node-filter" value="{nt}" checked> {nt}</label>' for nt in node_types)
+    edge_filters_html = ''.join(f'<label><input type="checkbox" class="edge-filter" value="{et}" checked> {et}</label>' for et in edge_types)
+
+    return f'''
+    <!DOCTYPE html>
+    <html>
+    <head>
+      <title>Interactive Code Graph</title>
+      <script src="https://d3js.org/d3.v5.min.js"></script>
+      <script src="https://unpkg.com/@hpcc-js/wasm@0.3.11/dist/index.min.js"></script>
+      <script src="https://unpkg.com/d3-graphviz@3.0.5/build/d3-graphviz.js"></script>
+      <style>
+        #graph-container {{
+          border: 1px solid black;
+          width: 100%;
+          height: 80vh;
+        }}
+        .filters {{
+          margin-bottom: 10px;
+        }}
+      </style>
+    </head>
+    <body>
+      <div class="filters">
+        <strong>Node Types:</strong>
+        {node_filters_html}
+        <br>
+        <strong>Edge Types:</strong>
+        {edge_filters_html}
+      </div>
+      <div id="graph-container"></div>
+
+      <script>
+        const dotString = {js_dot_string};
+        const graphviz = d3.select("#graph-container").graphviz();
+
+        function renderGraph() {{
+          const nodeFilters = Array.from(document.querySelectorAll('.node-filter:checked')).map(el => el.value);
+          const edgeFilters = Array.from(document.querySelectorAll('.edge-filter:checked')).map(el => el.value);
+
+          const filteredDot = dotString.split('\n').filter(line => {{
+            if (line.includes('->')) {{
+              const match = line.match(/type="(.*?)"/);
+              if (match) {{
+                return edgeFilters.includes(match[1]);
+              }}
+              return true;
+            }} else if (line.includes('shape')) {{
+                const match = line.match(/type="(.*?)"/);
+                if(match){{
+                    return nodeFilters.includes(match[1]);
+                }}
+                return true;
+            }}
+            return true;
+          }}).join('\n');
+
+          graphviz.renderDot(filteredDot);
+        }}
+
+        d3.selectAll('.node-filter, .edge-filter').on('change', renderGraph);
+
+        renderGraph();
+      </script>
+    </body>
+    </html>
+    '''
+
+def bundle_assets(asset_dir=DEFAULT_ASSET_DIR):
+    """Download the JS and wasm assets once so exports can inline them offline."""
+    os.makedirs(asset_dir, exist_ok=True)
+    paths = {}
+    for file_name, url in list(JS_ASSETS.items()) + [WASM_ASSET]:
+        path = os.path.join(asset_dir, file_name)
+        if not os.path.exists(path):
+            # Downloaded next to the asset and renamed in one step, so a failed or concurrent
+            # download never leaves a truncated file that later exports would inline
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with urllib.request.urlopen(url) as response, open(temp_path, "wb") as f:
+                    f.write(response.read())
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        paths[file_name] = path
+    return paths
+
+
+class InteractiveHtmlExporter:
+    """Interactive HTML export with the filtering work done in Python.
+
+    Node statements are pre-joined per node type and edge statements per
+    (edge type, source type, target type), so a checkbox change only joins the
+    selected fragments instead of regex-filtering every DOT line. With
+    `cluster_modules` the non-module nodes are pre-joined per module cluster
+    and node type instead, and each cluster is drawn as a DOT subgraph like
+    DotGenerator.generate_dot draws it.
+    """
+
+    def __init__(self, inline_assets=False, asset_dir=DEFAULT_ASSET_DIR, source_accessor=None, positions=None):
+        self.inline_assets = inline_assets
+        self.asset_dir = asset_dir
+        # With positions, toggling a filter only hides elements, the layout stays where it was
+        self.dot_generator = DotGenerator(source_accessor, positions)
+
+    def build_payload(self, graph: nx.DiGraph, cluster_modules=False) -> dict:
+        node_fragments = defaultdict(list)
+        clusters = []
+        if cluster_modules:
+            for module_name, nodes in self.dot_generator.module_clusters(graph).items():
+                cluster_fragments = defaultdict(list)
+                for node_id, node_data in nodes:
+                    cluster_fragments[node_data.get("type", "unknown")].append(self.dot_generator.node_statement(node_id, node_data))
+                clusters.append({
+                    "header": self.dot_generator.cluster_header(module_name),
+                    "nodes": {node_type: "".join(statements) for node_type, statements in cluster_fragments.items()},
+                })
+        for node_id, node_data in graph.nodes(data=True):
+            node_type = node_data.get("type", "unknown")
+            if not cluster_modules or node_type == "module":
+                node_fragments[node_type].append(self.dot_generator.node_statement(node_id, node_data))
+
+        edge_fragments = defaultdict(list)
+        for source, target, edge_data in graph.edges(data=True):
+            for entry in edge_entries(edge_data):
+                # Endpoints that were never declared as nodes have no type and are always shown
+                key = (entry.get("type", "unknown"), graph.nodes[source].get("type"), graph.nodes[target].get("type"))
+                edge_fragments[key].append(self.dot_generator.edge_statement(source, target, entry))
+
+        return {
+            "header": self.dot_generator.dot_header(),
+            "nodes": {node_type: "".join(statements) for node_type, statements in node_fragments.items()},
+            "clusters": clusters,
+            "edges": [
+                {"type": edge_type, "source": source_type, "target": target_type, "dot": "".join(statements)}
+                for (edge_type, source_type, target_type), statements in edge_fragments.items()
+            ],
+        }
+
+    def _script_tags(self):
+        if not self.inline_assets:
+            return "\n".join(f'<script src="{url}"></script>' for url in JS_ASSETS.values())
+
+        paths = bundle_assets(self.asset_dir)
+        tags = []
+        for file_name in JS_ASSETS:
+            with open(paths[file_name], "r", encoding="utf-8") as f:
+                # Keep a literal closing tag inside the bundle from ending the script element
+                tags.append("<script>" + f.read().replace("</script", "<\\/script") + "</script>")
+            if file_name == "hpcc-wasm.min.js":
+                with open(paths[WASM_ASSET[0]], "rb") as f:
+                    wasm_b64 = base64.b64encode(f.read()).decode("ascii")
+                # Serve the wasm binary from memory instead of the CDN
+                tags.append(f"""<script>
+  (function () {{
+    const wasmBytes = Uint8Array.from(atob("{wasm_b64}"), c => c.charCodeAt(0));
+    const originalFetch = window.fetch;
+    window.fetch = function (input, init) {{
+      const url = typeof input === "string" ? input : input.url;
+      if (url.endsWith("{WASM_ASSET[0]}")) {{
+        return Promise.resolve(new Response(wasmBytes, {{headers: {{"Content-Type": "application/wasm"}}}}));
+      }}
+      return originalFetch.apply(this, arguments);
+    }};
+    window["@hpcc-js/wasm"].wasmFolder("https://inline.graphrag.local");
+  }})();
+</script>""")
+        return "\n".join(tags)
+
+    def export(self, graph: nx.DiGraph, node_types=None, edge_types=None, cluster_modules=False) -> str:
+        payload = self.build_payload(graph, cluster_modules)
+        all_node_types = sorted(set(payload["nodes"]).union(*(cluster["nodes"] for cluster in payload["clusters"])))
+        all_edge_types = sorted({group["type"] for group in payload["edges"]})
+        checked_nodes = set(node_types) if node_types else set(all_node_types)
+        checked_edges = set(edge_types) if edge_types else set(all_edge_types)
+
+        node_filters_html = ''.join(
+            f'<label><input type="checkbox" class="node-filter" value="{nt}"{" checked" if nt in checked_nodes else ""}> {nt}</label>'
+            for nt in all_node_types)
+        edge_filters_html = ''.join(
+            f'<label><input type="checkbox" class="edge-filter" value="{et}"{" checked" if et in checked_edges else ""}> {et}</label>'
+            for et in all_edge_types)
+        # Escape "</" so DOT labels cannot close the script element
+        js_payload = json.dumps(payload).replace("</", "<\\/")
+
+        return f'''
+    <!DOCTYPE html>
+    <html>
+    <head>
+      <meta charset="UTF-8">
+      <title>Interactive Code Graph</title>
+      {self._script_tags()}
+      <style>
+        #graph-container {{
+          border: 1px solid black;
+          width: 100%;
+          height: 80vh;
+        }}
+        .filters {{
+          margin-bottom: 10px;
+        }}
+      </style>
+    </head>
+    <body>
+      <div class="filters">
+        <strong>Node Types:</strong>
+        {node_filters_html}
+        <br>
+        <strong>Edge Types:</strong>
+        {edge_filters_html}
+      </div>
+      <div id="graph-container"></div>
+
+      <script>
+        const payload = {js_payload};
+        const graphviz = d3.select("#graph-container").graphviz();
+
+        function renderGraph() {{
+          const nodeFilters = new Set(Array.from(document.querySelectorAll('.node-filter:checked')).map(el => el.value));
+          const edgeFilters = new Set(Array.from(document.querySelectorAll('.edge-filter:checked')).map(el => el.value));
+
+          const parts = [payload.header];
+          nodeFilters.forEach(nodeType => {{
+            if (payload.nodes[nodeType]) parts.push(payload.nodes[nodeType]);
+          }});
+          for (const cluster of payload.clusters) {{
+            const clusterParts = [];
+            nodeFilters.forEach(nodeType => {{
+              if (cluster.nodes[nodeType]) clusterParts.push(cluster.nodes[nodeType]);
+            }});
+            if (clusterParts.length) parts.push(cluster.header, ...clusterParts, "  }}\n");
+          }}
+          for (const group of payload.edges) {{
+            if (edgeFilters.has(group.type)
+                && (group.source === null || nodeFilters.has(group.source))
+                && (group.target === null || nodeFilters.has(group.target))) {{
+              parts.push(group.dot);
+            }}
+          }}
+          parts.push("}}\\n");
+
+          graphviz.renderDot(parts.join(""));
+        }}
+
+        d3.selectAll('.node-filter, .edge-filter').on('change', renderGraph);
+
+        renderGraph();
+      </script>
+    </body>
+    </html>
+    '''
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import networkx as nx
+import numpy as np
+
+
+def graph_fingerprint(graph: nx.DiGraph) -> str:
+    # Node and edge ids in insertion order, which the pipeline keeps deterministic for the same code
+    digest = hashlib.blake2b(digest_size=16)
+    for node_id in graph.nodes:
+        digest.update(str(node_id).encode("utf-8", errors="surrogateescape") + b"\0")
+    digest.update(b"\1")
+    for source, target in graph.edges:
+        digest.update(f"{source}\0{target}\0".encode("utf-8", errors="surrogateescape"))
+    return digest.hexdigest()
+
+
+class LayeredLayout:
+    """Sugiyama-style layered layout of a code graph, computed with NumPy.
+
+    Layers come from the longest path over the condensation of the graph, so
+    cycles (recursion, mutual calls) share one layer. The order within each
+    layer is improved with barycenter sweeps, done for all layers at once on
+    edge arrays. Layers run left to right, like `rankdir=LR` in the DOT output.
+    Coordinates are in points.
+    """
+
+    def __init__(self, layer_gap=220.0, node_gap=60.0, sweeps=8):
+        self.layer_gap = layer_gap
+        self.node_gap = node_gap
+        self.sweeps = sweeps
+
+    def _layers(self, graph, index):
+        components = nx.condensation(graph)
+        component_layer = {}
+        for component in nx.topological_sort(components):
+            predecessors = components.pred[component]
+            component_layer[component] = max((component_layer[p] + 1 for p in predecessors), default=0)
+        layers = np.zeros(len(index), dtype=np.int64)
+        for node_id, component in components.graph["mapping"].items():
+            layers[index[node_id]] = component_layer[component]
+        return layers
+
+    @staticmethod
+    def _ranks(layers, *keys):
+        # Position of every node within its layer when each layer is sorted by the keys, the first one first
+        order = np.lexsort((*reversed(keys), layers))
+        ranks = np.empty(len(layers), dtype=np.float64)
+        layer_starts = np.searchsorted(layers[order], layers[order], side="left")
+        ranks[order] = np.arange(len(layers)) - layer_starts
+        return ranks
+
+    def compute(self, graph: nx.DiGraph) -> dict:
+        node_ids = list(graph.nodes)
+        if not node_ids:
+            return {}
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
+        layers = self._layers(graph, index)
+
+        edges = np.array([(index[source], index[target]) for source, target in graph.edges], dtype=np.int64).reshape(-1, 2)
+        # Edges inside one layer (cycles) do not pull the ordering either way
+        edges = edges[layers[edges[:, 0]] != layers[edges[:, 1]]]
+        sources, targets = edges[:, 0], edges[:, 1]
+        size = len(node_ids)
+        in_degree = np.bincount(targets, minlength=size)
+        out_degree = np.bincount(sources, minlength=size)
+
+        ranks = self._ranks(layers, np.arange(size))
+        for sweep in range(self.sweeps):
+            # Alternate between the predecessors and the successors, nodes without any keep their rank
+            if sweep % 2 == 0:
+                sums, degree = np.bincount(targets, weights=ranks[sources], minlength=size), in_degree
+            else:
+                sums, degree = np.bincount(sources, weights=ranks[targets], minlength=size), out_degree
+            barycenters = np.where(degree > 0, sums / np.maximum(degree, 1), ranks)
+            ranks = self._ranks(layers, barycenters, ranks)
+
+        # Center every layer around y = 0
+        layer_sizes = np.bincount(layers)
+        xs = layers * self.layer_gap
+        ys = (ranks - (layer_sizes[layers] - 1) / 2.0) * self.node_gap
+        return {node_id: (float(xs[i]), float(ys[i])) for i, node_id in enumerate(node_ids)}
+
+
+class LayoutCache:
+    """Layouts by graph fingerprint, in memory and optionally as JSON files in cache_dir.
+
+    A layout is computed once per graph version. Filters only hide nodes and
+    edges, so every filter combination reuses the same coordinates.
+    """
+
+    def __init__(self, layout=None, cache_dir=None, max_entries=8):
+        self.layout = layout or LayeredLayout()
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._positions = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, fingerprint):
+        return os.path.join(self.cache_dir, f"layout_{fingerprint}.json")
+
+    def positions(self, graph: nx.DiGraph, fingerprint=None) -> dict:
+        fingerprint = fingerprint or graph_fingerprint(graph)
+        positions = self._positions.get(fingerprint)
+        if positions is None and self.cache_dir and os.path.exists(self._path(fingerprint)):
+            with open(self._path(fingerprint), "r", encoding="utf-8") as f:
+                positions = {node_id: tuple(xy) for node_id, xy in json.load(f).items()}
+        if positions is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            positions = self.layout.compute(graph)
+            if self.cache_dir:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(self._path(fingerprint), "w", encoding="utf-8") as f:
+                    json.dump(positions, f)
+        self._positions[fingerprint] = positions
+        self._positions.move_to_end(fingerprint)
+        if len(self._positions) > self.max_entries:
+            self._positions.popitem(last=False)
+        return positions
@@ -0,0 +1,144 @@
+import json
+from collections import defaultdict
+
+import networkx as nx
+
+from src.parser.records import edge_entries
+
+
+def convert_dot_to_markmap_json(dot_string):
+    nodes = {}
+    edges = []
+
+    for line in dot_string.strip().split('\n'):
+        if '->' in line:
+            source, target_part = line.split('->')
+            source = source.strip().replace('"', '')
+            target, attrs = target_part.split('[')
+            target = target.strip().replace('"', '')
+            attrs = attrs.strip()[:-1]
+            label = ''
+            if 'label=' in attrs:
+                label = attrs.split('label=')[-1].split(',')[0].replace('"', '')
+            edges.append({"source": source, "target": target, "label": label})
+        elif 'label=' in line:
+            node_id, attrs = line.split('[')
+            node_id = node_id.strip().replace('"', '')
+            label = ''
+            if 'label=' in attrs:
+                label = attrs.split('label=')[-1].split(',')[0].replace('"', '')
+            nodes[node_id] = {"id": node_id, "label": label, "children": []}
+
+    for edge in edges:
+        source_node = nodes.get(edge["source"])
+        target_node = nodes.get(edge["target"])
+        if source_node and target_node:
+            source_node["children"].append(target_node)
+
+    root_nodes = [node for node in nodes.values() if not any(edge["target"] == node["id"] for edge in edges)]
+
+    if not root_nodes and nodes:
+        root_nodes = [next(iter(nodes.values()))]
+
+    def build_markmap_tree(node, visited):
+        if node['id'] in visited:
+            return None
+        visited.add(node['id'])
+        children = [build_markmap_tree(child, visited.copy()) for child in node["children"]]
+        return {
+            "content": node["label"],
+            "children": [child for child in children if child is not None]
+        }
+
+    markmap_children = [build_markmap_tree(root, set()) for root in root_nodes]
+    return json.dumps({"content": "Code Graph", "children": markmap_children})
+
+
+class MarkmapBuilder:
+    """Builds the Markmap tree straight from the code graph.
+
+    Every node is expanded at most once, so the cost is O(nodes + edges) of the
+    selected hierarchy regardless of how dense or cyclic the graph is.
+    """
+
+    def __init__(self, edge_types=("CONTAINS",), max_depth=8, max_children=100, title="Code Graph"):
+        self.edge_types = set(edge_types)
+        self.max_depth = max_depth
+        self.max_children = max_children
+        self.title = title
+
+    def _label(self, node_id, node_data):
+        return node_data.get("name") or node_id
+
+    def build(self, graph: nx.DiGraph, node_filter: list = None) -> dict:
+        included = {
+            node_id: data for node_id, data in graph.nodes(data=True)
+            if not node_filter or data.get("type") in node_filter
+        }
+
+        children = defaultdict(list)
+        in_degree = dict.fromkeys(included, 0)
+        for source, target, edge_data in graph.edges(data=True):
+            if not any(entry.get("type") in self.edge_types for entry in edge_entries(edge_data)):
+                continue
+            if source in included and target in included and source != target:
+                children[source].append(target)
+                in_degree[target] += 1
+
+        roots = [node_id for node_id, degree in in_degree.items() if degree == 0]
+        reached = set()
+
+        def mark_reachable(start_id):
+            reached.add(start_id)
+            stack = [start_id]
+            while stack:
+                for child_id in children[stack.pop()]:
+                    if child_id not in reached:
+                        reached.add(child_id)
+                        stack.append(child_id)
+
+        for node_id in roots:
+            mark_reachable(node_id)
+        # Components that only consist of cycles have no in-degree 0 node, so one
+        # member of each becomes an extra root
+        for node_id in included:
+            if node_id not in reached:
+                roots.append(node_id)
+                mark_reachable(node_id)
+
+        root = {"content": self.title, "children": []}
+        visited = set()
+
+        def expand(start_id):
+            tree = {"content": self._label(start_id, included[start_id]), "children": []}
+            visited.add(start_id)
+            stack = [(start_id, tree, 1)]
+            while stack:
+                node_id, node_tree, depth = stack.pop()
+                # Children already shown elsewhere in the tree are neither repeated nor counted as hidden
+                unvisited = [child_id for child_id in children[node_id] if child_id not in visited]
+                if depth >= self.max_depth:
+                    if unvisited:
+                        node_tree["children"].append({"content": f"... {len(unvisited)} more", "children": []})
+                    continue
+                pending = []
+                for child_id in unvisited[:self.max_children]:
+                    visited.add(child_id)
+                    child_tree = {"content": self._label(child_id, included[child_id]), "children": []}
+                    node_tree["children"].append(child_tree)
+                    pending.append((child_id, child_tree, depth + 1))
+                hidden = len(unvisited) - self.max_children
+                if hidden > 0:
+                    node_tree["children"].append({"content": f"... {hidden} more", "children": []})
+                # Reverse so the stack expands children in their original order
+                stack.extend(reversed(pending))
+            return tree
+
+        for node_id in roots:
+            if node_id not in visited:
+                root["children"].append(expand(node_id))
+
+        return root
+
+    def to_json(self, graph: nx.DiGraph, node_filter: list = None) -> str:
+        return json.dumps(self.build(graph, node_filter=node_filter))
@@ -0,0 +1,173 @@
+import os
+import pickle
+from collections import OrderedDict, defaultdict
+
+from src.graph.graph_builder import CodeGraph
+from src.log_analyzer.log_analyzer import SourceFileIndex
+
+# Nodes that belong to exactly one shard, everything else (variables, builtins,
+# services, synthetic targets) is copied into each shard that references it
+OWNED_NODE_TYPES = ("module", "class", "function", "file")
+ROOT_SHARD = "(root)"
+INDEX_FILE = "index.pickle"
+
+
+def shard_key(file_path, root=None):
+    """Top-level package or directory of `file_path` below `root`, the full directory path of files outside it."""
+    path = os.path.abspath(file_path)
+    if not root or not path.startswith(os.path.abspath(root) + os.sep):
+        # The first part of an absolute path is the same for every file, so it would put them all in one shard
+        return os.path.dirname(path)
+    parts = os.path.relpath(path, root).replace("\\", "/").split("/")
+    return parts[0] if len(parts) > 1 else ROOT_SHARD
+
+
+def split_graph(graph, root=None):
+    """Split a built code graph into one CodeGraph per top-level package.
+
+    Returns the shards and the global index: the owning shard of every module,
+    class and function, and the edges whose ends are owned by different shards,
+    which are kept in the index only.
+    """
+    symbols = {}
+    for node_id, data in graph.nodes(data=True):
+        if data.get("type") in OWNED_NODE_TYPES and data.get("file_path"):
+            symbols[node_id] = shard_key(data["file_path"], root)
+
+    shards = defaultdict(CodeGraph)
+
+    def copy_node(shard, node_id):
+        if node_id not in shard:
+            shard.add_node(node_id)
+            shard.nodes[node_id].assign(graph.nodes[node_id])
+
+    for node_id, shard_name in symbols.items():
+        copy_node(shards[shard_name], node_id)
+
+    cross_edges = []
+    for source, target, data in graph.edges(data=True):
+        source_shard = symbols.get(source)
+        target_shard = symbols.get(target)
+        if source_shard is not None and target_shard is not None and source_shard != target_shard:
+            cross_edges.append((source, target, data.copy()))
+            continue
+        shard = shards[source_shard or target_shard or ROOT_SHARD]
+        copy_node(shard, source)
+        copy_node(shard, target)
+        shard.add_edge(source, target)
+        shard[source][target].assign(data)
+
+    # Unowned nodes without any edge, such as a service that is never used
+    for node_id in graph.nodes:
+        if node_id not in symbols and graph.degree(node_id) == 0:
+            copy_node(shards[ROOT_SHARD], node_id)
+
+    names = defaultdict(list)
+    files = {}
+    for node_id, shard_name in symbols.items():
+        data = graph.nodes[node_id]
+        names[data.get("name")].append(node_id)
+        files[data["file_path"]] = shard_name
+    index = {"root": root, "symbols": symbols, "names": dict(names), "files": files, "cross_edges": cross_edges}
+    return dict(shards), index
+
+
+class ShardedGraph:
+    """A code graph stored as one pickle per top-level package, loaded on demand.
+
+    Only the global index (symbol-to-shard map, names, files and cross-shard
+    edges) is read up front. Shards are loaded when a query needs them and the
+    least recently used ones are dropped once the loaded shards exceed
+    `memory_cap` bytes. Shard sizes are measured as the size of their pickle,
+    which tracks their in-memory size closely enough for a cap.
+    """
+
+    def __init__(self, shard_dir, memory_cap=None):
+        self.shard_dir = shard_dir
+        self.memory_cap = memory_cap
+        with open(os.path.join(shard_dir, INDEX_FILE), "rb") as f:
+            index = pickle.load(f)
+        self.shards = index["shards"]
+        self.root = index["root"]
+        self.symbols = index["symbols"]
+        self.names = index["names"]
+        self.files = index["files"]
+        self.cross_edges = index["cross_edges"]
+        self._cross_out = defaultdict(list)
+        self._cross_in = defaultdict(list)
+        for edge in self.cross_edges:
+            self._cross_out[edge[0]].append(edge)
+            self._cross_in[edge[1]].append(edge)
+        self._file_index = None
+        self._loaded = OrderedDict()
+        self.loaded_bytes = 0
+        self.loads = 0
+        self.evictions = 0
+
+    @classmethod
+    def write(cls, graph, shard_dir, root=None, memory_cap=None):
+        os.makedirs(shard_dir, exist_ok=True)
+        shards, index = split_graph(graph, root)
+        index["shards"] = {}
+        for i, (shard_name, shard) in enumerate(sorted(shards.items())):
+            file_name = f"shard_{i:04d}.pickle"
+            with open(os.path.join(shard_dir, file_name), "wb") as f:
+                pickle.dump(shard, f, protocol=pickle.HIGHEST_PROTOCOL)
+            index["shards"][shard_name] = {
+                "file": file_name,
+                "nodes": shard.number_of_nodes(),
+                "edges": shard.number_of_edges(),
+                "bytes": os.path.getsize(os.path.join(shard_dir, file_name)),
+            }
+        with open(os.path.join(shard_dir, INDEX_FILE), "wb") as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return cls(shard_dir, memory_cap)
+
+    def shard(self, shard_name):
+        graph = self._loaded.get(shard_name)
+        if graph is not None:
+            self._loaded.move_to_end(shard_name)
+            return graph
+        info = self.shards[shard_name]
+        with open(os.path.join(self.shard_dir, info["file"]), "rb") as f:
+            graph = pickle.load(f)
+        self.loads += 1
+        self._loaded[shard_name] = graph
+        self.loaded_bytes += info["bytes"]
+        # The shard that was just asked for always stays, even if it alone is over the cap
+        while self.memory_cap is not None and self.loaded_bytes > self.memory_cap and len(self._loaded) > 1:
+            evicted, _ = self._loaded.popitem(last=False)
+            self.loaded_bytes -= self.shards[evicted]["bytes"]
+            self.evictions += 1
+        return graph
+
+    def is_loaded(self, shard_name):
+        return shard_name in self._loaded
+
+    def loaded_shards(self):
+        return list(self._loaded)
+
+    def shard_of(self, node_id):
+        return self.symbols.get(node_id)
+
+    def node(self, node_id):
+        shard_name = self.symbols.get(node_id)
+        if shard_name is None:
+            return None
+        return self.shard(shard_name).nodes[node_id]
+
+    def shard_for_file(self, file_path):
+        shard_name = self.files.get(file_path)
+        if shard_name is None:
+            # Paths from logs or diffs rarely match the parsed path exactly
+            if self._file_index is None:
+                self._file_index = SourceFileIndex(self.files)
+            resolved = self._file_index.resolve(file_path)
+            shard_name = self.files.get(resolved) if resolved else None
+        return shard_name
+
+    def cross_edges_from(self, node_id):
+        return self._cross_out.get(node_id, ())
+
+    def cross_edges_to(self, node_id):
+        return self._cross_in.get(node_id, ())
@@ -0,0 +1,166 @@
+import builtins
+from array import array
+from collections import defaultdict
+
+from src.parser.records import EdgeRecord, NodeType, edge_entries, edge_of_type
+
+LINKED_EDGE_TYPES = ("CALLS", "INHERITS")
+DEFINITION_TYPES = (NodeType.FUNCTION, NodeType.CLASS)
+BUILTIN_NAMES = frozenset(dir(builtins))
+
+
+class SymbolLinker:
+    """Resolves CALLS and INHERITS targets across modules after parsing.
+
+    The parser names every target `<module>:<name>` of the module it appears
+    in, and calls on an imported module `<module>:<imported path>.<name>`. A
+    plain name that is not defined in the module is looked up among the names
+    the module imports, then among the builtins, which all share one
+    `builtin:<name>` node. A module call is looked up among the definitions
+    of the modules named like the last part of its path (a unique match
+    only). Method calls on any other receiver are never matched against other
+    modules. Anything else is left as it was. The parsed records are not
+    modified.
+    """
+
+    def __init__(self):
+        self.stats = {}
+
+    def _symbol_table(self, nodes, imports):
+        # nodes are (node id, type) pairs, imports (importing module id, imported name, names it binds) triples
+        definitions = set()
+        by_module_and_name = {}
+        modules_by_stem = defaultdict(list)
+        for node_id, node_type in nodes:
+            if node_type == NodeType.MODULE:
+                modules_by_stem[node_id.rsplit(".py", 1)[0]].append(node_id)
+            elif node_type in DEFINITION_TYPES:
+                definitions.add(node_id)
+                module_id, _, name = node_id.partition(":")
+                by_module_and_name[(module_id, name)] = node_id
+
+        # Local name -> definition, per importing module
+        imported_names = defaultdict(dict)
+        for source, target, bound_names in imports:
+            parts = target.split(".")
+            # Keyed by the bound names, `from a import helper as h` binds h and not helper
+            if len(parts) > 1 and bound_names:
+                for module_id in modules_by_stem.get(parts[-2], ()):
+                    node_id = by_module_and_name.get((module_id, parts[-1]))
+                    if node_id:
+                        for bound_name in bound_names:
+                            imported_names[source][bound_name] = node_id
+
+        return definitions, by_module_and_name, modules_by_stem, imported_names
+
+    def _resolve(self, target, tables):
+        definitions, by_module_and_name, modules_by_stem, imported_names = tables
+        if target in definitions:
+            return target, "local"
+        module_id, separator, name = target.partition(":")
+        if not separator:
+            return target, "unresolved"
+        module_path, dot, name = name.rpartition(".")
+        if dot:
+            # `module.func()`: func of a module named like the last part of the imported path
+            stem = module_path.rpartition(".")[2]
+            candidates = [by_module_and_name[(candidate, name)] for candidate in modules_by_stem.get(stem, ())
+                          if (candidate, name) in by_module_and_name]
+            if len(candidates) == 1:
+                return candidates[0], "imported_module"
+            return target, "unresolved"
+        node_id = imported_names.get(module_id, {}).get(name)
+        if node_id:
+            return node_id, "imported"
+        if name in BUILTIN_NAMES:
+            return f"builtin:{name}", "builtin"
+        return target, "unresolved"
+
+    @staticmethod
+    def _edge(edge, target, count, lines):
+        return EdgeRecord(source=edge["source"], target=target, type=edge["type"],
+                          line_number=edge.get("line_number"), count=count, lines=lines)
+
+    def link(self, parsed_data):
+        tables = self._symbol_table(((node["id"], node.get("type")) for node in parsed_data["nodes"]),
+                                    ((edge["source"], edge["target"], edge.get("bound_names")) for edge in parsed_data["edges"] if edge["type"] == "IMPORTS"))
+        self.stats = defaultdict(int)
+        resolved_targets = {}
+        edges = []
+        merged = {}
+        for edge in parsed_data["edges"]:
+            if edge["type"] not in LINKED_EDGE_TYPES:
+                edges.append(edge)
+                continue
+            target = edge["target"]
+            if target not in resolved_targets:
+                resolved_targets[target] = self._resolve(target, tables)
+            new_target, how = resolved_targets[target]
+            self.stats[how] += 1
+
+            key = (edge["source"], new_target, edge["type"])
+            if key in merged:
+                # Several local names resolved to the same definition
+                i = merged[key]
+                edges[i] = self._edge(edges[i], new_target, edges[i].get("count", 1) + edge.get("count", 1),
+                                      edges[i].get("lines", array("I")) + edge.get("lines", array("I")))
+                continue
+            if new_target != target:
+                edge = self._edge(edge, new_target, edge.get("count", 1), edge.get("lines", array("I")))
+            merged[key] = len(edges)
+            edges.append(edge)
+
+        self.stats = dict(self.stats)
+        return {"nodes": parsed_data["nodes"], "edges": edges}
+
+    @staticmethod
+    def _graph_imports(graph):
+        for source, target, data in graph.edges(data=True):
+            entry = edge_of_type(data, "IMPORTS")
+            if entry is not None:
+                yield source, target, entry.get("bound_names")
+
+    def link_graph(self, graph):
+        """Resolve the CALLS and INHERITS edges of an already built graph in place.
+
+        Gives the graph that building from link()ed records gives, for graphs
+        built a batch of files at a time, before every module was known. Edge
+        ends that only existed as unresolved targets are removed once no edge
+        points at them any more.
+        """
+        tables = self._symbol_table(((node_id, data.get("type")) for node_id, data in graph.nodes(data=True)),
+                                    self._graph_imports(graph))
+        self.stats = defaultdict(int)
+        resolved_targets = {}
+        old_targets = set()
+        # Node by node, so only the moved edges of one source are held at a time
+        for source in list(graph):
+            moves = []
+            for target, data in graph.adj[source].items():
+                for entry in edge_entries(data):
+                    if entry.get("type") not in LINKED_EDGE_TYPES:
+                        continue
+                    if target not in resolved_targets:
+                        resolved_targets[target] = self._resolve(target, tables)
+                    new_target, how = resolved_targets[target]
+                    self.stats[how] += 1
+                    if new_target != target:
+                        # Detached from the edge, removing its type below may overwrite the entry in place
+                        moved = entry.copy()
+                        moved.pop("other_types", None)
+                        moves.append((target, new_target, moved))
+            for target, new_target, moved in moves:
+                # Only the moved type leaves the edge, other types between the same ends stay
+                if not graph[source][target].remove_type(moved["type"]):
+                    graph.remove_edge(source, target)
+                old_targets.add(target)
+                existing = graph.get_edge_data(source, new_target)
+                if existing is not None:
+                    # Several local names resolved to the same definition, or another type to the same one
+                    existing.add_occurrences(moved)
+                else:
+                    graph.add_edge(source, new_target)
+                    graph[source][new_target].assign(moved)
+        graph.remove_nodes_from([node_id for node_id in old_targets if not graph.nodes[node_id] and graph.degree(node_id) == 0])
+        self.stats = dict(self.stats)
+        return graph
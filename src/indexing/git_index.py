@@ -0,0 +1,229 @@
+import os
+import pickle
+import subprocess
+import threading
+import time
+
+from src.parser.python_parser import PythonCodeParser
+from src.parser.service_detectors import DEFAULT_SERVICE_REGISTRY
+from src.graph.graph_builder import GraphBuilder
+from src.graph.symbol_linker import SymbolLinker
+from src.instrumentation.profiler import PipelineProfiler
+
+SNAPSHOT_VERSION = 3
+
+
+class GitError(RuntimeError):
+    pass
+
+
+def run_git(repo_path, *args, input=None):
+    result = subprocess.run(["git", "-C", repo_path, *args], input=input, capture_output=True)
+    if result.returncode != 0:
+        raise GitError(f"git {' '.join(args)} failed: {result.stderr.decode('utf-8', errors='replace').strip()}")
+    return result.stdout
+
+
+def resolve_commit(repo_path, revision="HEAD"):
+    return run_git(repo_path, "rev-parse", "--verify", f"{revision}^{{commit}}").decode().strip()
+
+
+def list_files(repo_path, commit):
+    # Every file of the commit, from the object database, whatever is checked out
+    output = run_git(repo_path, "ls-tree", "-r", "-z", "--name-only", commit)
+    return [path.decode("utf-8", errors="surrogateescape") for path in output.split(b"\0") if path]
+
+
+def diff_name_status(repo_path, old_commit, new_commit):
+    """Return (changed paths, deleted paths, counts per status) between two commits.
+
+    Renames and copies count as a change of their new path, and renames also
+    delete their old path.
+    """
+    output = run_git(repo_path, "diff", "--name-status", "-z", "-M", old_commit, new_commit)
+    fields = [field.decode("utf-8", errors="surrogateescape") for field in output.split(b"\0")]
+    changed, deleted = set(), set()
+    counts = {"added": 0, "modified": 0, "renamed": 0, "copied": 0, "deleted": 0}
+    i = 0
+    while i < len(fields) and fields[i]:
+        status = fields[i][0]
+        if status in "RC":
+            old_path, new_path = fields[i + 1], fields[i + 2]
+            changed.add(new_path)
+            if status == "R":
+                deleted.add(old_path)
+                counts["renamed"] += 1
+            else:
+                counts["copied"] += 1
+            i += 3
+            continue
+        path = fields[i + 1]
+        if status == "D":
+            deleted.add(path)
+            counts["deleted"] += 1
+        else:
+            # A, M and T (type change) all mean new content at this path
+            changed.add(path)
+            counts["added" if status == "A" else "modified"] += 1
+        i += 2
+    return changed, deleted, counts
+
+
+def read_blobs(repo_path, commit, paths):
+    """Yield (path, bytes) for paths at commit, streamed from one `git cat-file --batch` process."""
+    paths = list(paths)
+    if not paths:
+        return
+    process = subprocess.Popen(["git", "-C", repo_path, "cat-file", "--batch"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def write_requests():
+        # Written from another thread, git blocks on a full stdout pipe until the blobs are read
+        with process.stdin:
+            for path in paths:
+                process.stdin.write(f"{commit}:{path}\n".encode("utf-8", errors="surrogateescape"))
+
+    writer = threading.Thread(target=write_requests, daemon=True)
+    writer.start()
+    try:
+        for path in paths:
+            header = process.stdout.readline().split()
+            if not header:
+                raise GitError(f"git cat-file stopped before {path}")
+            if header[-1] == b"missing":
+                continue
+            size = int(header[2])
+            data = process.stdout.read(size)
+            # The content is followed by a newline
+            process.stdout.read(1)
+            yield path, data
+    finally:
+        writer.join()
+        process.stdout.close()
+        process.wait()
+
+
+class IndexSnapshot:
+    """The parsed records of every indexed file of a repository at one commit.
+
+    Records are kept per file, before cross-module linking, so an update only
+    replaces the entries of the files that changed. Linking and graph building
+    run over the merged records when the graph is needed.
+    """
+
+    def __init__(self, repo_path, commit, options, files=None, errors=None):
+        self.repo_path = repo_path
+        self.commit = commit
+        self.options = options
+        self.files = files if files is not None else {}
+        self.errors = errors if errors is not None else {}
+
+    def save(self, path):
+        state = {"version": SNAPSHOT_VERSION, "repo_path": self.repo_path, "commit": self.commit,
+                 "options": self.options, "files": self.files, "errors": self.errors}
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # Replaced in one step, an interrupted CI job never leaves half a snapshot behind
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if state.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is a snapshot of version {state.get('version')}, expected {SNAPSHOT_VERSION}")
+        return cls(state["repo_path"], state["commit"], state["options"], state["files"], state["errors"])
+
+    def parsed_data(self):
+        parsed_data = {"nodes": [], "edges": []}
+        for file_data in self.files.values():
+            parsed_data["nodes"].extend(file_data["nodes"])
+            parsed_data["edges"].extend(file_data["edges"])
+        return parsed_data
+
+    def build_graph(self, link=True):
+        parsed_data = self.parsed_data()
+        if link:
+            parsed_data = SymbolLinker().link(parsed_data)
+        return GraphBuilder().build_graph(parsed_data)
+
+    def add_sources(self, source_accessor):
+        # The node offsets are into the files at the snapshot's commit, not into the working tree,
+        # so the accessor is given those blobs under the paths the parser recorded
+        for path, data in read_blobs(self.repo_path, self.commit, sorted(self.files)):
+            source_accessor.add_source(os.path.join(self.repo_path, path), data)
+
+
+class GitIncrementalIndexer:
+    """Indexes a git repository at a commit, re-parsing only what changed since a snapshot.
+
+    File lists, diffs and contents all come from the local object database
+    (`git ls-tree`, `git diff --name-status`, `git cat-file --batch`), so the
+    working tree does not need to be checked out at the commit and no network
+    access is needed.
+    """
+
+    def __init__(self, repo_path, profile="full", enable=(), disable=(), suffixes=(".py",), profiler=None, services=None):
+        self.repo_path = repo_path
+        self.services = services or DEFAULT_SERVICE_REGISTRY
+        # The detectors are part of the options by fingerprint, a snapshot taken with others is re-indexed
+        self.options = {"profile": profile, "enable": sorted(enable), "disable": sorted(disable),
+                        "services": self.services.fingerprint()}
+        self.suffixes = suffixes
+        self.profiler = profiler or PipelineProfiler(trace_memory=False)
+        self.stats = {}
+
+    def _parse_files(self, commit, paths, files, errors):
+        for path, source in read_blobs(self.repo_path, commit, paths):
+            start = time.perf_counter()
+            with self.profiler.stage("parse"):
+                try:
+                    files[path] = PythonCodeParser(os.path.join(self.repo_path, path), source=source, profile=self.options["profile"],
+                                                   enable=self.options["enable"], disable=self.options["disable"],
+                                                   services=self.services).parse()
+                    errors.pop(path, None)
+                except (SyntaxError, ValueError) as e:
+                    files.pop(path, None)
+                    errors[path] = str(e)
+            self.profiler.record_file(path, time.perf_counter() - start)
+
+    def full_index(self, revision="HEAD"):
+        commit = resolve_commit(self.repo_path, revision)
+        with self.profiler.stage("git"):
+            paths = [path for path in list_files(self.repo_path, commit) if path.endswith(self.suffixes)]
+        snapshot = IndexSnapshot(self.repo_path, commit, self.options)
+        self._parse_files(commit, paths, snapshot.files, snapshot.errors)
+        self.stats = {"mode": "full", "commit": commit, "parsed": len(paths), "reused": 0}
+        return snapshot
+
+    def update(self, snapshot, revision="HEAD"):
+        """Return a new snapshot at revision, built from `snapshot` and the diff between the two commits.
+
+        A snapshot taken with other extraction options, or at a commit this
+        clone does not have (a shallow CI checkout), is re-indexed in full.
+        """
+        if snapshot.options != self.options:
+            return self.full_index(revision)
+        commit = resolve_commit(self.repo_path, revision)
+        with self.profiler.stage("git"):
+            try:
+                changed, deleted, counts = diff_name_status(self.repo_path, snapshot.commit, commit)
+            except GitError:
+                return self.full_index(revision)
+        changed = {path for path in changed if path.endswith(self.suffixes)}
+        files = {path: data for path, data in snapshot.files.items() if path not in deleted}
+        errors = {path: error for path, error in snapshot.errors.items() if path not in deleted}
+        self._parse_files(commit, sorted(changed), files, errors)
+        self.stats = dict(counts, mode="incremental", commit=commit, base_commit=snapshot.commit,
+                          parsed=len(changed), reused=len(files) - len(changed & files.keys()))
+        return IndexSnapshot(self.repo_path, commit, self.options, files, errors)
+
+    def index(self, snapshot_path, revision="HEAD"):
+        # Updates the snapshot at snapshot_path in place, or writes a full one if there is none yet
+        if os.path.exists(snapshot_path):
+            snapshot = self.update(IndexSnapshot.load(snapshot_path), revision)
+        else:
+            snapshot = self.full_index(revision)
+        with self.profiler.stage("save"):
+            snapshot.save(snapshot_path)
+        return snapshot
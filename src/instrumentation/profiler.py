@@ -0,0 +1,142 @@
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class PipelineProfiler:
+    """Collects wall time, call counts and peak traced memory per pipeline stage.
+
+    Stages nest (a "parse" stage inside a "scan" stage is fine). Memory is only
+    measured for stages entered on the thread that owns the profiler; other
+    threads, such as LLM dispatcher workers, report timings via add_time.
+    A profiler that outlives its thread, like one kept across Streamlit reruns,
+    is handed to the new thread with claim_thread. With profile_dir set, every
+    stage also runs under cProfile, and dump_profiles writes one file per stage.
+    """
+
+    def __init__(self, trace_memory=True, profile_dir=None):
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.stages = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "peak_memory_bytes": 0})
+        self.counters = defaultdict(int)
+        self.file_times = {}
+        self.lock = threading.Lock()
+        self.owner_thread = threading.get_ident()
+        self._memory_stack = []
+        self._started_tracemalloc = False
+        self._profiles = {}
+        self._profiling = False
+
+    def claim_thread(self):
+        # Every Streamlit rerun runs on a new thread, which measures memory from then on
+        self.owner_thread = threading.get_ident()
+
+    def _record(self, name, seconds, peak_memory=0):
+        with self.lock:
+            stage = self.stages[name]
+            stage["calls"] += 1
+            stage["seconds"] += seconds
+            stage["max_seconds"] = max(stage["max_seconds"], seconds)
+            stage["peak_memory_bytes"] = max(stage["peak_memory_bytes"], peak_memory)
+
+    @contextmanager
+    def stage(self, name):
+        track_memory = self.trace_memory and threading.get_ident() == self.owner_thread
+        if track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            current, peak = tracemalloc.get_traced_memory()
+            # Fold the peak so far into the enclosing stage before resetting it
+            if self._memory_stack:
+                self._memory_stack[-1][1] = max(self._memory_stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            self._memory_stack.append([current, current])
+
+        # Only one cProfile can be active at a time, so nested stages count towards the outer one
+        profile = None
+        if self.profile_dir and not self._profiling and threading.get_ident() == self.owner_thread:
+            profile = self._profiles.setdefault(name, cProfile.Profile())
+            self._profiling = True
+            profile.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if profile:
+                # Stats accumulate over every call of the stage until dump_profiles
+                profile.disable()
+                self._profiling = False
+
+            peak_memory = 0
+            if track_memory:
+                baseline, seen_peak = self._memory_stack.pop()
+                absolute_peak = max(seen_peak, tracemalloc.get_traced_memory()[1])
+                peak_memory = absolute_peak - baseline
+                if self._memory_stack:
+                    self._memory_stack[-1][1] = max(self._memory_stack[-1][1], absolute_peak)
+                elif self._started_tracemalloc:
+                    tracemalloc.stop()
+                    self._started_tracemalloc = False
+            self._record(name, seconds, peak_memory)
+
+    def dump_profiles(self):
+        # One <stage>.prof per profiled stage, returns the paths written
+        if not self._profiles:
+            return []
+        os.makedirs(self.profile_dir, exist_ok=True)
+        paths = []
+        for name, profile in self._profiles.items():
+            path = os.path.join(self.profile_dir, f"{name}.prof")
+            profile.dump_stats(path)
+            paths.append(path)
+        return paths
+
+    def add_time(self, name, seconds):
+        self._record(name, seconds)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def record_file(self, file_path, seconds):
+        with self.lock:
+            self.file_times[file_path] = seconds
+
+    def slowest_files(self, limit=10):
+        return sorted(self.file_times.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def to_dict(self):
+        return {
+            "timestamp": time.time(),
+            "stages": {name: dict(stage) for name, stage in self.stages.items()},
+            "counters": dict(self.counters),
+            "slowest_files": [{"file_path": path, "seconds": seconds} for path, seconds in self.slowest_files()],
+            "files_parsed": len(self.file_times),
+        }
+
+    def to_json(self, path=None):
+        data = json.dumps(self.to_dict(), indent=2)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(data)
+        return data
+
+    def summary_lines(self):
+        lines = [f"{'stage':<12} {'calls':>6} {'total s':>9} {'max s':>8} {'peak MiB':>9}"]
+        for name, stage in self.stages.items():
+            lines.append(f"{name:<12} {stage['calls']:>6} {stage['seconds']:>9.4f} {stage['max_seconds']:>8.4f} "
+                         f"{stage['peak_memory_bytes'] / (1024 * 1024):>9.2f}")
+        for name, value in self.counters.items():
+            lines.append(f"{name}: {value}")
+        slowest = self.slowest_files(5)
+        if slowest:
+            lines.append("Slowest files to parse:")
+            lines.extend(f"  {seconds:.4f}s  {path}" for path, seconds in slowest)
+        return lines
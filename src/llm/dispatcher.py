@@ -0,0 +1,109 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class LLMDispatcher:
+    """Sends many prompts through an LLM client concurrently.
+
+    Concurrency is bounded by a thread pool, request starts by an optional token
+    bucket, and failed requests are retried with exponential backoff. The
+    progress callback always runs on the calling thread.
+    """
+
+    def __init__(self, client, max_concurrency=4, requests_per_second=None, burst=None,
+                 max_retries=3, backoff=1.0, progress_callback=None, cache=None, profiler=None):
+        self.client = client
+        self.cache = cache
+        self.profiler = profiler
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = TokenBucket(requests_per_second, burst) if requests_per_second else None
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.progress_callback = progress_callback
+        self.dispatched = 0
+
+    def _call(self, prompt):
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = self.client.get_chat_response(user_msg=prompt)
+            except Exception:
+                if self.profiler:
+                    self.profiler.add_time("llm", time.perf_counter() - start)
+                    self.profiler.count("llm_failures")
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+                attempt += 1
+                continue
+            if self.profiler:
+                self.profiler.add_time("llm", time.perf_counter() - start)
+            return response
+
+    def run(self, prompts, cache_keys=None):
+        """Dispatch a {key: prompt} mapping, returning ({key: response}, {key: exception}).
+
+        With a cache and a {key: cache key} mapping, cached responses are
+        returned directly and only the misses are sent to the client.
+        """
+        responses = {}
+        errors = {}
+        total = len(prompts)
+        self.dispatched = 0
+        if not total:
+            return responses, errors
+
+        pending = dict(prompts)
+        if self.cache is not None and cache_keys:
+            for key in list(pending):
+                cached = self.cache.get(cache_keys[key]) if key in cache_keys else None
+                if cached is not None:
+                    responses[key] = cached
+                    del pending[key]
+        done = len(responses)
+        if self.profiler:
+            self.profiler.count("llm_cache_hits", done)
+        if done and self.progress_callback:
+            self.progress_callback(done, total)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {executor.submit(self._call, prompt): key for key, prompt in pending.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                done += 1
+                try:
+                    responses[key] = future.result()
+                    if self.cache is not None and cache_keys and key in cache_keys:
+                        self.cache.put(cache_keys[key], responses[key])
+                except Exception as e:
+                    errors[key] = e
+                if self.progress_callback:
+                    self.progress_callback(done, total)
+        self.dispatched = len(pending)
+        return responses, errors
@@ -0,0 +1,25 @@
+import random
+import threading
+import time
+
+
+class FakeLLMClient:
+    """Offline stand-in for HorizonLLMClient with configurable latency and failures."""
+
+    def __init__(self, latency=0.5, jitter=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def get_chat_response(self, user_msg):
+        with self.lock:
+            self.calls += 1
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            fail = self.random.random() < self.failure_rate
+        time.sleep(delay)
+        if fail:
+            raise RuntimeError("Simulated LLM failure")
+        return {"model_answer": f"Fake answer for a {len(user_msg)} character prompt."}
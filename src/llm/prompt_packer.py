@@ -0,0 +1,99 @@
+import re
+
+from src.llm.prompts import BATCH_COMMENT_INSTRUCTIONS, build_batch_comment_prompt, build_comment_prompt
+
+BLOCK_RE = re.compile(r"<<<BEGIN (F\d+)>>>\s*\n(.*?)\n?<<<END \1>>>", re.DOTALL)
+
+
+def estimate_tokens(text):
+    # Rough average for code and English, good enough for budgeting
+    return len(text) // 4 + 1
+
+
+class PromptPacker:
+    def __init__(self, token_budget=6000, max_items=25):
+        self.token_budget = token_budget
+        self.max_items = max_items
+
+    def pack(self, items):
+        """Greedily group {key: (file name, function code)} into batches under the token budget."""
+        batches = []
+        current = []
+        used = estimate_tokens(BATCH_COMMENT_INSTRUCTIONS)
+        base = used
+        for key, (file_name, function_code) in items.items():
+            # The answer repeats the code, so each function costs roughly twice its size
+            cost = 2 * estimate_tokens(function_code) + 50
+            if current and (used + cost > self.token_budget or len(current) == self.max_items):
+                batches.append(current)
+                current = []
+                used = base
+            current.append(key)
+            used += cost
+        if current:
+            batches.append(current)
+        return batches
+
+
+def split_batch_response(text, item_ids):
+    """Return {item id: markdown} for every block that came back complete."""
+    wanted = set(item_ids)
+    return {item_id: body.strip() for item_id, body in BLOCK_RE.findall(text) if item_id in wanted and body.strip()}
+
+
+def run_packed_comments(dispatcher, items, cache_keys=None, packer=None, batch_cache_keys=None):
+    """Generate comments for {key: (file name, function code)} with packed prompts.
+
+    Cached functions are answered directly, the rest are packed into batch
+    requests. Functions missing from a batch answer (failed or truncated) are
+    retried as individual requests. Comments taken from a batch answer come
+    from the batch prompt, so they are cached under batch_cache_keys, and
+    individual answers under cache_keys.
+    """
+    packer = packer or PromptPacker()
+    cache = dispatcher.cache
+    cache_keys = cache_keys or {}
+    batch_cache_keys = batch_cache_keys or {}
+    responses = {}
+    pending = {}
+    for key, item in items.items():
+        cached = None
+        if cache is not None:
+            for keys in (cache_keys, batch_cache_keys):
+                if cached is None and key in keys:
+                    cached = cache.get(keys[key])
+        if cached is not None:
+            responses[key] = cached
+        else:
+            pending[key] = item
+
+    batch_prompts = {}
+    batch_members = {}
+    single_prompts = {}
+    for index, batch in enumerate(packer.pack(pending)):
+        if len(batch) == 1:
+            key = batch[0]
+            single_prompts[key] = build_comment_prompt(pending[key][1], pending[key][0])
+            continue
+        members = {f"F{i}": key for i, key in enumerate(batch, start=1)}
+        batch_members[index] = members
+        batch_prompts[index] = build_batch_comment_prompt(
+            [(item_id, pending[key][0], pending[key][1]) for item_id, key in members.items()])
+
+    batch_responses, _ = dispatcher.run(batch_prompts)
+    dispatched = dispatcher.dispatched
+    for index, members in batch_members.items():
+        answer = batch_responses.get(index, {}).get("model_answer", "")
+        comments = split_batch_response(answer, members)
+        for item_id, key in members.items():
+            if item_id in comments:
+                responses[key] = {"model_answer": comments[item_id]}
+                if cache is not None and key in batch_cache_keys:
+                    cache.put(batch_cache_keys[key], responses[key])
+            else:
+                single_prompts[key] = build_comment_prompt(pending[key][1], pending[key][0])
+
+    single_responses, errors = dispatcher.run(single_prompts, {key: cache_keys[key] for key in single_prompts if key in cache_keys})
+    responses.update(single_responses)
+    dispatcher.dispatched += dispatched
+    return responses, errors
@@ -0,0 +1,55 @@
+# Bump a version whenever its template text changes, cached responses are keyed on it
+OPTIMIZATION_PROMPT_VERSION = 1
+COMMENT_PROMPT_VERSION = 1
+
+
+def build_optimization_prompt(code):
+    return f"Please analyze the following Python code and suggest optimizations such as parallel computing, reducing time or space complexity:\n\n```python\n{code}\n```"
+
+
+def build_comment_prompt(function_code, file_name):
+    return (
+        f"You are a technical documentation assistant. Please analyze the following Python function and generate a comprehensive explanation in **Markdown format**. "
+        "ensure that every new line you have generated must and should be a markdown line"
+        f"This is the Python code:\n\n```python\n{function_code}\n```\n\n"
+        f"that function code is from the {file_name} file"
+        "The explanation should be structured into the following sections for clarity and ease of documentation:\n\n"
+        "## write function name here\n\n"
+        "### Function Code\n"
+        f"```python\n{function_code}\n```\n\n"
+        "### Purpose\n"
+        "- Describe what the function is intended to do.\n\n"
+        "### Parameters\n"
+        "- List and explain each parameter, including type and role.\n\n"
+        "### Return Value\n"
+        "- Describe the return value, including type and meaning.\n\n"
+        "### Internal Logic\n"
+        "- Provide a step-by-step breakdown of how the function works.\n\n"
+        "### Edge Cases & Assumptions\n"
+        "- Mention any assumptions made and edge cases handled or not handled.\n\n"
+        "### Usage Example\n"
+        "- Include a sample usage of the function.\n\n"
+        "### Additional Notes\n"
+        "- Add any relevant insights, performance considerations, or limitations.\n\n"
+        "Ensure the entire response is in Markdown format and suitable for inclusion in technical documentation, but do **not** wrap the entire response in a Markdown code block."
+        "ensure that you write the name of the function before writing purpose of the function"
+    )
+
+
+BATCH_COMMENT_PROMPT_VERSION = 1
+BATCH_COMMENT_INSTRUCTIONS = (
+    "You are a technical documentation assistant. For EACH Python function below, generate a comprehensive explanation in **Markdown format** "
+    "with these sections: a `## <function name>` heading, then ### Function Code, ### Purpose, ### Parameters, ### Return Value, "
+    "### Internal Logic, ### Edge Cases & Assumptions, ### Usage Example and ### Additional Notes. "
+    "Do **not** wrap an explanation in a Markdown code block.\n\n"
+    "Answer every function separately, in this exact format, and keep the ids unchanged:\n\n"
+    "<<<BEGIN F1>>>\n(markdown explanation of function F1)\n<<<END F1>>>\n\n"
+)
+
+
+def build_batch_comment_prompt(functions):
+    """`functions` is a list of (item id, file name, function code) tuples."""
+    parts = [BATCH_COMMENT_INSTRUCTIONS]
+    for item_id, file_name, function_code in functions:
+        parts.append(f"Function {item_id} (from the {file_name} file):\n```python\n{function_code}\n```\n\n")
+    return "".join(parts)
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "graphrag", "llm_responses.sqlite3")
+
+
+def client_model_name(client):
+    return getattr(client, "model", None) or getattr(client, "model_name", None) or type(client).__name__
+
+
+class LLMResponseCache:
+    """Disk-backed LLM response cache with least-recently-used eviction.
+
+    Keys hash the model, the prompt template name and version, and the code the
+    prompt was built from, so a template change or an edited function misses.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        # Running total of the response sizes, kept in the same transactions as the rows so every
+        # process sharing the file sees it, and only summed once for caches created before it existed
+        self.connection.execute("CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL)")
+        self.connection.execute("INSERT OR IGNORE INTO cache_size (id, total) SELECT 0, COALESCE(SUM(size), 0) FROM responses")
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model, template, template_version, *parts):
+        digest = hashlib.sha256()
+        for part in (model, template, str(template_version)) + parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.connection.commit()
+        return json.loads(row[0])
+
+    def put(self, key, response):
+        data = json.dumps(response)
+        with self.lock:
+            row = self.connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()),
+            )
+            self._add_size(len(data) - (row[0] if row else 0))
+            self._evict()
+            self.connection.commit()
+
+    def _add_size(self, delta):
+        self.connection.execute("UPDATE cache_size SET total = total + ? WHERE id = 0", (delta,))
+
+    def _evict(self):
+        total = self.connection.execute("SELECT total FROM cache_size WHERE id = 0").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop the least recently used entries until the cache fits again
+        evicted = 0
+        for key, size in self.connection.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            evicted += size
+            if total - evicted <= self.max_bytes:
+                break
+        self._add_size(-evicted)
+
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+            self.connection.execute("UPDATE cache_size SET total = 0 WHERE id = 0")
+            self.connection.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
@@ -0,0 +1,160 @@
+import io
+import mmap
+import os
+import re
+from collections import defaultdict
+
+TRACEBACK_MARKER = b"Traceback (most recent call last):"
+FRAME_RE = re.compile(rb'^\s*File "(.*?)", line (\d+)(?:, in (.*?))?\s*$')
+
+
+def iter_log_lines(source):
+    """Yield the raw byte lines of a log without loading it as one string.
+
+    `source` is a path (read through mmap), a bytes-like object or a binary
+    file object (read through its buffered line iterator).
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield from iter(mm.readline, b"")
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        # BytesIO shares the buffer of immutable bytes instead of copying it
+        yield from io.BytesIO(source)
+    else:
+        yield from source
+
+
+def _normalize_path(path):
+    return [part for part in path.replace("\\", "/").split("/") if part and part != "."]
+
+
+class SourceFileIndex:
+    """Maps traceback file paths to files of the codebase.
+
+    Every path suffix of every known file is indexed once, so a lookup is a
+    handful of dict probes from the longest suffix down to the basename.
+    """
+
+    def __init__(self, paths=()):
+        self.suffixes = defaultdict(list)
+        for path in paths:
+            self.add(path)
+
+    @classmethod
+    def from_directory(cls, root):
+        index = cls()
+        for dir_path, _, files in os.walk(root):
+            for file in files:
+                index.add(os.path.join(dir_path, file))
+        return index
+
+    def add(self, path):
+        parts = _normalize_path(path)
+        for i in range(len(parts)):
+            self.suffixes["/".join(parts[i:])].append(path)
+
+    def resolve(self, frame_path):
+        parts = _normalize_path(frame_path)
+        for i in range(len(parts)):
+            candidates = self.suffixes.get("/".join(parts[i:]))
+            if candidates:
+                return candidates[0]
+        return None
+
+
+class LogAnalyzer:
+    def __init__(self, file_index: SourceFileIndex = None):
+        self.file_index = file_index
+
+    def _decode(self, raw):
+        return raw.decode("utf-8", errors="replace").rstrip("\r\n")
+
+    def _finish(self, traceback, groups):
+        frames = traceback["frames"]
+        exception = traceback["exception"] or ""
+        exception_type = exception.split(":", 1)[0].strip()
+        signature = (exception_type, tuple((os.path.basename(f["file"]), f["line"], f["function"]) for f in frames))
+        group = groups.get(signature)
+        if group is None:
+            groups[signature] = {
+                "exception_type": exception_type,
+                "exception": exception,
+                "frames": frames,
+                "count": 1,
+                "first_line": traceback["start_line"],
+                "last_line": traceback["start_line"],
+            }
+        else:
+            group["count"] += 1
+            group["last_line"] = traceback["start_line"]
+
+    def analyze(self, source):
+        groups = {}
+        error_lines = 0
+        warning_lines = 0
+        current = None
+
+        for line_number, raw in enumerate(iter_log_lines(source), start=1):
+            if TRACEBACK_MARKER in raw:
+                if current:
+                    self._finish(current, groups)
+                current = {"frames": [], "exception": None, "start_line": line_number}
+                continue
+
+            lowered = raw.lower()
+            if b"error" in lowered:
+                error_lines += 1
+            if b"warning" in lowered:
+                warning_lines += 1
+
+            if current is None:
+                continue
+            match = FRAME_RE.match(raw)
+            if match:
+                file_path, frame_line, function = match.groups()
+                current["frames"].append({
+                    "file": file_path.decode("utf-8", errors="replace"),
+                    "line": int(frame_line),
+                    "function": function.decode("utf-8", errors="replace") if function else None,
+                    "code": None,
+                })
+            elif raw[:1] in (b" ", b"\t"):
+                # Source line (or caret markers) printed under a frame
+                if current["frames"] and current["frames"][-1]["code"] is None:
+                    current["frames"][-1]["code"] = self._decode(raw).strip()
+            elif raw.strip():
+                current["exception"] = self._decode(raw).strip()
+                self._finish(current, groups)
+                current = None
+
+        if current:
+            self._finish(current, groups)
+
+        tracebacks = sorted(groups.values(), key=lambda group: (-group["count"], group["first_line"]))
+        if self.file_index:
+            for group in tracebacks:
+                for frame in group["frames"]:
+                    frame["resolved_path"] = self.file_index.resolve(frame["file"])
+
+        return {
+            "tracebacks": tracebacks,
+            "error_lines": error_lines,
+            "warning_lines": warning_lines,
+        }
+
+    @staticmethod
+    def format_traceback(group):
+        lines = ["Traceback (most recent call last):"]
+        for frame in group["frames"]:
+            location = f'  File "{frame["file"]}", line {frame["line"]}'
+            if frame["function"]:
+                location += f", in {frame['function']}"
+            lines.append(location)
+            if frame["code"]:
+                lines.append(f"    {frame['code']}")
+        if group["exception"]:
+            lines.append(group["exception"])
+        return "\n".join(lines)
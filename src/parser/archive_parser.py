@@ -0,0 +1,21 @@
+import zipfile
+
+IGNORED_SUFFIXES = (".ckpt", ".ipynb_checkpoints", "-checkpoint.py")
+
+
+def iter_zip_members(archive, suffixes=None):
+    """Yield (member name, bytes) for the files of a zip archive, one member at a time.
+
+    `archive` is a path or a binary file object. Directories, checkpoint files
+    and macOS resource forks are skipped.
+    """
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            name = info.filename
+            if info.is_dir() or name.startswith("__MACOSX/") or name.endswith(IGNORED_SUFFIXES):
+                continue
+            if suffixes and not name.endswith(suffixes):
+                continue
+            with zf.open(info) as member:
+                yield name, member.read()
+
@@ -1,21 +1,64 @@
 import ast
+import hashlib
 import os
+import sys
+from array import array
 import yaml
+from src.parser.records import EdgeType, EdgeRecord, NodeRecord, NodeType
+from src.parser.source_accessor import docstring_node, line_start_offsets, node_offsets, utf8_source
+from src.parser.service_detectors import DEFAULT_SERVICE_REGISTRY
+
+EDGE_TYPES = tuple(edge_type.value for edge_type in EdgeType)
+
+# Edge types extracted by each profile. CONTAINS is always kept, it carries the hierarchy.
+EXTRACTION_PROFILES = {
+    "full": frozenset(EDGE_TYPES),
+    "structure": frozenset({"CONTAINS", "CALLS", "IMPORTS", "INHERITS", "HAS_DECORATOR", "USES_SERVICE"}),
+    "calls-only": frozenset({"CONTAINS", "CALLS", "IMPORTS"}),
+}
+
+
+def resolve_edge_types(profile="full", enable=(), disable=()):
+    if profile not in EXTRACTION_PROFILES:
+        raise KeyError(f"Unknown extraction profile '{profile}', expected one of {', '.join(EXTRACTION_PROFILES)}")
+    unknown = (set(enable) | set(disable)) - set(EDGE_TYPES)
+    if unknown:
+        raise KeyError(f"Unknown edge types: {', '.join(sorted(unknown))}")
+    return (EXTRACTION_PROFILES[profile] | set(enable)) - (set(disable) - {"CONTAINS"})
+
 
 class PythonCodeParser:
-    def __init__(self, file_path):
-        self.file_path = file_path
+    def __init__(self, file_path, source=None, profile="full", enable=(), disable=(), inline_docstrings=True, services=None):
+        # source (str or bytes) is parsed instead of reading file_path from disk
+        self.source = source
+        # External services are detected with the detectors of a ServiceRegistry
+        self.services = services or DEFAULT_SERVICE_REGISTRY
+        # Local name -> dotted name it was imported as, to resolve service call chains
+        self._import_aliases = {}
+        # Local name -> path of the IMPORTS edge that bound it, to tell `module.func()` from method calls
+        self._import_bindings = {}
+        # Without inline docstrings nodes only keep the docstring byte offsets, read through a SourceAccessor
+        self.inline_docstrings = inline_docstrings
+        # Edge types that are not extracted are skipped during the AST pass, not filtered afterwards
+        self.edge_types = resolve_edge_types(profile, enable, disable)
         self.nodes = []
         self.edges = []
+        self._node_ids = set()
+        self._edge_index = {}
+        # Every record of the file shares one interned path string
+        self.file_path = sys.intern(file_path)
         self.current_module_id = os.path.basename(file_path)
-        self.nodes.append({
-            "id": self.current_module_id,
-            "type": "module",
-            "name": os.path.basename(file_path).replace(".py", ""),
-            "file_path": file_path,
-            "line_number": 1,
-            "docstring": None
-        })
+        self._node_ids.add(self.current_module_id)
+        self.nodes.append(NodeRecord(
+            id=self.current_module_id,
+            type=NodeType.MODULE,
+            name=os.path.basename(file_path).replace(".py", ""),
+            file_path=self.file_path,
+            line_number=1,
+            end_line_number=None,
+            docstring=None,
+            content_hash=None
+        ))
 
     # def extract_nodes_from_ast(tree):
     #     nodes = []
@@ -42,131 +85,260 @@ class PythonCodeParser:
 
 
 
-    def _add_node(self, node_type, name, line_number, parent_id=None, docstring=None):
+    @staticmethod
+    def _content_hash(node):
+        # ast.dump leaves out positions, so moved but unchanged code keeps its hash
+        return hashlib.blake2b(ast.dump(node).encode("utf-8"), digest_size=8).hexdigest()
+
+    def _definition_node(self, node_type, node, parent_id, line_starts):
+        # Functions and classes keep where their source and docstring are, not the text itself
+        start_offset, end_offset = node_offsets(line_starts, node)
+        docstring_start = docstring_end = docstring = None
+        docstring_value = docstring_node(node)
+        if docstring_value is not None:
+            docstring_start, docstring_end = node_offsets(line_starts, docstring_value)
+            if self.inline_docstrings:
+                docstring = ast.get_docstring(node)
+        return self._add_node(node_type, node.name, node.lineno, parent_id, docstring, node.end_lineno,
+                              self._content_hash(node), (start_offset, end_offset, docstring_start, docstring_end))
+
+    def _add_node(self, node_type, name, line_number, parent_id=None, docstring=None, end_line_number=None, content_hash=None,
+                  offsets=(None, None, None, None)):
         node_id = f"{self.current_module_id}:{name}"
         # Ensure node is unique before adding
-        if not any(n["id"] == node_id for n in self.nodes):
-            self.nodes.append({
-                "id": node_id,
-                "type": node_type,
-                "name": name,
-                "file_path": self.file_path,
-                "line_number": line_number,
-                "docstring": docstring
-            })
+        if node_id not in self._node_ids:
+            self._node_ids.add(node_id)
+            start_offset, end_offset, docstring_start, docstring_end = offsets
+            self.nodes.append(NodeRecord(
+                id=node_id,
+                type=node_type,
+                name=name,
+                file_path=self.file_path,
+                line_number=line_number,
+                end_line_number=end_line_number,
+                docstring=docstring,
+                content_hash=content_hash,
+                start_offset=start_offset,
+                end_offset=end_offset,
+                docstring_start=docstring_start,
+                docstring_end=docstring_end
+            ))
         if parent_id:
-            self._add_edge(parent_id, node_id, "CONTAINS", line_number)
+            self._add_edge(parent_id, node_id, EdgeType.CONTAINS, line_number)
         return node_id
 
-    def _add_edge(self, source_id, target_id, edge_type, line_number=None):
-        # Ensure edge is unique before adding
-        edge_tuple = (source_id, target_id, edge_type)
-        if not any(e["source"] == source_id and e["target"] == target_id and e["type"] == edge_type for e in self.edges):
-            self.edges.append({
-                "source": source_id,
-                "target": target_id,
-                "type": edge_type,
-                "line_number": line_number
-            })
+    def _add_edge(self, source_id, target_id, edge_type, line_number=None, bound_name=None):
+        # Repeated edges are aggregated into one, with a count and every line they occur on
+        edge_key = (source_id, target_id, edge_type)
+        edge = self._edge_index.get(edge_key)
+        if edge is None:
+            edge = EdgeRecord(
+                source=source_id,
+                target=target_id,
+                type=edge_type,
+                line_number=line_number,
+                count=0,
+                lines=array("I")
+            )
+            self._edge_index[edge_key] = edge
+            self.edges.append(edge)
+        edge.count += 1
+        if line_number is not None:
+            edge.lines.append(line_number)
+        if bound_name is not None:
+            bound_names = getattr(edge, "bound_names", None)
+            if bound_names is None:
+                edge.bound_names = [bound_name]
+            elif bound_name not in bound_names:
+                bound_names.append(bound_name)
+
+    def _add_service_node(self, detector):
+        if detector.node_id not in self._node_ids:
+            self._node_ids.add(detector.node_id)
+            self.nodes.append(NodeRecord(
+                id=detector.node_id,
+                type=NodeType.EXTERNAL_SERVICE,
+                name=detector.label,
+                file_path=None,
+                line_number=None,
+                docstring=detector.description
+            ))
+        return detector.node_id
+
+    def _detect_service_import(self, node):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                # `import a.b` binds `a` to itself, only `import a.b as c` needs an alias
+                if alias.asname:
+                    self._import_aliases[alias.asname] = alias.name
+                detector = self.services.match_import(alias.name)
+                if detector is not None:
+                    self._add_service_node(detector)
+        elif node.module and not node.level:
+            for alias in node.names:
+                if alias.name == "*":
+                    continue
+                imported_name = f"{node.module}.{alias.name}"
+                self._import_aliases[alias.asname or alias.name] = imported_name
+                detector = self.services.match_import(imported_name)
+                if detector is not None:
+                    self._add_service_node(detector)
+
+    def _bind_imports(self, node):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    self._import_bindings[alias.asname] = alias.name
+                else:
+                    # `import a.b` binds `a`, a prefix of the imported path
+                    root = alias.name.split(".")[0]
+                    self._import_bindings[root] = root
+        else:
+            module_name = node.module if node.module else ""
+            for alias in node.names:
+                if alias.name != "*":
+                    self._import_bindings[alias.asname or alias.name] = f"{module_name}.{alias.name}"
+
+    def _module_call_name(self, func):
+        # `m.func()` and `m.sub.func()` on an imported name m, as "<imported path>.sub.func"; None for other receivers
+        parts = [func.attr]
+        value = func.value
+        while isinstance(value, ast.Attribute):
+            parts.append(value.attr)
+            value = value.value
+        if not isinstance(value, ast.Name) or value.id not in self._import_bindings:
+            return None
+        parts.append(self._import_bindings[value.id])
+        return ".".join(reversed(parts))
+
+    def _detect_service_call(self, scope_id, call):
+        # The dotted chain of the called name, `a.b.c()` -> ["a", "b", "c"], with its first name resolved through the imports
+        parts = []
+        func = call.func
+        while isinstance(func, ast.Attribute):
+            parts.append(func.attr)
+            func = func.value
+        if not isinstance(func, ast.Name):
+            return
+        parts.append(func.id)
+        parts.reverse()
+        imported_name = self._import_aliases.get(parts[0])
+        if imported_name is not None:
+            parts[0:1] = imported_name.split(".")
+        detector = self.services.match_call(parts)
+        if detector is not None:
+            self._add_edge(scope_id, self._add_service_node(detector), EdgeType.USES_SERVICE, call.lineno)
 
     def parse(self):
-        with open(self.file_path, "r", encoding="utf-8") as f:
-            tree = ast.parse(f.read(), filename=self.file_path)
-        
-        # Add a global node for Snowflake connection if detected
-        snowflake_detected = False
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.Import, ast.ImportFrom)):
-                if (isinstance(node, ast.Import) and any(alias.name == "snowflake.connector" for alias in node.names)) or \
-                   (isinstance(node, ast.ImportFrom) and node.module == "snowflake" and any(alias.name == "connector" for alias in node.names)):
-                    snowflake_detected = True
-                    break
+        source = self.source
+        if source is None:
+            # Read as bytes so the node offsets match the file on disk, line endings included
+            with open(self.file_path, "rb") as f:
+                source = f.read()
+        # ast.parse decodes bytes itself, honouring PEP 263 coding declarations
+        tree = ast.parse(source, filename=self.file_path)
+        # Offsets are into the UTF-8 form of the file, the form SourceAccessor reads it in
+        data = utf8_source(source) if isinstance(source, bytes) else source.encode("utf-8")
+        line_starts = line_start_offsets(data)
+        module = self.nodes[0]
+        module.end_line_number = max(1, data.count(b"\n") + (not data.endswith(b"\n")))
+        module.content_hash = self._content_hash(tree)
+        module.start_offset, module.end_offset = 0, len(data)
         
-        if snowflake_detected:
-            self.nodes.append({
-                "id": "external_service:snowflake_connection",
-                "type": "external_service",
-                "name": "Snowflake Connection",
-                "file_path": None,
-                "line_number": None,
-                "docstring": "Represents a connection to Snowflake database."
-            })
+        edge_types = self.edge_types
+        extract_imports = "IMPORTS" in edge_types
+        extract_calls = "CALLS" in edge_types
+        extract_service = "USES_SERVICE" in edge_types
+        extract_reads = "READS_VAR" in edge_types
+        extract_writes = "WRITES_VAR" in edge_types
+        extract_throws = "THROWS_EXCEPTION" in edge_types
+        extract_handlers = "HANDLES_EXCEPTION" in edge_types
+        walk_bodies = extract_calls or extract_service or extract_reads or extract_writes or extract_throws or extract_handlers
 
         for node in ast.walk(tree):
             current_scope_id = self.current_module_id
 
             if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                node_id = self._add_node("function", node.name, node.lineno, current_scope_id, ast.get_docstring(node))
+                node_id = self._definition_node(NodeType.FUNCTION, node, current_scope_id, line_starts)
                 current_scope_id = node_id
 
                 # Decorators
-                for decorator in node.decorator_list:
+                for decorator in node.decorator_list if "HAS_DECORATOR" in edge_types else ():
                     if isinstance(decorator, ast.Name):
-                        self._add_edge(node_id, f"decorator:{decorator.id}", "HAS_DECORATOR", decorator.lineno)
+                        self._add_edge(node_id, f"decorator:{decorator.id}", EdgeType.HAS_DECORATOR, decorator.lineno)
 
                 # Returns
-                for sub_node in ast.walk(node):
+                for sub_node in ast.walk(node) if "RETURNS_VALUE" in edge_types else ():
                     if isinstance(sub_node, ast.Return):
-                        self._add_edge(node_id, f"return_value_at_line:{sub_node.lineno}", "RETURNS_VALUE", sub_node.lineno)
+                        self._add_edge(node_id, f"return_value_at_line:{sub_node.lineno}", EdgeType.RETURNS_VALUE, sub_node.lineno)
 
             elif isinstance(node, ast.ClassDef):
-                class_id = self._add_node("class", node.name, node.lineno, current_scope_id, ast.get_docstring(node))
+                class_id = self._definition_node(NodeType.CLASS, node, current_scope_id, line_starts)
                 current_scope_id = class_id
 
                 # Decorators
-                for decorator in node.decorator_list:
+                for decorator in node.decorator_list if "HAS_DECORATOR" in edge_types else ():
                     if isinstance(decorator, ast.Name):
-                        self._add_edge(class_id, f"decorator:{decorator.id}", "HAS_DECORATOR", decorator.lineno)
+                        self._add_edge(class_id, f"decorator:{decorator.id}", EdgeType.HAS_DECORATOR, decorator.lineno)
 
-                for base in node.bases:
+                for base in node.bases if "INHERITS" in edge_types else ():
                     if isinstance(base, ast.Name):
-                        self._add_edge(class_id, f"{self.current_module_id}:{base.id}", "INHERITS", node.lineno)
+                        self._add_edge(class_id, f"{self.current_module_id}:{base.id}", EdgeType.INHERITS, node.lineno)
 
-            elif isinstance(node, ast.Import):
+            elif isinstance(node, ast.Import) and extract_imports:
                 for alias in node.names:
-                    self._add_edge(self.current_module_id, alias.name, "IMPORTS", node.lineno)
-            elif isinstance(node, ast.ImportFrom):
+                    self._add_edge(self.current_module_id, alias.name, EdgeType.IMPORTS, node.lineno)
+            elif isinstance(node, ast.ImportFrom) and extract_imports:
                 module_name = node.module if node.module else ""
                 for alias in node.names:
-                    self._add_edge(self.current_module_id, f"{module_name}.{alias.name}", "IMPORTS", node.lineno)
+                    self._add_edge(self.current_module_id, f"{module_name}.{alias.name}", EdgeType.IMPORTS, node.lineno,
+                                   bound_name=alias.asname or alias.name)
 
             # Process nodes within functions/methods/classes for calls, reads, writes, exceptions, and external service usage
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Module)):
+            if walk_bodies and isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Module)):
                 for sub_node in ast.iter_child_nodes(node):
                     if isinstance(sub_node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
                         # Skip nested definitions, handled by outer loop
                         continue
 
+                    # The module body is walked first, in source order, so its imports are known before any call is matched
                     for item in ast.walk(sub_node):
                         if isinstance(item, ast.Call):
+                            if extract_service:
+                                self._detect_service_call(current_scope_id, item)
                             if isinstance(item.func, ast.Name):
-                                self._add_edge(current_scope_id, f"{self.current_module_id}:{item.func.id}", "CALLS", item.lineno)
+                                if extract_calls:
+                                    self._add_edge(current_scope_id, f"{self.current_module_id}:{item.func.id}", EdgeType.CALLS, item.lineno)
                             elif isinstance(item.func, ast.Attribute):
-                                # Handle method calls (e.g., obj.method()) - simplified for now
-                                self._add_edge(current_scope_id, f"{self.current_module_id}:{item.func.attr}", "CALLS", item.lineno)
-                                
-                                # Detect Snowflake connection usage
-                                if isinstance(item.func.value, ast.Name) and item.func.value.id == "snowflake" and item.func.attr == "connector":
-                                    self._add_edge(current_scope_id, "external_service:snowflake_connection", "USES_SERVICE", item.lineno)
-                                elif isinstance(item.func.value, ast.Attribute) and item.func.value.attr == "connector" and item.func.attr == "connect":
-                                    self._add_edge(current_scope_id, "external_service:snowflake_connection", "USES_SERVICE", item.lineno)
+                                # Calls on an imported module keep the module path for the linker, method calls
+                                # (e.g., obj.method()) only keep the method name - simplified for now
+                                if extract_calls:
+                                    name = self._module_call_name(item.func) or item.func.attr
+                                    self._add_edge(current_scope_id, f"{self.current_module_id}:{name}", EdgeType.CALLS, item.lineno)
 
+                        elif isinstance(item, (ast.Import, ast.ImportFrom)) and (extract_service or extract_calls):
+                            if extract_service:
+                                self._detect_service_import(item)
+                            if extract_calls:
+                                self._bind_imports(item)
                         elif isinstance(item, ast.Name):
-                            if isinstance(item.ctx, ast.Load):
+                            if isinstance(item.ctx, ast.Load) and extract_reads:
                                 # Variable read
                                 var_id = f"var:{item.id}"
-                                if not any(n["id"] == var_id for n in self.nodes):
-                                    self.nodes.append({"id": var_id, "type": "variable", "name": item.id, "file_path": self.file_path, "line_number": item.lineno})
-                                self._add_edge(current_scope_id, var_id, "READS_VAR", item.lineno)
-                            elif isinstance(item.ctx, ast.Store):
+                                if var_id not in self._node_ids:
+                                    self._node_ids.add(var_id)
+                                    self.nodes.append(NodeRecord(id=var_id, type=NodeType.VARIABLE, name=item.id, file_path=self.file_path, line_number=item.lineno))
+                                self._add_edge(current_scope_id, var_id, EdgeType.READS_VAR, item.lineno)
+                            elif isinstance(item.ctx, ast.Store) and extract_writes:
                                 # Variable write
                                 var_id = f"var:{item.id}"
-                                if not any(n["id"] == var_id for n in self.nodes):
-                                    self.nodes.append({"id": var_id, "type": "variable", "name": item.id, "file_path": self.file_path, "line_number": item.lineno})
-                                self._add_edge(current_scope_id, var_id, "WRITES_VAR", item.lineno)
-                        elif isinstance(item, ast.Raise):
-                            self._add_edge(current_scope_id, f"exception_at_line:{item.lineno}", "THROWS_EXCEPTION", item.lineno)
-                        elif isinstance(item, ast.Try):
-                            self._add_edge(current_scope_id, f"try_block_at_line:{item.lineno}", "HANDLES_EXCEPTION", item.lineno)
+                                if var_id not in self._node_ids:
+                                    self._node_ids.add(var_id)
+                                    self.nodes.append(NodeRecord(id=var_id, type=NodeType.VARIABLE, name=item.id, file_path=self.file_path, line_number=item.lineno))
+                                self._add_edge(current_scope_id, var_id, EdgeType.WRITES_VAR, item.lineno)
+                        elif isinstance(item, ast.Raise) and extract_throws:
+                            self._add_edge(current_scope_id, f"exception_at_line:{item.lineno}", EdgeType.THROWS_EXCEPTION, item.lineno)
+                        elif isinstance(item, ast.Try) and extract_handlers:
+                            self._add_edge(current_scope_id, f"try_block_at_line:{item.lineno}", EdgeType.HANDLES_EXCEPTION, item.lineno)
 
         return {"nodes": self.nodes, "edges": self.edges}
\ No newline at end of file
@@ -0,0 +1,267 @@
+from array import array
+from collections.abc import MutableMapping
+from enum import Enum
+
+
+class NodeType(str, Enum):
+    MODULE = "module"
+    CLASS = "class"
+    FUNCTION = "function"
+    VARIABLE = "variable"
+    EXTERNAL_SERVICE = "external_service"
+    FILE = "file"
+
+    # Print and format as the plain value, so f-strings, DOT and JSON output stay the same
+    __str__ = str.__str__
+    __format__ = str.__format__
+
+
+class EdgeType(str, Enum):
+    CONTAINS = "CONTAINS"
+    CALLS = "CALLS"
+    IMPORTS = "IMPORTS"
+    INHERITS = "INHERITS"
+    HAS_DECORATOR = "HAS_DECORATOR"
+    RETURNS_VALUE = "RETURNS_VALUE"
+    READS_VAR = "READS_VAR"
+    WRITES_VAR = "WRITES_VAR"
+    THROWS_EXCEPTION = "THROWS_EXCEPTION"
+    HANDLES_EXCEPTION = "HANDLES_EXCEPTION"
+    USES_SERVICE = "USES_SERVICE"
+
+    __str__ = str.__str__
+    __format__ = str.__format__
+
+
+_UNSET = object()
+
+
+class _Record(MutableMapping):
+    """A dict-like record that keeps its known keys in __slots__.
+
+    A slot that was never assigned is a missing key, so records behave like
+    the dicts they replace (`"docstring" in record`, `record.get(...)`).
+    Keys outside `_fields` go to a small overflow dict created on demand.
+    """
+
+    __slots__ = ("_extra",)
+    _fields = frozenset()
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def get(self, key, default=None):
+        if key in self._fields:
+            return getattr(self, key, default)
+        if self._extra is None:
+            return default
+        return self._extra.get(key, default)
+
+    def __setitem__(self, key, value):
+        if key in self._fields:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._fields:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is None:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+
+    def __contains__(self, key):
+        if key in self._fields:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for key in self.__slots__:
+            if hasattr(self, key):
+                yield key
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def assign(self, other, skip=()):
+        # Copies slot by slot from a record of the same kind, any other mapping goes through items()
+        if type(other) is not type(self):
+            for key, value in other.items():
+                if key not in skip:
+                    self[key] = value
+            return
+        for key in self.__slots__:
+            if key not in skip:
+                value = getattr(other, key, _UNSET)
+                if value is not _UNSET:
+                    setattr(self, key, value)
+        if other._extra:
+            for key, value in other._extra.items():
+                if key not in skip:
+                    self[key] = value
+
+    def copy(self):
+        record = type(self)()
+        for key in self.__slots__:
+            if hasattr(self, key):
+                setattr(record, key, getattr(self, key))
+        if self._extra:
+            record._extra = dict(self._extra)
+        return record
+
+    def to_dict(self):
+        # Plain types only, for JSON, YAML or anything else outside the pipeline
+        result = {}
+        for key, value in self.items():
+            if key == "other_types":
+                value = [entry.to_dict() for entry in value.values()]
+            elif isinstance(value, Enum):
+                value = value.value
+            elif isinstance(value, array):
+                value = value.tolist()
+            result[key] = value
+        return result
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def __getstate__(self):
+        state = {key: getattr(self, key) for key in self.__slots__ if hasattr(self, key)}
+        if self._extra:
+            state["_extra"] = self._extra
+        return state
+
+    def __setstate__(self, state):
+        self._extra = None
+        for key, value in state.items():
+            setattr(self, key, value)
+
+
+class NodeRecord(_Record):
+    # start_offset/end_offset and docstring_start/docstring_end are byte offsets into the UTF-8 form of the source file (see utf8_source)
+    __slots__ = ("id", "type", "name", "file_path", "line_number", "end_line_number", "docstring", "content_hash",
+                 "start_offset", "end_offset", "docstring_start", "docstring_end")
+    _fields = frozenset(__slots__)
+
+    def __init__(self, id=_UNSET, type=_UNSET, name=_UNSET, file_path=_UNSET, line_number=_UNSET,
+                 end_line_number=_UNSET, docstring=_UNSET, content_hash=_UNSET, start_offset=_UNSET,
+                 end_offset=_UNSET, docstring_start=_UNSET, docstring_end=_UNSET):
+        self._extra = None
+        if id is not _UNSET:
+            self.id = id
+        if type is not _UNSET:
+            self.type = type
+        if name is not _UNSET:
+            self.name = name
+        if file_path is not _UNSET:
+            self.file_path = file_path
+        if line_number is not _UNSET:
+            self.line_number = line_number
+        if end_line_number is not _UNSET:
+            self.end_line_number = end_line_number
+        if docstring is not _UNSET:
+            self.docstring = docstring
+        if content_hash is not _UNSET:
+            self.content_hash = content_hash
+        if start_offset is not _UNSET:
+            self.start_offset = start_offset
+        if end_offset is not _UNSET:
+            self.end_offset = end_offset
+        if docstring_start is not _UNSET:
+            self.docstring_start = docstring_start
+        if docstring_end is not _UNSET:
+            self.docstring_end = docstring_end
+
+
+class EdgeRecord(_Record):
+    # A graph has one edge per (source, target). The record holds the first edge type, and other_types
+    # maps every further type between the same ends to its own record (type, line_number, count, lines).
+    # bound_names, on IMPORTS edges of `from ... import` only, are the local names the import binds (the asname if any).
+    __slots__ = ("source", "target", "type", "line_number", "count", "lines", "bound_names", "other_types")
+    _fields = frozenset(__slots__)
+
+    def __init__(self, source=_UNSET, target=_UNSET, type=_UNSET, line_number=_UNSET, count=_UNSET, lines=_UNSET):
+        self._extra = None
+        if source is not _UNSET:
+            self.source = source
+        if target is not _UNSET:
+            self.target = target
+        if type is not _UNSET:
+            self.type = type
+        if line_number is not _UNSET:
+            self.line_number = line_number
+        if count is not _UNSET:
+            self.count = count
+        if lines is not _UNSET:
+            self.lines = lines
+
+    def add_occurrences(self, other):
+        """Merge the count and lines of another edge between the same ends into the entry of its type."""
+        entry = edge_of_type(self, other["type"])
+        if entry is None:
+            entry = EdgeRecord(type=other["type"], line_number=other.get("line_number"), count=0, lines=array("I"))
+            other_types = getattr(self, "other_types", None) or {}
+            other_types[other["type"]] = entry
+            self.other_types = other_types
+        entry["count"] = entry.get("count", 1) + other.get("count", 1)
+        entry["lines"] = entry.get("lines", array("I")) + other.get("lines", array("I"))
+        if other.get("bound_names"):
+            entry["bound_names"] = list(dict.fromkeys(entry.get("bound_names", []) + list(other["bound_names"])))
+
+    def remove_type(self, edge_type):
+        # Returns False when edge_type was the only type, the edge itself should be removed then
+        other_types = getattr(self, "other_types", None)
+        if self.get("type") == edge_type:
+            if not other_types:
+                return False
+            promoted = other_types.pop(next(iter(other_types)))
+            for key in ("type", "line_number", "count", "lines", "bound_names"):
+                if key in promoted:
+                    self[key] = promoted[key]
+                else:
+                    self.pop(key, None)
+        elif other_types:
+            other_types.pop(edge_type, None)
+        if other_types is not None and not other_types:
+            del self.other_types
+        return True
+
+    def copy(self):
+        record = super().copy()
+        if getattr(self, "bound_names", None):
+            record.bound_names = list(self.bound_names)
+        if getattr(self, "other_types", None):
+            record.other_types = {edge_type: entry.copy() for edge_type, entry in self.other_types.items()}
+        return record
+
+
+def edge_entries(data):
+    """The per-type entries of a graph edge: the record itself for its first type, then one per further type."""
+    yield data
+    other_types = data.get("other_types")
+    if other_types:
+        yield from other_types.values()
+
+
+def edge_of_type(data, edge_type):
+    # The entry of one type of a graph edge, None when the edge has no such type
+    if data.get("type") == edge_type:
+        return data
+    other_types = data.get("other_types")
+    return other_types.get(edge_type) if other_types else None
+
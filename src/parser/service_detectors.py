@@ -0,0 +1,131 @@
+import hashlib
+import json
+
+import yaml
+
+
+class ServiceDetector:
+    """Declarative description of one external service.
+
+    `imports` are module names; importing one of them, or anything below it,
+    marks the file as using the service. `calls` are dotted call chains such
+    as `boto3.client`, matched after the file's import aliases are resolved,
+    so `import snowflake.connector as sc; sc.connect()` matches
+    `snowflake.connector.connect`. A chain ending in `.*` matches every call
+    below its prefix.
+    """
+
+    def __init__(self, name, label=None, description=None, imports=(), calls=()):
+        # The name is the id suffix of the service node, `external_service:<name>`, lowercase like CLI queries
+        self.name = name.strip().lower()
+        if not self.name:
+            raise ValueError("A service detector needs a name")
+        self.label = label or self.name.replace("_", " ").title()
+        self.description = description or f"Represents a connection to {self.label}."
+        self.imports = tuple(imports)
+        self.calls = tuple(calls)
+
+    @property
+    def node_id(self):
+        return f"external_service:{self.name}"
+
+    def to_dict(self):
+        return {"name": self.name, "label": self.label, "description": self.description,
+                "imports": list(self.imports), "calls": list(self.calls)}
+
+
+DEFAULT_SERVICE_DETECTORS = (
+    ServiceDetector("snowflake_connection", "Snowflake Connection", "Represents a connection to Snowflake database.",
+                    imports=("snowflake.connector",), calls=("snowflake.connector.connect",)),
+    ServiceDetector("aws", "AWS (boto3)", "Represents AWS APIs accessed through boto3.",
+                    imports=("boto3", "botocore"),
+                    calls=("boto3.client", "boto3.resource", "boto3.Session", "boto3.session.Session")),
+    ServiceDetector("postgresql", "PostgreSQL", "Represents a connection to a PostgreSQL database.",
+                    imports=("psycopg2", "psycopg", "asyncpg"),
+                    calls=("psycopg2.connect", "psycopg.connect", "asyncpg.connect", "asyncpg.create_pool")),
+    ServiceDetector("http", "HTTP (requests)", "Represents outgoing HTTP requests made with requests.",
+                    imports=("requests",),
+                    calls=("requests.get", "requests.post", "requests.put", "requests.patch", "requests.delete",
+                           "requests.head", "requests.options", "requests.request", "requests.Session")),
+)
+
+
+class ServiceRegistry:
+    """The registered service detectors, compiled into lookup tables for the parser.
+
+    Imports and calls are matched by dict lookups on their dotted prefixes,
+    so the parser checks every detector at once, during its single AST pass,
+    however many services are registered.
+    """
+
+    def __init__(self, detectors=DEFAULT_SERVICE_DETECTORS):
+        self.detectors = {}
+        for detector in detectors:
+            self.register(detector)
+
+    def register(self, detector):
+        # A detector with the name of a registered one replaces it
+        self.detectors[detector.name] = detector
+        self._compile()
+
+    def _compile(self):
+        self._imports = {}
+        self._calls = {}
+        self._call_prefixes = {}
+        for detector in self.detectors.values():
+            for module in detector.imports:
+                self._imports[module] = detector
+            for chain in detector.calls:
+                if chain.endswith(".*"):
+                    self._call_prefixes[chain[:-2]] = detector
+                else:
+                    self._calls[chain] = detector
+        # First segments of every call pattern, most calls are rejected on this alone
+        self._call_roots = {chain.split(".", 1)[0] for chain in (*self._calls, *self._call_prefixes)}
+
+    @classmethod
+    def from_config(cls, path, include_defaults=True):
+        """Load detectors from a YAML (or JSON) file with a `services` list.
+
+        Each entry has a `name` and optional `label`, `description`, `imports`
+        and `calls`. With include_defaults the built-in detectors stay
+        registered, and entries with their names replace them.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+        entries = config.get("services", []) if isinstance(config, dict) else config
+        registry = cls(DEFAULT_SERVICE_DETECTORS if include_defaults else ())
+        for entry in entries:
+            try:
+                registry.register(ServiceDetector(**entry))
+            except TypeError as e:
+                raise ValueError(f"Invalid service detector in {path}: {entry!r} ({e})") from None
+        return registry
+
+    def fingerprint(self):
+        # Snapshots taken with other detectors are re-indexed, like other extraction options
+        state = json.dumps([detector.to_dict() for detector in self.detectors.values()], sort_keys=True)
+        return hashlib.blake2b(state.encode("utf-8"), digest_size=8).hexdigest()
+
+    def match_import(self, module):
+        # The module itself or any package above it, `boto3.session` matches `boto3`
+        while module:
+            detector = self._imports.get(module)
+            if detector is not None:
+                return detector
+            module = module.rpartition(".")[0]
+        return None
+
+    def match_call(self, parts):
+        """Return the detector of a resolved call chain, given as a list of names, or None."""
+        if parts[0] not in self._call_roots:
+            return None
+        chain = ".".join(parts)
+        detector = self._calls.get(chain)
+        while detector is None and chain:
+            chain = chain.rpartition(".")[0]
+            detector = self._call_prefixes.get(chain)
+        return detector
+
+
+DEFAULT_SERVICE_REGISTRY = ServiceRegistry()
@@ -0,0 +1,156 @@
+import ast
+import codecs
+import inspect
+import mmap
+import os
+import tokenize
+from array import array
+from collections import OrderedDict
+from itertools import accumulate
+
+
+def _line_reader(data):
+    # readline over bytes, an mmap or a memoryview, without copying more than the lines read
+    position = 0
+
+    def readline():
+        nonlocal position
+        start = position
+        while True:
+            chunk = bytes(data[position:position + 4096])
+            newline = chunk.find(b"\n")
+            if newline >= 0:
+                position += newline + 1
+                return bytes(data[start:position])
+            if not chunk:
+                return bytes(data[start:position])
+            position += len(chunk)
+
+    return readline
+
+
+def source_encoding(data):
+    """The encoding Python reads `data` (bytes) with, from its BOM or PEP 263 coding declaration."""
+    return tokenize.detect_encoding(_line_reader(data))[0]
+
+
+def utf8_source(data):
+    """`data` (bytes) as UTF-8: unchanged when it already is, with or without a BOM, re-encoded otherwise.
+
+    Node offsets are into this form of a file, since ast columns count UTF-8 bytes.
+    """
+    encoding = source_encoding(data)
+    if encoding in ("utf-8", "utf-8-sig"):
+        return data
+    return bytes(data).decode(encoding).encode("utf-8")
+
+
+def line_start_offsets(data):
+    """Byte offset of the start of every line of `data`, the UTF-8 form of a file (see utf8_source)."""
+    # ast columns do not count a BOM, it is part of the first line's start instead
+    bom = len(codecs.BOM_UTF8) if data[:len(codecs.BOM_UTF8)] == codecs.BOM_UTF8 else 0
+    return array("Q", accumulate((len(line) for line in data[bom:].splitlines(keepends=True)), initial=bom))
+
+
+def node_offsets(line_starts, node):
+    # ast column offsets count UTF-8 bytes, so line start + column is a byte offset into the UTF-8 form of the file
+    start = line_starts[node.lineno - 1] + node.col_offset
+    end = line_starts[node.end_lineno - 1] + node.end_col_offset
+    return start, end
+
+
+def docstring_node(node):
+    if not isinstance(node, (ast.AsyncFunctionDef, ast.FunctionDef, ast.ClassDef, ast.Module)) or not node.body:
+        return None
+    first = node.body[0]
+    if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) and isinstance(first.value.value, str):
+        return first.value
+    return None
+
+
+class SourceAccessor:
+    """Reads node source code and docstrings on demand, from the byte offsets in the graph.
+
+    Files on disk are memory-mapped the first time they are read, in-memory
+    sources (uploads, zip members) are registered with `add_source`. The most
+    recently read segments are kept in an LRU, so repeated context lookups do
+    not decode the same text again.
+    """
+
+    def __init__(self, cache_size=256):
+        self.cache_size = cache_size
+        self._sources = {}
+        self._mapped_files = {}
+        self._segments = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def add_source(self, file_path, data):
+        # bytes, or a memoryview over an upload buffer, which is sliced without copying the whole file
+        self._sources[file_path] = utf8_source(data)
+
+    def __contains__(self, file_path):
+        return file_path in self._sources or os.path.isfile(file_path)
+
+    def _buffer(self, file_path):
+        data = self._sources.get(file_path)
+        if data is not None:
+            return data
+        with open(file_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                data = b""
+            else:
+                # The mapping stays valid after the file object is closed
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                converted = utf8_source(data)
+                if converted is data:
+                    self._mapped_files[file_path] = data
+                else:
+                    # Files in another encoding are kept re-encoded, the offsets are into their UTF-8 form
+                    data.close()
+                    data = converted
+        self._sources[file_path] = data
+        return data
+
+    def segment(self, file_path, start, end, errors="strict"):
+        key = (file_path, start, end)
+        text = self._segments.get(key)
+        if text is not None:
+            self.hits += 1
+            self._segments.move_to_end(key)
+            return text
+        self.misses += 1
+        text = bytes(self._buffer(file_path)[start:end]).decode("utf-8", errors=errors)
+        self._segments[key] = text
+        if len(self._segments) > self.cache_size:
+            self._segments.popitem(last=False)
+        return text
+
+    def text(self, file_path, errors="strict"):
+        # Whole files are decoded for the caller only, they would push every function out of the LRU
+        return bytes(self._buffer(file_path)).decode("utf-8-sig", errors=errors)
+
+    def files(self):
+        return list(self._sources)
+
+    def node_source(self, node):
+        # None when the file is gone, e.g. a zip member when the graph was loaded from shards
+        if node.get("start_offset") is None or not node.get("file_path") or node["file_path"] not in self:
+            return None
+        return self.segment(node["file_path"], node["start_offset"], node["end_offset"])
+
+    def node_docstring(self, node):
+        docstring = node.get("docstring")
+        if docstring is not None or node.get("docstring_start") is None or not node.get("file_path") or node["file_path"] not in self:
+            return docstring
+        literal = self.segment(node["file_path"], node["docstring_start"], node["docstring_end"])
+        # The tokenizer turns raw line endings inside a literal into "\n", and ast.get_docstring cleans with cleandoc
+        literal = literal.replace("\r\n", "\n").replace("\r", "\n")
+        return inspect.cleandoc(ast.literal_eval(literal))
+
+    def close(self):
+        for data in self._mapped_files.values():
+            data.close()
+        self._mapped_files.clear()
+        self._sources.clear()
+        self._segments.clear()
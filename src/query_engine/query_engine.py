@@ -1,81 +1,563 @@
+import base64
+import bisect
+import itertools
+import json
+from collections import defaultdict
+
 import networkx as nx
 
-class QueryEngine:
-    def __init__(self, graph: nx.DiGraph):
-        self.graph = graph
+from src.log_analyzer.log_analyzer import SourceFileIndex
+from src.parser.records import edge_entries, edge_of_type
 
-    def find_functions_in_file(self, file_name):
-        functions = []
-        for node_id, data in self.graph.nodes(data=True):
-            if data.get("type") == "function" and file_name in node_id:
-                functions.append(data)
-        return functions
+SCOPE_NODE_TYPES = ("module", "class", "function")
+
+# Queries that can be paged with QueryEngine.query_page: name -> (edge type, target id template).
+# Without a template every edge of the type is a result, with one only the edges into that target.
+EDGE_QUERIES = {
+    "readers": ("READS_VAR", "var:{}"),
+    "writers": ("WRITES_VAR", "var:{}"),
+    "throwers": ("THROWS_EXCEPTION", None),
+    "handlers": ("HANDLES_EXCEPTION", None),
+    "decorated": ("HAS_DECORATOR", "decorator:{}"),
+    "returners": ("RETURNS_VALUE", None),
+    "users": ("USES_SERVICE", "external_service:{}"),
+}
+PAGED_QUERIES = ("functions_in", *EDGE_QUERIES)
+
+
+class QueryPage:
+    """One page of a paged query.
+
+    `next_cursor` is None on the last page, otherwise it is passed back to
+    query_page to continue right after this page. `total` is only set when
+    it was asked for.
+    """
+
+    def __init__(self, items, next_cursor=None, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.total = total
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(query, argument, position):
+    # Opaque to callers, it names its query so it is not used to continue another one
+    return base64.urlsafe_b64encode(json.dumps([query, argument, position]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(query, argument, cursor):
+    try:
+        cursor_query, cursor_argument, position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor {cursor!r}") from None
+    if (cursor_query, cursor_argument) != (query, argument):
+        raise ValueError(f"The cursor belongs to the query '{cursor_query}', not '{query}'")
+    return position
+
+
+def _page(query, argument, positioned, limit, offset):
+    # positioned yields (position, node); the result after the page is read only to know where the next page starts
+    items = []
+    for position, node in itertools.islice(positioned, offset, None):
+        if len(items) == limit:
+            return QueryPage(items, encode_cursor(query, argument, position))
+        items.append(node)
+    return QueryPage(items)
+
+
+def call_name_matches(node_id, name):
+    # `mod.py:get` and `mod.py:requests.get` are calls of get, `mod.py:get_user` is not
+    local_name = node_id.partition(":")[2] or node_id
+    return name in (local_name, local_name.rpartition(".")[2])
+
+
+class _LineIndex:
+    """Line-range index of the module/class/function nodes of one file.
+
+    Definitions nest properly, so the file splits into segments that each have a
+    single innermost owner; a point lookup is one bisect over segment starts.
+    """
+
+    def __init__(self, intervals):
+        self.starts = []
+        self.owners = []
+        self.spans = {}
+        self.parents = {}
+        stack = []
+        # Outer definitions first when two start on the same line
+        for start, end, node_id in sorted(intervals, key=lambda item: (item[0], -item[1])):
+            while stack and stack[-1][1] < start:
+                self._close(stack)
+            self.parents[node_id] = stack[-1][2] if stack else None
+            self.spans[node_id] = (start, end)
+            stack.append((start, end, node_id))
+            self._mark(start, node_id)
+        while stack:
+            self._close(stack)
+
+    def _mark(self, line, owner):
+        if self.starts and self.starts[-1] == line:
+            self.owners[-1] = owner
+        else:
+            self.starts.append(line)
+            self.owners.append(owner)
+
+    def _close(self, stack):
+        _, end, _ = stack.pop()
+        self._mark(end + 1, stack[-1][2] if stack else None)
+
+    def innermost(self, line):
+        i = bisect.bisect_right(self.starts, line) - 1
+        return self.owners[i] if i >= 0 else None
+
+    def innermost_for_range(self, start, end):
+        node_id = self.innermost(start)
+        while node_id is not None and self.spans[node_id][1] < end:
+            node_id = self.parents[node_id]
+        return node_id
+
+
+class _QueryEngineBase:
+    """What QueryEngine and ShardedQueryEngine share on top of their own lookups.
+
+    Subclasses set `source_accessor` and provide _find_node and _calls, which
+    yields (source, target, CALLS entry, node at the other end) for the calls
+    into (`incoming`) or out of the named function.
+    """
 
     def find_callers_of_function(self, function_name):
-        callers = []
-        for source, target, data in self.graph.edges(data=True):
-            if data.get("type") == "CALLS" and function_name in target:
-                callers.append(self.graph.nodes[source])
-        return callers
+        return [node for _, _, _, node in self._calls(function_name, incoming=True)]
 
     def find_functions_called_by(self, function_name):
-        called_functions = []
-        for source, target, data in self.graph.edges(data=True):
-            if data.get("type") == "CALLS" and function_name in source:
-                called_functions.append(self.graph.nodes[target])
-        return called_functions
+        return [node for _, _, _, node in self._calls(function_name, incoming=False)]
+
+    def _with_frequency(self, function_name, incoming):
+        results = []
+        for source, target, data, node in self._calls(function_name, incoming):
+            results.append({"id": source if incoming else target, "node": node, "count": data.get("count", 1), "lines": list(data.get("lines", ()))})
+        results.sort(key=lambda result: -result["count"])
+        return results
+
+    def find_callers_with_frequency(self, function_name):
+        # Like find_callers_of_function, with how often and where each caller makes the call
+        return self._with_frequency(function_name, incoming=True)
+
+    def find_functions_called_by_with_frequency(self, function_name):
+        return self._with_frequency(function_name, incoming=False)
+
+    def _with_docstring(self, node):
+        # Nodes parsed without inline docstrings only keep the offsets, the details show the text
+        if node is None or node.get("docstring") is not None or node.get("docstring_start") is None or self.source_accessor is None:
+            return node
+        details = node.copy()
+        details["docstring"] = self.source_accessor.node_docstring(node)
+        return details
 
     def get_node_details(self, node_name):
+        return self._with_docstring(self._find_node(node_name))
+
+    def get_node_source(self, node_name):
+        node = self.get_node_details(node_name)
+        if node is None or self.source_accessor is None:
+            return node, None
+        return node, self.source_accessor.node_source(node)
+
+    def get_docstring(self, node):
+        if self.source_accessor is None:
+            return node.get("docstring")
+        return self.source_accessor.node_docstring(node)
+
+
+class QueryEngine(_QueryEngineBase):
+    def __init__(self, graph: nx.DiGraph, source_accessor=None):
+        self.graph = graph
+        # Reads node source and docstrings from their byte offsets, see SourceAccessor
+        self.source_accessor = source_accessor
+        self._line_indexes = None
+        self._file_index = None
+        self._nodes_by_type = None
+        self._nodes_by_name = None
+        self._edges_by_type = None
+
+    def _build_line_indexes(self):
+        intervals = defaultdict(list)
+        for node_id, data in self.graph.nodes(data=True):
+            if data.get("type") in SCOPE_NODE_TYPES and data.get("file_path") and data.get("end_line_number"):
+                intervals[data["file_path"]].append((data["line_number"], data["end_line_number"], node_id))
+        self._line_indexes = {file_path: _LineIndex(items) for file_path, items in intervals.items()}
+        self._file_index = SourceFileIndex(self._line_indexes)
+
+    def _build_type_indexes(self):
+        # One pass over the graph, after which every typed query only visits its own nodes or edges
+        self._nodes_by_type = defaultdict(list)
+        self._nodes_by_name = defaultdict(list)
+        for node_id, data in self.graph.nodes(data=True):
+            node_type = data.get("type")
+            self._nodes_by_type[node_type].append((node_id, data))
+            if node_type in SCOPE_NODE_TYPES:
+                self._nodes_by_name[data.get("name")].append(node_id)
+        self._edges_by_type = defaultdict(list)
+        for source, target, data in self.graph.edges(data=True):
+            # An edge with several types is indexed under each, with the entry of that type
+            for entry in edge_entries(data):
+                self._edges_by_type[entry.get("type")].append((source, target, entry))
+
+    def _nodes_of_type(self, node_type):
+        if self._nodes_by_type is None:
+            self._build_type_indexes()
+        return self._nodes_by_type.get(node_type, ())
+
+    def _edges_of_type(self, edge_type):
+        if self._edges_by_type is None:
+            self._build_type_indexes()
+        return self._edges_by_type.get(edge_type, ())
+
+    def build_indexes(self):
+        self._build_line_indexes()
+        self._build_type_indexes()
+
+    def _line_index_for(self, file_path):
+        if self._line_indexes is None:
+            self._build_line_indexes()
+        index = self._line_indexes.get(file_path)
+        if index is None:
+            # Paths from logs or diffs rarely match the parsed path exactly
+            resolved = self._file_index.resolve(file_path)
+            index = self._line_indexes.get(resolved) if resolved else None
+        return index
+
+    def find_enclosing_node(self, file_path, line_number):
+        index = self._line_index_for(file_path)
+        node_id = index.innermost(line_number) if index else None
+        return self.graph.nodes[node_id] if node_id is not None else None
+
+    def find_enclosing_node_for_range(self, file_path, start_line, end_line):
+        index = self._line_index_for(file_path)
+        node_id = index.innermost_for_range(start_line, end_line) if index else None
+        return self.graph.nodes[node_id] if node_id is not None else None
+
+    def find_enclosing_nodes(self, locations):
+        # Resolve each distinct file once, then bisect every line of that file
+        results = [None] * len(locations)
+        by_file = defaultdict(list)
+        for i, (file_path, line_number) in enumerate(locations):
+            by_file[file_path].append((line_number, i))
+        for file_path, lines in by_file.items():
+            index = self._line_index_for(file_path)
+            if index is None:
+                continue
+            for line_number, i in lines:
+                node_id = index.innermost(line_number)
+                if node_id is not None:
+                    results[i] = self.graph.nodes[node_id]
+        return results
+
+    def find_functions_in_file(self, file_name):
+        return [node for _, node in self.iter_query("functions_in", file_name)]
+
+    def find_node_ids_by_name(self, name):
+        # Exact name match over modules, classes and functions
+        if self._nodes_by_name is None:
+            self._build_type_indexes()
+        return list(self._nodes_by_name.get(name, ()))
+
+    def _call_edges(self, function_name, incoming):
+        # Exact lookups on the adjacency of the named definitions; names that are not
+        # defined anywhere (unresolved or builtin targets) fall back to a scan for that exact name
+        node_ids = self.find_node_ids_by_name(function_name)
+        if node_ids:
+            for node_id in node_ids:
+                edges = self.graph.in_edges(node_id, data=True) if incoming else self.graph.out_edges(node_id, data=True)
+                for source, target, data in edges:
+                    entry = edge_of_type(data, "CALLS")
+                    if entry is not None:
+                        yield source, target, entry
+            return
+        for source, target, data in self._edges_of_type("CALLS"):
+            if call_name_matches(target if incoming else source, function_name):
+                yield source, target, data
+
+    def _calls(self, function_name, incoming):
+        for source, target, data in self._call_edges(function_name, incoming):
+            yield source, target, data, self.graph.nodes[source if incoming else target]
+
+    def call_frequency(self, caller_id, callee_id):
+        data = self.graph.get_edge_data(caller_id, callee_id)
+        entry = edge_of_type(data, "CALLS") if data is not None else None
+        return entry.get("count", 1) if entry is not None else 0
+
+    def _find_node(self, node_name):
+        node_ids = self.find_node_ids_by_name(node_name)
+        if node_ids:
+            return self.graph.nodes[node_ids[0]]
         for node_id, data in self.graph.nodes(data=True):
             if node_name in node_id:
                 return data
         return None
 
     def find_nodes_reading_var(self, var_name):
-        readers = []
-        for source, target, data in self.graph.edges(data=True):
-            if data.get("type") == "READS_VAR" and f"var:{var_name}" == target:
-                readers.append(self.graph.nodes[source])
-        return readers
+        return [node for _, node in self.iter_query("readers", var_name)]
 
     def find_nodes_writing_var(self, var_name):
-        writers = []
-        for source, target, data in self.graph.edges(data=True):
-            if data.get("type") == "WRITES_VAR" and f"var:{var_name}" == target:
-                writers.append(self.graph.nodes[source])
-        return writers
+        return [node for _, node in self.iter_query("writers", var_name)]
 
     def find_nodes_throwing_exception(self):
-        throwers = []
-        for source, target, data in self.graph.edges(data=True):
-            if data.get("type") == "THROWS_EXCEPTION":
-                throwers.append(self.graph.nodes[source])
-        return throwers
+        return [node for _, node in self.iter_query("throwers")]
 
     def find_nodes_handling_exception(self):
-        handlers = []
-        for source, target, data in self.graph.edges(data=True):
-            if data.get("type") == "HANDLES_EXCEPTION":
-                handlers.append(self.graph.nodes[source])
-        return handlers
+        return [node for _, node in self.iter_query("handlers")]
 
     def find_nodes_with_decorator(self, decorator_name):
-        decorated_nodes = []
-        for source, target, data in self.graph.edges(data=True):
-            if data.get("type") == "HAS_DECORATOR" and f"decorator:{decorator_name}" == target:
-                decorated_nodes.append(self.graph.nodes[source])
-        return decorated_nodes
+        return [node for _, node in self.iter_query("decorated", decorator_name)]
 
     def find_nodes_returning_value(self):
-        returners = []
-        for source, target, data in self.graph.edges(data=True):
-            if data.get("type") == "RETURNS_VALUE":
-                returners.append(self.graph.nodes[source])
-        return returners
+        return [node for _, node in self.iter_query("returners")]
 
     def find_nodes_using_service(self, service_name):
-        users = []
-        for source, target, data in self.graph.edges(data=True):
-            if data.get("type") == "USES_SERVICE" and f"external_service:{service_name}" == target:
-                users.append(self.graph.nodes[source])
-        return users
+        return [node for _, node in self.iter_query("users", service_name)]
+
+    # --- paged queries ---
+
+    def _query_items(self, query, argument):
+        # The sequence a paged query walks and the result of one item (None if it is not one), positions in it are the cursors
+        if query == "functions_in":
+            # By node id or full path, ids only name the file's basename
+            return self._nodes_of_type("function"), lambda item: item[1] if argument in item[0] or argument in item[1].get("file_path", "") else None
+        if query not in EDGE_QUERIES:
+            raise KeyError(f"Unknown paged query '{query}', expected one of {', '.join(PAGED_QUERIES)}")
+        edge_type, target_template = EDGE_QUERIES[query]
+        nodes = self.graph.nodes
+        if target_template is None:
+            return self._edges_of_type(edge_type), lambda item: nodes[item[0]]
+        # Only the edges into the target are visited, not every edge of the type
+        target = target_template.format(argument)
+        edges = list(self.graph.in_edges(target, data=True)) if target in self.graph else []
+        return edges, lambda item: nodes[item[0]] if edge_of_type(item[2], edge_type) is not None else None
+
+    def iter_query(self, query, argument=None, start=0):
+        """Yield (position, node) for the results of a paged query, lazily, from position `start` on.
+
+        `query` is "functions_in" (argument: file name) or a key of
+        EDGE_QUERIES, the argument of the keyed ones being the variable,
+        decorator or service name.
+        """
+        items, result = self._query_items(query, argument)
+        for position in range(start, len(items)):
+            node = result(items[position])
+            if node is not None:
+                yield position, node
+
+    def count_query(self, query, argument=None):
+        # Edge queries are counted from the type index or the target's in-edges, without looking up a single node
+        if query in EDGE_QUERIES:
+            edge_type, target_template = EDGE_QUERIES[query]
+            if target_template is None:
+                return len(self._edges_of_type(edge_type))
+            target = target_template.format(argument)
+            if target not in self.graph:
+                return 0
+            return sum(1 for data in self.graph.pred[target].values() if edge_of_type(data, edge_type) is not None)
+        return sum(1 for _ in self.iter_query(query, argument))
+
+    def query_page(self, query, argument=None, limit=50, offset=0, cursor=None, with_total=False):
+        """Return one QueryPage of at most `limit` results.
+
+        The page starts `offset` results after the cursor, or after the first
+        result without one. A cursor resumes where the previous page stopped,
+        without visiting the results before it again.
+        """
+        start = decode_cursor(query, argument, cursor) if cursor is not None else 0
+        page = _page(query, argument, self.iter_query(query, argument, start), limit, offset)
+        if with_total:
+            page.total = self.count_query(query, argument)
+        return page
+
+    def find_services(self):
+        # Every detected external service, with how many nodes use it
+        services = []
+        for node_id, data in self._nodes_of_type("external_service"):
+            users = sum(1 for _, _, edge in self.graph.in_edges(node_id, data=True) if edge_of_type(edge, "USES_SERVICE") is not None)
+            services.append({"id": node_id, "name": node_id.partition(":")[2], "node": data, "users": users})
+        services.sort(key=lambda service: (-service["users"], service["name"]))
+        return services
+
+
+class ShardedQueryEngine(_QueryEngineBase):
+    """The QueryEngine queries over a ShardedGraph, loading only the shards a query needs.
+
+    Lookups by name, file or node id go through the symbol-to-shard map and
+    edges between shards come from the global cross-shard index. Queries
+    without a name (throwers, handlers, ...) visit the shards one at a time,
+    so they stay under the memory cap as well.
+    """
+
+    def __init__(self, sharded_graph, source_accessor=None):
+        self.sharded_graph = sharded_graph
+        self.source_accessor = source_accessor
+        self._engines = {}
+
+    def _engine(self, shard_name):
+        graph = self.sharded_graph.shard(shard_name)
+        engine = self._engines.get(shard_name)
+        if engine is None or engine.graph is not graph:
+            engine = QueryEngine(graph, self.source_accessor)
+            self._engines[shard_name] = engine
+        # The engine of an evicted shard would keep its graph alive
+        for name in [name for name in self._engines if not self.sharded_graph.is_loaded(name)]:
+            del self._engines[name]
+        return engine
+
+    def _each_engine(self, shard_names=None):
+        for shard_name in self.sharded_graph.shards if shard_names is None else shard_names:
+            yield self._engine(shard_name)
+
+    def _collect(self, method, *args):
+        results = []
+        for engine in self._each_engine():
+            results.extend(getattr(engine, method)(*args))
+        return results
+
+    def build_indexes(self):
+        # Each shard builds its indexes when it is loaded, the global index is read up front
+        pass
+
+    def find_node_ids_by_name(self, name):
+        return list(self.sharded_graph.names.get(name, ()))
+
+    def find_enclosing_node(self, file_path, line_number):
+        shard_name = self.sharded_graph.shard_for_file(file_path)
+        return self._engine(shard_name).find_enclosing_node(file_path, line_number) if shard_name else None
+
+    def find_enclosing_node_for_range(self, file_path, start_line, end_line):
+        shard_name = self.sharded_graph.shard_for_file(file_path)
+        return self._engine(shard_name).find_enclosing_node_for_range(file_path, start_line, end_line) if shard_name else None
+
+    def find_enclosing_nodes(self, locations):
+        results = [None] * len(locations)
+        by_shard = defaultdict(list)
+        for i, (file_path, line_number) in enumerate(locations):
+            shard_name = self.sharded_graph.shard_for_file(file_path)
+            if shard_name is not None:
+                by_shard[shard_name].append(i)
+        for shard_name, positions in by_shard.items():
+            shard_results = self._engine(shard_name).find_enclosing_nodes([locations[i] for i in positions])
+            for i, node in zip(positions, shard_results):
+                results[i] = node
+        return results
+
+    def find_functions_in_file(self, file_name):
+        # Only the shards that own a node of the file are loaded
+        return [node for _, node in self.iter_query("functions_in", file_name)]
+
+    def _calls(self, function_name, incoming):
+        # From the defining shards and the cross-shard index
+        sharded = self.sharded_graph
+        node_ids = self.find_node_ids_by_name(function_name)
+        if node_ids:
+            for shard_name in dict.fromkeys(sharded.shard_of(node_id) for node_id in node_ids):
+                engine = self._engine(shard_name)
+                for source, target, data in engine._call_edges(function_name, incoming):
+                    yield source, target, data, engine.graph.nodes[source if incoming else target]
+            for node_id in node_ids:
+                for source, target, data in sharded.cross_edges_to(node_id) if incoming else sharded.cross_edges_from(node_id):
+                    entry = edge_of_type(data, "CALLS")
+                    if entry is not None:
+                        yield source, target, entry, sharded.node(source if incoming else target)
+            return
+        for engine in self._each_engine():
+            for source, target, data in engine._call_edges(function_name, incoming):
+                yield source, target, data, engine.graph.nodes[source if incoming else target]
+        for source, target, data in sharded.cross_edges:
+            entry = edge_of_type(data, "CALLS")
+            if entry is not None and call_name_matches(target if incoming else source, function_name):
+                yield source, target, entry, sharded.node(source if incoming else target)
+
+    def call_frequency(self, caller_id, callee_id):
+        sharded = self.sharded_graph
+        caller_shard, callee_shard = sharded.shard_of(caller_id), sharded.shard_of(callee_id)
+        if caller_shard is not None and callee_shard is not None and caller_shard != callee_shard:
+            for _, target, data in sharded.cross_edges_from(caller_id):
+                entry = edge_of_type(data, "CALLS") if target == callee_id else None
+                if entry is not None:
+                    return entry.get("count", 1)
+            return 0
+        shard_name = caller_shard or callee_shard
+        return self._engine(shard_name).call_frequency(caller_id, callee_id) if shard_name else 0
+
+    def _find_node(self, node_name):
+        sharded = self.sharded_graph
+        node_ids = self.find_node_ids_by_name(node_name)
+        if node_ids:
+            return sharded.node(node_ids[0])
+        for node_id in sharded.symbols:
+            if node_name in node_id:
+                return sharded.node(node_id)
+        # Variables, services and other shared nodes are only known to the shards
+        for engine in self._each_engine():
+            node = engine._find_node(node_name)
+            if node is not None:
+                return node
+        return None
+
+    def find_nodes_reading_var(self, var_name):
+        return self._collect("find_nodes_reading_var", var_name)
+
+    def find_nodes_writing_var(self, var_name):
+        return self._collect("find_nodes_writing_var", var_name)
+
+    def find_nodes_throwing_exception(self):
+        return self._collect("find_nodes_throwing_exception")
+
+    def find_nodes_handling_exception(self):
+        return self._collect("find_nodes_handling_exception")
+
+    def find_nodes_with_decorator(self, decorator_name):
+        return self._collect("find_nodes_with_decorator", decorator_name)
+
+    def find_nodes_returning_value(self):
+        return self._collect("find_nodes_returning_value")
+
+    def find_nodes_using_service(self, service_name):
+        return self._collect("find_nodes_using_service", service_name)
+
+    def _query_shards(self, query, argument):
+        if query == "functions_in":
+            # Files with the same basename in different packages share node ids, their full paths tell the shards apart
+            sharded = self.sharded_graph
+            matching = {shard_name for file_path, shard_name in sharded.files.items() if argument in file_path}
+            matching.update(shard_name for node_id, shard_name in sharded.symbols.items() if argument in node_id)
+            return [shard_name for shard_name in self.sharded_graph.shards if shard_name in matching]
+        return list(self.sharded_graph.shards)
+
+    def iter_query(self, query, argument=None, start=None):
+        # Positions are [shard index, position in the shard], shards are loaded one at a time as the iteration reaches them
+        shard_names = self._query_shards(query, argument)
+        start_shard, start_position = start or (0, 0)
+        for shard_index in range(start_shard, len(shard_names)):
+            engine = self._engine(shard_names[shard_index])
+            for position, node in engine.iter_query(query, argument, start_position if shard_index == start_shard else 0):
+                yield [shard_index, position], node
+
+    def count_query(self, query, argument=None):
+        return sum(self._engine(shard_name).count_query(query, argument) for shard_name in self._query_shards(query, argument))
+
+    def query_page(self, query, argument=None, limit=50, offset=0, cursor=None, with_total=False):
+        start = decode_cursor(query, argument, cursor) if cursor is not None else None
+        page = _page(query, argument, self.iter_query(query, argument, start), limit, offset)
+        if with_total:
+            page.total = self.count_query(query, argument)
+        return page
+
+    def find_services(self):
+        # Service nodes are copied into every shard that uses them, their users are added up
+        services = {}
+        for engine in self._each_engine():
+            for service in engine.find_services():
+                merged = services.setdefault(service["id"], dict(service, users=0))
+                merged["users"] += service["users"]
+        return sorted(services.values(), key=lambda service: (-service["users"], service["name"]))